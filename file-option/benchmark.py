@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+FileOption 性能基准测试：生成合成的目录树和文件，测量各操作的延迟分位数、吞吐量和峰值内存，结果输出为 JSON
+
+用法示例：
+    python benchmark.py                                   # quick 预设
+    python benchmark.py --preset full --output bench.json # 1k/100k/1M 条目，1KB ~ 5GB 文件
+    python benchmark.py --entries 100k --file-sizes 1MB 1GB --iterations 3
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import tempfile
+import subprocess
+import multiprocessing
+from typing import Dict, List, Any, Optional
+
+PRESETS = {
+    "quick": {"entries": ["1k"], "file_sizes": ["1KB", "1MB", "64MB"]},
+    "full": {"entries": ["1k", "100k", "1M"], "file_sizes": ["1KB", "1MB", "100MB", "1GB", "5GB"]},
+}
+
+# 每个子目录中的条目数（用于 delete_directory 的嵌套目录树）
+TREE_FANOUT = 1000
+# get_file_info 每次迭代调用的次数
+STAT_CALLS_PER_ITERATION = 1000
+# 生成文件时写入的块大小
+WRITE_BLOCK_SIZE = 1024 * 1024
+EDIT_MARKER = "@@BENCHMARK-EDIT-MARKER@@"
+
+
+def parse_size(text: str) -> int:
+    """解析文件大小，如 1KB、64MB、5GB（按 1024 进制）"""
+    units = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+    value = text.strip().upper()
+    for unit in ("TB", "GB", "MB", "KB", "B"):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * units[unit])
+    return int(value)
+
+
+def parse_count(text: str) -> int:
+    """解析条目数量，如 1k、100k、1M（按 1000 进制）"""
+    units = {"K": 1000, "M": 1000 ** 2}
+    value = text.strip().upper()
+    if value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """当前进程的峰值常驻内存（字节），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def make_text_file(path: str, size: int, marker: bool = False) -> None:
+    """生成指定大小的文本文件，可选在中间位置放置一个编辑标记"""
+    line = "benchmark line 0123456789 abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ\n"
+    block = (line * (WRITE_BLOCK_SIZE // len(line) + 1))[:WRITE_BLOCK_SIZE]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < size:
+            piece = block[:size - written]
+            if marker and written <= size // 2 < written + len(piece):
+                offset = size // 2 - written
+                piece = (piece[:offset] + EDIT_MARKER + piece[offset + len(EDIT_MARKER):])[:len(piece)]
+            f.write(piece)
+            written += len(piece)
+
+
+def make_flat_directory(path: str, entries: int) -> None:
+    """生成包含指定数量空文件的单层目录"""
+    os.makedirs(path, exist_ok=True)
+    for i in range(entries):
+        open(os.path.join(path, f"f{i:08d}"), "wb").close()
+
+
+def make_tree(path: str, entries: int) -> None:
+    """生成包含指定数量条目的嵌套目录树（每个子目录 TREE_FANOUT 个文件）"""
+    os.makedirs(path, exist_ok=True)
+    created = 0
+    directory_index = 0
+    while created < entries:
+        directory = os.path.join(path, f"d{directory_index:06d}")
+        os.makedirs(directory, exist_ok=True)
+        created += 1
+        for i in range(min(TREE_FANOUT, entries - created)):
+            open(os.path.join(directory, f"f{i:06d}"), "wb").close()
+            created += 1
+        directory_index += 1
+
+
+def _check(result: Any, operation: str) -> None:
+    """校验 FileOption 的返回值，失败时抛出异常"""
+    if isinstance(result, dict) and not result.get("success", False):
+        raise RuntimeError(f"{operation} 失败: {result.get('message')}")
+    if isinstance(result, str) and result.startswith("读取文件失败"):
+        raise RuntimeError(result)
+
+
+def _run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    在独立子进程中运行一个基准用例，保证峰值内存只反映该用例本身
+
+    准备数据的时间不计入延迟
+    """
+    from file_option import FileOption
+
+    operation = case["operation"]
+    work = case["workdir"]
+    iterations = case["iterations"]
+    size = case.get("size", 0)
+    entries = case.get("entries", 0)
+    latencies = []
+    baseline_rss = peak_rss_bytes()
+
+    if operation in ("read_file", "edit_file", "copy_file"):
+        source = os.path.join(work, f"{operation}-{size}.txt")
+        make_text_file(source, size, marker=(operation == "edit_file"))
+    elif operation in ("list_directory", "list_directory_compact"):
+        source = os.path.join(work, f"flat-{entries}")
+        make_flat_directory(source, entries)
+    elif operation == "get_file_info":
+        source = os.path.join(work, f"tree-{entries}")
+        make_tree(source, entries)
+        targets = []
+        for root, _, files in os.walk(source):
+            targets.extend(os.path.join(root, name) for name in files[:STAT_CALLS_PER_ITERATION - len(targets)])
+            if len(targets) >= STAT_CALLS_PER_ITERATION:
+                break
+    else:
+        source = os.path.join(work, f"tree-{entries}")
+
+    for i in range(iterations):
+        if operation == "delete_directory":
+            make_tree(source, entries)
+        start = time.perf_counter()
+        if operation == "read_file":
+            _check(FileOption.read_file(source), operation)
+        elif operation == "edit_file":
+            old, new = (EDIT_MARKER, EDIT_MARKER.lower()) if i % 2 == 0 else (EDIT_MARKER.lower(), EDIT_MARKER)
+            _check(FileOption.edit_file(source, old, new), operation)
+        elif operation == "copy_file":
+            _check(FileOption.copy_file(source, source + ".copy"), operation)
+        elif operation == "list_directory":
+            _check(FileOption.list_directory(source), operation)
+        elif operation == "list_directory_compact":
+            _check(FileOption.list_directory(source, compact=True), operation)
+        elif operation == "delete_directory":
+            _check(FileOption.delete_directory(source, recursive=True), operation)
+        elif operation == "get_file_info":
+            for target in targets:
+                _check(FileOption.get_file_info(target), operation)
+        latencies.append(time.perf_counter() - start)
+        if operation == "copy_file":
+            os.remove(source + ".copy")
+
+    latencies.sort()
+    total = sum(latencies)
+    if operation in ("read_file", "edit_file", "copy_file"):
+        unit, work_per_iteration = "bytes/s", size
+    elif operation == "get_file_info":
+        unit, work_per_iteration = "calls/s", len(targets)
+    else:
+        unit, work_per_iteration = "entries/s", entries
+
+    return {
+        "operation": operation,
+        "size": size or None,
+        "entries": entries or None,
+        "iterations": iterations,
+        "latency_seconds": {
+            "min": latencies[0],
+            "mean": total / len(latencies),
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1],
+        },
+        "throughput": work_per_iteration * len(latencies) / total if total > 0 else None,
+        "throughput_unit": unit,
+        "baseline_rss_bytes": baseline_rss,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def build_cases(entries: List[int], file_sizes: List[int], iterations: int, workdir: str,
+                operations: List[str]) -> List[Dict[str, Any]]:
+    """根据参数生成基准用例列表"""
+    cases = []
+    for operation in operations:
+        if operation in ("read_file", "edit_file", "copy_file"):
+            for size in file_sizes:
+                cases.append({"operation": operation, "size": size})
+        else:
+            for count in entries:
+                cases.append({"operation": operation, "entries": count})
+    for case in cases:
+        case["iterations"] = iterations
+        case["workdir"] = tempfile.mkdtemp(prefix=f"{case['operation']}-", dir=workdir)
+    return cases
+
+
+def git_revision() -> Optional[str]:
+    """当前代码所在的 Git 提交，用于跨版本对比"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    """运行基准测试"""
+    operations = ["read_file", "edit_file", "copy_file", "list_directory", "list_directory_compact",
+                  "delete_directory", "get_file_info"]
+    parser = argparse.ArgumentParser(description="FileOption 性能基准测试")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick", help="预设的规模组合")
+    parser.add_argument("--entries", nargs="+", help="目录树条目数，如 1k 100k 1M（覆盖预设）")
+    parser.add_argument("--file-sizes", nargs="+", help="文件大小，如 1KB 1MB 5GB（覆盖预设）")
+    parser.add_argument("--operations", nargs="+", choices=operations, default=operations, help="要测试的操作")
+    parser.add_argument("--iterations", type=int, default=5, help="每个用例的迭代次数")
+    parser.add_argument("--workdir", help="生成数据的目录，默认使用系统临时目录")
+    parser.add_argument("--snapshots", action="store_true", help="启用修改前快照（默认关闭，以便与旧版本对比）")
+    parser.add_argument("--output", help="结果 JSON 文件路径，默认输出到标准输出")
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    entries = [parse_count(value) for value in (args.entries or preset["entries"])]
+    file_sizes = [parse_size(value) for value in (args.file_sizes or preset["file_sizes"])]
+    workdir = tempfile.mkdtemp(prefix="file-option-bench-", dir=args.workdir)
+    if args.snapshots:
+        os.environ.setdefault("FILE_OPTION_SNAPSHOT_DIR", os.path.join(workdir, "snapshots"))
+    else:
+        os.environ["FILE_OPTION_SNAPSHOT_BUDGET"] = "0"
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    try:
+        for case in build_cases(entries, file_sizes, args.iterations, workdir, args.operations):
+            label = f"{case['operation']} size={case.get('size')} entries={case.get('entries')}"
+            print(f"运行: {label}", file=sys.stderr)
+            try:
+                with context.Pool(1) as pool:
+                    result = pool.apply(_run_case, (case,))
+                print(f"  p50={result['latency_seconds']['p50']:.6f}s "
+                      f"throughput={result['throughput']:.1f} {result['throughput_unit']}", file=sys.stderr)
+            except Exception as e:
+                result = {"operation": case["operation"], "size": case.get("size"),
+                          "entries": case.get("entries"), "error": str(e)}
+                print(f"  失败: {e}", file=sys.stderr)
+            finally:
+                shutil.rmtree(case["workdir"], ignore_errors=True)
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "snapshots": args.snapshots,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,153 @@
 
 import os
 import json
+import base64
 import shutil
 import datetime
 import stat
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+import write_session
+from snapshot_store import get_snapshot_store
+
+# 列式紧凑格式中目录条目的字段
+COLUMNAR_ENTRY_FIELDS = ["name", "is_directory", "size", "mtime", "mode"]
+
+# 递归修改权限时最多保留的错误样例数量
+MAX_ERROR_SAMPLES = 10
+
+# 支持基于目录文件描述符（dir_fd）的 scandir/chmod/chown 时，可避免每个条目重复解析完整路径
+_DIR_FD_SUPPORTED = (
+    os.scandir in os.supports_fd
+    and os.chmod in os.supports_dir_fd
+    and os.chown in os.supports_dir_fd
+)
+
+
+def _to_columns(rows: List[tuple], fields: List[str]) -> Dict[str, Any]:
+    """
+    将按行组织的记录转换为列式格式：每个字段一个数组，避免在每条记录中重复键名
+    """
+    columns = list(zip(*rows)) if rows else [() for _ in fields]
+    return {
+        "fields": fields,
+        "columns": {field: list(column) for field, column in zip(fields, columns)}
+    }
+
+
+def _snapshot_before_change(file_path: str, operation: str, length_only: bool = False) -> Optional[int]:
+    """
+    在修改文件之前记录其当前内容，快照失败不影响原操作
+
+    Args:
+        file_path: 文件路径
+        operation: 触发记录的操作名称
+        length_only: 只记录当前长度（用于在末尾追加内容的操作，不读取文件内容）
+
+    Returns:
+        Optional[int]: 快照版本ID，未记录时为None
+    """
+    try:
+        store = get_snapshot_store()
+        if store is None:
+            return None
+        if length_only:
+            return store.record_length(file_path, operation)
+        return store.record(file_path, operation)
+    except Exception:
+        return None
+
+
+def _resolve_owner(owner: Optional[str]) -> Tuple[int, int]:
+    """
+    解析 "用户"、"用户:组" 或数字形式的属主，返回 (uid, gid)，未指定的部分为 -1
+    """
+    if owner is None or str(owner) == "":
+        return -1, -1
+
+    user_part, _, group_part = str(owner).partition(":")
+    uid = gid = -1
+    if user_part:
+        if user_part.isdigit():
+            uid = int(user_part)
+        else:
+            import pwd
+            uid = pwd.getpwnam(user_part).pw_uid
+    if group_part:
+        if group_part.isdigit():
+            gid = int(group_part)
+        else:
+            import grp
+            gid = grp.getgrnam(group_part).gr_gid
+    return uid, gid
+
+
+def _apply_permissions(name: str, st: os.stat_result, mode: Optional[int], uid: int, gid: int,
+                       dir_fd: Optional[int] = None) -> bool:
+    """
+    根据遍历时得到的 stat 信息，仅在属主或权限不一致时才发起系统调用
+
+    Returns:
+        bool: 是否发生了修改
+    """
+    changed = False
+    # chown 会清除 setuid/setgid 位，必须先于 chmod 执行
+    if (uid != -1 and st.st_uid != uid) or (gid != -1 and st.st_gid != gid):
+        os.chown(name, uid, gid, dir_fd=dir_fd, follow_symlinks=False)
+        changed = True
+    if mode is not None and (changed or stat.S_IMODE(st.st_mode) != mode):
+        os.chmod(name, mode, dir_fd=dir_fd)
+        changed = True
+    return changed
+
+
+def _apply_permissions_in_directory(directory_path: str, file_mode: Optional[int], dir_mode: Optional[int],
+                                    uid: int, gid: int) -> Tuple[Dict[str, int], List[Dict[str, str]], List[str]]:
+    """
+    处理单个目录下的全部条目（不递归），返回计数、错误样例以及需要继续遍历的子目录
+    """
+    counts = {"files": 0, "directories": 0, "changed": 0, "unchanged": 0, "skipped": 0, "errors": 0}
+    errors = []
+    subdirectories = []
+
+    dir_fd = None
+    try:
+        if _DIR_FD_SUPPORTED:
+            dir_fd = os.open(directory_path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        with os.scandir(dir_fd if dir_fd is not None else directory_path) as entries:
+            for entry in entries:
+                entry_path = os.path.join(directory_path, entry.name)
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    if stat.S_ISLNK(st.st_mode):
+                        # 符号链接的权限没有意义，且不能跟随到树外
+                        counts["skipped"] += 1
+                        continue
+                    if stat.S_ISDIR(st.st_mode):
+                        counts["directories"] += 1
+                        subdirectories.append(entry_path)
+                        mode = dir_mode
+                    else:
+                        counts["files"] += 1
+                        mode = file_mode
+                    target = entry.name if dir_fd is not None else entry_path
+                    if _apply_permissions(target, st, mode, uid, gid, dir_fd):
+                        counts["changed"] += 1
+                    else:
+                        counts["unchanged"] += 1
+                except OSError as e:
+                    counts["errors"] += 1
+                    if len(errors) < MAX_ERROR_SAMPLES:
+                        errors.append({"path": entry_path, "error": str(e)})
+    except OSError as e:
+        counts["errors"] += 1
+        errors.append({"path": directory_path, "error": str(e)})
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return counts, errors, subdirectories
 
 
 class FileOption:
@@ -52,13 +194,15 @@ class FileOption:
             # 确保目录存在
             os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
             
+            snapshot_version = _snapshot_before_change(file_path, "write_file")
             with open(file_path, 'w', encoding=encoding) as f:
                 f.write(content)
             
             return {
                 "success": True,
                 "message": f"文件写入成功: {file_path}",
-                "path": file_path
+                "path": file_path,
+                "snapshot_version": snapshot_version
             }
         except Exception as e:
             return {
@@ -84,13 +228,15 @@ class FileOption:
             # 确保目录存在
             os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
             
+            snapshot_version = _snapshot_before_change(file_path, "append_file", length_only=True)
             with open(file_path, 'a', encoding=encoding) as f:
                 f.write(content)
             
             return {
                 "success": True,
                 "message": f"内容追加成功: {file_path}",
-                "path": file_path
+                "path": file_path,
+                "snapshot_version": snapshot_version
             }
         except Exception as e:
             return {
@@ -134,13 +280,15 @@ class FileOption:
                 
             new_content_full = content.replace(old_content, new_content)
             
+            snapshot_version = _snapshot_before_change(file_path, "edit_file")
             with open(file_path, 'w', encoding=encoding) as f:
                 f.write(new_content_full)
                 
             return {
                 "success": True,
                 "message": f"文件编辑成功: {file_path}",
-                "path": file_path
+                "path": file_path,
+                "snapshot_version": snapshot_version
             }
         except Exception as e:
             return {
@@ -150,12 +298,14 @@ class FileOption:
             }
     
     @staticmethod
-    def list_directory(directory_path: str) -> Dict[str, Any]:
+    def list_directory(directory_path: str, compact: bool = False) -> Dict[str, Any]:
         """
         列出目录内容
         
         Args:
             directory_path: 目录路径
+            compact: 是否使用列式紧凑格式，默认False。紧凑格式下每个字段一个数组，
+                     修改时间为原始时间戳（秒），权限为原始 st_mode 整数，路径为 prefix + name
             
         Returns:
             Dict[str, Any]: 目录内容信息
@@ -175,27 +325,46 @@ class FileOption:
                     "path": directory_path
                 }
                 
-            items = []
-            for item in os.listdir(directory_path):
-                item_path = os.path.join(directory_path, item)
-                item_stat = os.stat(item_path)
-                
-                # 获取文件/目录信息
-                is_dir = os.path.isdir(item_path)
-                size = item_stat.st_size if not is_dir else None
-                modified_time = datetime.datetime.fromtimestamp(item_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
-                
-                # 获取权限信息
-                permissions = stat.filemode(item_stat.st_mode)
+            if compact:
+                rows = []
+                with os.scandir(directory_path) as entries:
+                    for entry in entries:
+                        item_stat = entry.stat()
+                        is_dir = stat.S_ISDIR(item_stat.st_mode)
+                        rows.append((entry.name, is_dir, item_stat.st_size if not is_dir else None,
+                                     int(item_stat.st_mtime), item_stat.st_mode))
+                return {
+                    "success": True,
+                    "message": f"目录内容获取成功: {directory_path}",
+                    "path": directory_path,
+                    "format": "columnar",
+                    "prefix": os.path.join(directory_path, ""),
+                    **_to_columns(rows, COLUMNAR_ENTRY_FIELDS),
+                    "total_items": len(rows)
+                }
                 
-                items.append({
-                    "name": item,
-                    "path": item_path,
-                    "is_directory": is_dir,
-                    "size": size,
-                    "modified_time": modified_time,
-                    "permissions": permissions
-                })
+            items = []
+            with os.scandir(directory_path) as entries:
+                for entry in entries:
+                    item_path = os.path.join(directory_path, entry.name)
+                    item_stat = entry.stat()
+                    
+                    # 获取文件/目录信息
+                    is_dir = stat.S_ISDIR(item_stat.st_mode)
+                    size = item_stat.st_size if not is_dir else None
+                    modified_time = datetime.datetime.fromtimestamp(item_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    
+                    # 获取权限信息
+                    permissions = stat.filemode(item_stat.st_mode)
+                    
+                    items.append({
+                        "name": entry.name,
+                        "path": item_path,
+                        "is_directory": is_dir,
+                        "size": size,
+                        "modified_time": modified_time,
+                        "permissions": permissions
+                    })
                 
             return {
                 "success": True,
@@ -235,7 +404,8 @@ class FileOption:
             # 确保目标目录存在
             os.makedirs(os.path.dirname(os.path.abspath(destination_path)), exist_ok=True)
             
-            # 复制文件
+            # 复制文件（覆盖目标文件前先记录快照）
+            _snapshot_before_change(destination_path, "copy_file")
             shutil.copy2(source_path, destination_path)
             
             return {
@@ -276,7 +446,9 @@ class FileOption:
             # 确保目标目录存在
             os.makedirs(os.path.dirname(os.path.abspath(destination_path)), exist_ok=True)
             
-            # 移动文件
+            # 移动文件（被移走的源文件和被覆盖的目标文件都先记录快照）
+            _snapshot_before_change(source_path, "move_file")
+            _snapshot_before_change(destination_path, "move_file")
             shutil.move(source_path, destination_path)
             
             return {
@@ -320,12 +492,14 @@ class FileOption:
                 }
                 
             # 删除文件
+            snapshot_version = _snapshot_before_change(file_path, "delete_file")
             os.remove(file_path)
             
             return {
                 "success": True,
                 "message": f"文件删除成功: {file_path}",
-                "path": file_path
+                "path": file_path,
+                "snapshot_version": snapshot_version
             }
         except Exception as e:
             return {
@@ -526,8 +700,9 @@ class FileOption:
             os.chmod(file_path, mode)
             
             # 获取新的权限信息
-            new_permissions = stat.filemode(os.stat(file_path).st_mode)
-            new_permissions_octal = oct(os.stat(file_path).st_mode)[-3:]
+            new_mode = os.stat(file_path).st_mode
+            new_permissions = stat.filemode(new_mode)
+            new_permissions_octal = oct(new_mode)[-3:]
             
             return {
                 "success": True,
@@ -543,6 +718,274 @@ class FileOption:
                 "path": file_path
             }
 
+    @staticmethod
+    def change_permissions_recursive(directory_path: str, file_mode: Optional[int] = None,
+                                     dir_mode: Optional[int] = None, owner: Optional[str] = None,
+                                     max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        递归修改目录树的权限和属主（并行遍历，仅返回汇总计数）
+        
+        Args:
+            directory_path: 目录路径（也可以是单个文件）
+            file_mode: 文件的权限模式，如0o644，不指定则不修改
+            dir_mode: 目录的权限模式，如0o755，不指定则不修改
+            owner: 属主，格式为 "用户"、"用户:组" 或 ":组"，也可使用数字ID，不指定则不修改
+            max_workers: 并行遍历的线程数，默认根据CPU数量决定
+            
+        Returns:
+            Dict[str, Any]: 操作结果（文件数、目录数、修改数、跳过数、错误数等）
+        """
+        try:
+            if file_mode is None and dir_mode is None and not owner:
+                return {
+                    "success": False,
+                    "message": "至少需要指定 file_mode、dir_mode 或 owner 之一",
+                    "path": directory_path
+                }
+                
+            if not os.path.lexists(directory_path):
+                return {
+                    "success": False,
+                    "message": f"路径不存在: {directory_path}",
+                    "path": directory_path
+                }
+            
+            uid, gid = _resolve_owner(owner)
+            totals = {"files": 0, "directories": 0, "changed": 0, "unchanged": 0, "skipped": 0, "errors": 0}
+            error_samples = []
+            
+            # 先处理根路径本身
+            root_stat = os.lstat(directory_path)
+            is_dir = stat.S_ISDIR(root_stat.st_mode)
+            if stat.S_ISLNK(root_stat.st_mode):
+                totals["skipped"] += 1
+            else:
+                totals["directories" if is_dir else "files"] += 1
+                if _apply_permissions(directory_path, root_stat, dir_mode if is_dir else file_mode, uid, gid):
+                    totals["changed"] += 1
+                else:
+                    totals["unchanged"] += 1
+            
+            if is_dir:
+                # 每个目录作为一个任务，处理完成后再把子目录提交给线程池
+                workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    pending = {executor.submit(_apply_permissions_in_directory, directory_path,
+                                               file_mode, dir_mode, uid, gid)}
+                    while pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            counts, errors, subdirectories = future.result()
+                            for key, value in counts.items():
+                                totals[key] += value
+                            error_samples.extend(errors[:MAX_ERROR_SAMPLES - len(error_samples)])
+                            for subdirectory in subdirectories:
+                                pending.add(executor.submit(_apply_permissions_in_directory, subdirectory,
+                                                            file_mode, dir_mode, uid, gid))
+            
+            return {
+                "success": totals["errors"] == 0,
+                "message": f"递归权限修改完成: {directory_path}" if totals["errors"] == 0
+                           else f"递归权限修改完成，但有 {totals['errors']} 个错误: {directory_path}",
+                "path": directory_path,
+                **totals,
+                "error_samples": error_samples
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"递归权限修改失败: {str(e)}",
+                "path": directory_path
+            }
+
+    @staticmethod
+    def list_file_versions(file_path: str) -> Dict[str, Any]:
+        """
+        列出文件在快照存储中的所有历史版本
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            Dict[str, Any]: 版本列表（从新到旧）
+        """
+        try:
+            store = get_snapshot_store()
+            if store is None:
+                return {
+                    "success": False,
+                    "message": "快照功能未启用",
+                    "path": file_path
+                }
+            
+            versions = store.list_versions(file_path)
+            return {
+                "success": True,
+                "message": f"文件版本获取成功: {file_path}",
+                "path": file_path,
+                "versions": versions,
+                "total_versions": len(versions)
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"获取文件版本失败: {str(e)}",
+                "path": file_path
+            }
+    
+    @staticmethod
+    def restore_file(file_path: str, version_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        将文件恢复到快照存储中记录的某个版本
+        
+        Args:
+            file_path: 文件路径
+            version_id: 版本ID，不指定则恢复到最近一次修改前的版本
+            
+        Returns:
+            Dict[str, Any]: 操作结果
+        """
+        try:
+            store = get_snapshot_store()
+            if store is None:
+                return {
+                    "success": False,
+                    "message": "快照功能未启用",
+                    "path": file_path
+                }
+            
+            restored = store.restore(file_path, version_id)
+            return {
+                "success": True,
+                "message": f"文件恢复成功: {file_path}",
+                "path": file_path,
+                **restored
+            }
+        except KeyError as e:
+            return {
+                "success": False,
+                "message": e.args[0],
+                "path": file_path
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"文件恢复失败: {str(e)}",
+                "path": file_path
+            }
+
+    @staticmethod
+    def open_write_session(file_path: str, expected_size: int = 0, truncate: bool = False,
+                           sparse: bool = False) -> Dict[str, Any]:
+        """
+        打开写入会话，用于分多次写入大文件（只打开一次文件，并按预计大小预分配空间）
+        
+        Args:
+            file_path: 文件路径
+            expected_size: 预计的最终大小（字节），大于当前大小时使用 fallocate 预分配
+            truncate: 是否清空已有内容，默认False（不清空时快照只记录原长度，回滚只能撤销追加的内容）
+            sparse: 是否保持稀疏文件（不预分配，未写入的区域保留为空洞），默认False
+            
+        Returns:
+            Dict[str, Any]: 操作结果，包含会话ID
+        """
+        try:
+            # 确保目录存在
+            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+            
+            # 清空已有内容时保存完整内容，否则只记录长度，避免打开会话时读取整个大文件
+            snapshot_version = _snapshot_before_change(file_path, "open_write_session", length_only=not truncate)
+            session_id = write_session.open_session(file_path, expected_size, truncate, sparse)
+            
+            return {
+                "success": True,
+                "message": f"写入会话已打开: {file_path}",
+                "path": file_path,
+                "session_id": session_id,
+                "snapshot_version": snapshot_version
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"打开写入会话失败: {str(e)}",
+                "path": file_path
+            }
+    
+    @staticmethod
+    def write_to_session(session_id: str, content: str, offset: Optional[int] = None,
+                         encoding: str = 'utf-8', is_base64: bool = False) -> Dict[str, Any]:
+        """
+        通过写入会话在指定偏移量写入内容
+        
+        Args:
+            session_id: 写入会话ID
+            content: 要写入的内容
+            offset: 写入的字节偏移量，不指定则追加到当前末尾
+            encoding: 文本编码，默认utf-8
+            is_base64: content 是否为 base64 编码的二进制数据，默认False
+            
+        Returns:
+            Dict[str, Any]: 操作结果（实际写入字节数、因全零而跳过的字节数等）
+        """
+        try:
+            session = write_session.get_session(session_id)
+            data = base64.b64decode(content) if is_base64 else content.encode(encoding)
+            result = session.write(data, offset)
+            
+            return {
+                "success": True,
+                "message": f"写入成功: {session.path}",
+                "path": session.path,
+                "session_id": session_id,
+                **result
+            }
+        except KeyError as e:
+            return {
+                "success": False,
+                "message": e.args[0],
+                "session_id": session_id
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"写入失败: {str(e)}",
+                "session_id": session_id
+            }
+    
+    @staticmethod
+    def close_write_session(session_id: str, sync: bool = True) -> Dict[str, Any]:
+        """
+        关闭写入会话，截断多余的预分配空间并落盘
+        
+        Args:
+            session_id: 写入会话ID
+            sync: 是否调用 fsync 将数据刷到磁盘，默认True
+            
+        Returns:
+            Dict[str, Any]: 操作结果（最终大小、实际写入和跳过的字节数、占用的磁盘空间等）
+        """
+        try:
+            result = write_session.close_session(session_id, sync)
+            
+            return {
+                "success": True,
+                "message": f"写入会话已关闭: {result['path']}",
+                "session_id": session_id,
+                **result
+            }
+        except KeyError as e:
+            return {
+                "success": False,
+                "message": e.args[0],
+                "session_id": session_id
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"关闭写入会话失败: {str(e)}",
+                "session_id": session_id
+            }
+
 
 def main():
     """测试文件操作功能"""
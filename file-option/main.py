@@ -81,17 +81,20 @@ async def edit_file(file_path: str, old_content: str, new_content: str, encoding
 
 
 @mcp.tool()
-async def list_directory(directory_path: str) -> Dict[str, Any]:
+async def list_directory(directory_path: str, compact: bool = False) -> Dict[str, Any]:
     """
     列出目录内容
     
     Args:
         directory_path: 目录路径
+        compact: 是否使用列式紧凑格式，默认False。紧凑格式下每个字段一个数组（fields/columns），
+                 mtime 为原始时间戳（秒），mode 为原始 st_mode 整数，完整路径为 prefix + name，
+                 适合条目很多的大目录
         
     Returns:
         Dict[str, Any]: 目录内容信息
     """
-    return FileOption.list_directory(directory_path)
+    return FileOption.list_directory(directory_path, compact)
 
 
 @mcp.tool()
@@ -196,6 +199,108 @@ async def change_file_permissions(file_path: str, mode: int) -> Dict[str, Any]:
     return FileOption.change_file_permissions(file_path, mode)
 
 
+@mcp.tool()
+async def change_permissions_recursive(directory_path: str, file_mode: Optional[int] = None,
+                                       dir_mode: Optional[int] = None, owner: Optional[str] = None,
+                                       max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    递归修改目录树的权限和属主（并行遍历，已符合要求的条目会被跳过，仅返回汇总计数）
+    
+    Args:
+        directory_path: 目录路径（也可以是单个文件）
+        file_mode: 文件的权限模式，如0o644，不指定则不修改
+        dir_mode: 目录的权限模式，如0o755，不指定则不修改
+        owner: 属主，格式为 "用户"、"用户:组" 或 ":组"，也可使用数字ID，不指定则不修改
+        max_workers: 并行遍历的线程数，默认根据CPU数量决定
+        
+    Returns:
+        Dict[str, Any]: 操作结果
+    """
+    return FileOption.change_permissions_recursive(directory_path, file_mode, dir_mode, owner, max_workers)
+
+
+@mcp.tool()
+async def list_file_versions(file_path: str) -> Dict[str, Any]:
+    """
+    列出文件的历史版本（每次写入、编辑、追加、删除、覆盖前都会自动记录）
+    
+    Args:
+        file_path: 文件路径
+        
+    Returns:
+        Dict[str, Any]: 版本列表（从新到旧）
+    """
+    return FileOption.list_file_versions(file_path)
+
+
+@mcp.tool()
+async def restore_file(file_path: str, version_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    将文件恢复到某个历史版本（恢复前的内容也会被记录，因此恢复可以撤销）
+    
+    Args:
+        file_path: 文件路径
+        version_id: 版本ID，不指定则恢复到最近一次修改前的版本
+        
+    Returns:
+        Dict[str, Any]: 操作结果
+    """
+    return FileOption.restore_file(file_path, version_id)
+
+
+@mcp.tool()
+async def open_write_session(file_path: str, expected_size: int = 0, truncate: bool = False,
+                             sparse: bool = False) -> Dict[str, Any]:
+    """
+    打开写入会话，用于分多次生成大文件：文件只打开一次并按预计大小预分配空间，
+    之后用 write_to_session 写入，最后必须调用 close_write_session
+    
+    Args:
+        file_path: 文件路径
+        expected_size: 预计的最终大小（字节），大于当前大小时预分配
+        truncate: 是否清空已有内容，默认False（不清空时快照只记录原长度，回滚只能撤销追加的内容）
+        sparse: 是否保持稀疏文件（不预分配，未写入的区域保留为空洞），默认False
+        
+    Returns:
+        Dict[str, Any]: 操作结果，包含 session_id
+    """
+    return FileOption.open_write_session(file_path, expected_size, truncate, sparse)
+
+
+@mcp.tool()
+async def write_to_session(session_id: str, content: str, offset: Optional[int] = None,
+                           encoding: str = 'utf-8', is_base64: bool = False) -> Dict[str, Any]:
+    """
+    通过写入会话写入内容（全零的数据块不会真正写入磁盘）
+    
+    Args:
+        session_id: open_write_session 返回的会话ID
+        content: 要写入的内容
+        offset: 写入的字节偏移量，不指定则追加到当前末尾
+        encoding: 文本编码，默认utf-8
+        is_base64: content 是否为 base64 编码的二进制数据，默认False
+        
+    Returns:
+        Dict[str, Any]: 操作结果
+    """
+    return FileOption.write_to_session(session_id, content, offset, encoding, is_base64)
+
+
+@mcp.tool()
+async def close_write_session(session_id: str, sync: bool = True) -> Dict[str, Any]:
+    """
+    关闭写入会话，截断多余的预分配空间并落盘
+    
+    Args:
+        session_id: 写入会话ID
+        sync: 是否将数据刷到磁盘，默认True
+        
+    Returns:
+        Dict[str, Any]: 操作结果
+    """
+    return FileOption.close_write_session(session_id, sync)
+
+
 if __name__ == "__main__":
     # 运行MCP服务
     mcp.run(transport='stdio')
@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+快照存储模块：在文件被修改前保存其原始内容（pre-image），支持快速回滚到任意已记录的版本
+
+内容按块切分并以 SHA-256 寻址，相同的块只保存一份；总占用超过容量预算时按 LRU 淘汰最久未使用的版本。
+只在末尾追加内容的操作只记录修改前的长度（不读取文件内容），回滚时截断到该长度
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import datetime
+import threading
+from typing import Dict, List, Any, Optional, Iterator
+
+# 快照存储目录，可通过环境变量覆盖
+DEFAULT_SNAPSHOT_DIR = os.environ.get(
+    "FILE_OPTION_SNAPSHOT_DIR",
+    os.path.join(os.path.expanduser("~"), ".file_option", "snapshots")
+)
+# 快照存储的容量预算（字节），设置为 0 则关闭快照功能
+DEFAULT_SNAPSHOT_BUDGET = int(os.environ.get("FILE_OPTION_SNAPSHOT_BUDGET", str(1024 * 1024 * 1024)))
+
+# 分块参数：在最小块长度之后，遇到满足条件的换行符即切分；没有换行的数据按最大块长度切分
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+READ_BLOCK_SIZE = 1024 * 1024
+BOUNDARY_WINDOW = 32
+BOUNDARY_MASK = 0x7
+# 每个文件最多保留的长度版本数量（长度版本不占用块存储，不会因容量预算被淘汰）
+MAX_LENGTH_VERSIONS = 64
+
+# 版本类型：content 保存完整内容，length 只保存修改前的长度
+KIND_CONTENT = "content"
+KIND_LENGTH = "length"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mode INTEGER NOT NULL,
+    operation TEXT,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'content'
+);
+CREATE INDEX IF NOT EXISTS idx_versions_path ON versions(path, id);
+CREATE INDEX IF NOT EXISTS idx_versions_last_used ON versions(last_used);
+CREATE TABLE IF NOT EXISTS version_chunks (
+    version_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (version_id, seq)
+);
+"""
+
+
+def _find_boundary(buffer: bytes, eof: bool) -> int:
+    """
+    在缓冲区中寻找块边界
+
+    边界只取决于换行符前 BOUNDARY_WINDOW 字节的内容，因此插入或删除内容后，
+    后续的块边界会重新对齐，未改动部分的块仍然可以去重
+    """
+    limit = min(len(buffer), MAX_CHUNK_SIZE)
+    if len(buffer) <= MIN_CHUNK_SIZE:
+        return len(buffer) if eof else limit
+    pos = MIN_CHUNK_SIZE
+    while True:
+        newline = buffer.find(b"\n", pos, limit)
+        if newline == -1:
+            return limit
+        window = buffer[max(0, newline - BOUNDARY_WINDOW):newline]
+        if zlib.crc32(window) & BOUNDARY_MASK == 0:
+            return newline + 1
+        pos = newline + 1
+
+
+def _iter_chunks(f) -> Iterator[bytes]:
+    """按内容定义的边界流式切分文件"""
+    buffer = b""
+    eof = False
+    while True:
+        while not eof and len(buffer) < MAX_CHUNK_SIZE:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                eof = True
+                break
+            buffer += block
+        if not buffer:
+            return
+        cut = _find_boundary(buffer, eof)
+        yield buffer[:cut]
+        buffer = buffer[cut:]
+
+
+class SnapshotStore:
+    """基于内容寻址的文件快照存储"""
+
+    def __init__(self, root: str = DEFAULT_SNAPSHOT_DIR, budget: int = DEFAULT_SNAPSHOT_BUDGET):
+        """
+        初始化快照存储
+
+        Args:
+            root: 存储目录
+            budget: 容量预算（字节）
+        """
+        self.root = root
+        self.budget = budget
+        self.chunk_dir = os.path.join(root, "chunks")
+        self._lock = threading.Lock()
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(versions)")]
+        if "kind" not in columns:
+            # 旧版本创建的存储中只有完整内容的版本
+            self._conn.execute("ALTER TABLE versions ADD COLUMN kind TEXT NOT NULL DEFAULT 'content'")
+        self._conn.commit()
+
+    def _chunk_path(self, chunk_hash: str) -> str:
+        return os.path.join(self.chunk_dir, chunk_hash[:2], chunk_hash)
+
+    def _store_chunk(self, chunk_hash: str, data: bytes) -> None:
+        """写入块文件（已存在则跳过），先写临时文件再原子重命名"""
+        path = self._chunk_path(chunk_hash)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def stored_bytes(self) -> int:
+        """当前已存储的块总大小"""
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunks").fetchone()
+        return row[0]
+
+    def record(self, file_path: str, operation: str = "", protect_version: Optional[int] = None) -> Optional[int]:
+        """
+        记录文件当前内容作为一个版本
+
+        Args:
+            file_path: 文件路径
+            operation: 触发记录的操作名称
+            protect_version: 本次记录触发淘汰时需要保留的版本ID
+
+        Returns:
+            Optional[int]: 版本ID；文件不存在、不是普通文件或超过容量预算时返回None
+        """
+        path = os.path.abspath(file_path)
+        if not os.path.isfile(path):
+            return None
+        st = os.stat(path)
+        if st.st_size > self.budget:
+            return None
+
+        with self._lock:
+            hashes = []
+            sizes = {}
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in _iter_chunks(f):
+                    chunk_hash = hashlib.sha256(chunk).hexdigest()
+                    self._store_chunk(chunk_hash, chunk)
+                    hashes.append(chunk_hash)
+                    sizes[chunk_hash] = len(chunk)
+                    digest.update(chunk_hash.encode())
+            digest = digest.hexdigest()
+
+            now = time.time()
+            latest = self._conn.execute(
+                "SELECT id, digest, kind FROM versions WHERE path = ? ORDER BY id DESC LIMIT 1", (path,)
+            ).fetchone()
+            if latest and latest[2] == KIND_CONTENT and latest[1] == digest:
+                # 内容与最近一个版本相同，只刷新使用时间
+                self._conn.execute("UPDATE versions SET last_used = ? WHERE id = ?", (now, latest[0]))
+                self._conn.commit()
+                return latest[0]
+
+            cursor = self._conn.execute(
+                "INSERT INTO versions (path, digest, size, mode, operation, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, digest, st.st_size, st.st_mode & 0o7777, operation, now, now)
+            )
+            version_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO version_chunks (version_id, seq, hash) VALUES (?, ?, ?)",
+                [(version_id, seq, chunk_hash) for seq, chunk_hash in enumerate(hashes)]
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks (hash, size, refcount) VALUES (?, ?, 1) "
+                "ON CONFLICT(hash) DO UPDATE SET refcount = refcount + 1",
+                [(chunk_hash, sizes[chunk_hash]) for chunk_hash in hashes]
+            )
+            self._evict(keep_versions=(version_id, protect_version))
+            self._conn.commit()
+            return version_id
+
+    def record_length(self, file_path: str, operation: str = "") -> Optional[int]:
+        """
+        只记录文件当前的长度作为一个版本，用于只在末尾追加内容的操作，开销与文件大小无关
+
+        Args:
+            file_path: 文件路径
+            operation: 触发记录的操作名称
+
+        Returns:
+            Optional[int]: 版本ID；文件不存在或不是普通文件时返回None
+        """
+        path = os.path.abspath(file_path)
+        if not os.path.isfile(path):
+            return None
+        st = os.stat(path)
+
+        with self._lock:
+            now = time.time()
+            latest = self._conn.execute(
+                "SELECT id, size, kind FROM versions WHERE path = ? ORDER BY id DESC LIMIT 1", (path,)
+            ).fetchone()
+            if latest and latest[2] == KIND_LENGTH and latest[1] == st.st_size:
+                self._conn.execute("UPDATE versions SET last_used = ? WHERE id = ?", (now, latest[0]))
+                self._conn.commit()
+                return latest[0]
+
+            cursor = self._conn.execute(
+                "INSERT INTO versions (path, digest, size, mode, operation, created, last_used, kind) "
+                "VALUES (?, '', ?, ?, ?, ?, ?, ?)",
+                (path, st.st_size, st.st_mode & 0o7777, operation, now, now, KIND_LENGTH)
+            )
+            version_id = cursor.lastrowid
+            stale = self._conn.execute(
+                "SELECT id FROM versions WHERE path = ? AND kind = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+                (path, KIND_LENGTH, MAX_LENGTH_VERSIONS)
+            ).fetchall()
+            for (stale_id,) in stale:
+                self._delete_version(stale_id)
+            self._conn.commit()
+            return version_id
+
+    def _delete_version(self, version_id: int) -> int:
+        """删除一个版本，并回收不再被引用的块，返回释放的字节数"""
+        hashes = [row[0] for row in self._conn.execute(
+            "SELECT hash FROM version_chunks WHERE version_id = ?", (version_id,))]
+        self._conn.execute("DELETE FROM version_chunks WHERE version_id = ?", (version_id,))
+        self._conn.execute("DELETE FROM versions WHERE id = ?", (version_id,))
+        self._conn.executemany("UPDATE chunks SET refcount = refcount - 1 WHERE hash = ?",
+                               [(chunk_hash,) for chunk_hash in hashes])
+        orphans = self._conn.execute("SELECT hash, size FROM chunks WHERE refcount <= 0").fetchall()
+        self._conn.execute("DELETE FROM chunks WHERE refcount <= 0")
+        for chunk_hash, _ in orphans:
+            try:
+                os.remove(self._chunk_path(chunk_hash))
+            except FileNotFoundError:
+                pass
+        return sum(size for _, size in orphans)
+
+    def _evict(self, keep_versions: tuple = ()) -> None:
+        """超过容量预算时，按最久未使用顺序淘汰完整内容的版本"""
+        keep = [v if v is not None else -1 for v in keep_versions] + [-1, -1]
+        # 只统计一次总大小，之后减去每次删除释放的字节数
+        total = self.stored_bytes()
+        while total > self.budget:
+            row = self._conn.execute(
+                "SELECT id FROM versions WHERE kind = ? AND id NOT IN (?, ?) ORDER BY last_used ASC LIMIT 1",
+                (KIND_CONTENT, keep[0], keep[1])
+            ).fetchone()
+            if row is None:
+                break
+            total -= self._delete_version(row[0])
+
+    def list_versions(self, file_path: str) -> List[Dict[str, Any]]:
+        """
+        列出文件的所有已记录版本（从新到旧）
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            List[Dict[str, Any]]: 版本列表
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, size, operation, created, kind FROM versions WHERE path = ? ORDER BY id DESC", (path,)
+            ).fetchall()
+        return [{
+            "version_id": version_id,
+            "size": size,
+            "operation": operation,
+            "kind": kind,
+            "created_time": datetime.datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S')
+        } for version_id, size, operation, created, kind in rows]
+
+    def restore(self, file_path: str, version_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        将文件恢复到指定版本（默认为最近一个版本）
+
+        恢复前会先记录文件的当前内容，因此恢复操作本身也可以撤销。
+        长度版本通过截断到记录的长度恢复，只能撤销在末尾追加的内容
+
+        Args:
+            file_path: 文件路径
+            version_id: 版本ID，不指定则使用最近一个版本
+
+        Returns:
+            Dict[str, Any]: 被恢复的版本信息，包括恢复前保存的版本ID
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            if version_id is None:
+                row = self._conn.execute(
+                    "SELECT id, size, mode, kind FROM versions WHERE path = ? ORDER BY id DESC LIMIT 1", (path,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT id, size, mode, kind FROM versions WHERE path = ? AND id = ?", (path, version_id)
+                ).fetchone()
+            if row is None:
+                raise KeyError(f"没有找到可恢复的版本: {file_path}")
+            version_id, size, mode, kind = row
+            if kind == KIND_LENGTH and (not os.path.isfile(path) or os.path.getsize(path) < size):
+                raise ValueError(f"文件当前长度小于版本 {version_id} 记录的长度 {size}，无法通过截断恢复")
+            hashes = [r[0] for r in self._conn.execute(
+                "SELECT hash FROM version_chunks WHERE version_id = ? ORDER BY seq", (version_id,))]
+            self._conn.execute("UPDATE versions SET last_used = ? WHERE id = ?", (time.time(), version_id))
+            self._conn.commit()
+
+        # 恢复前记录当前内容，并防止这次记录触发的淘汰删掉正要恢复的版本
+        backup_version = self.record(path, "restore", protect_version=version_id)
+
+        if kind == KIND_LENGTH:
+            os.truncate(path, size)
+            return {"version_id": version_id, "size": size, "kind": kind, "backup_version_id": backup_version}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.restore.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as out:
+                for chunk_hash in hashes:
+                    with open(self._chunk_path(chunk_hash), "rb") as f:
+                        out.write(f.read())
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        return {"version_id": version_id, "size": size, "kind": kind, "backup_version_id": backup_version}
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """获取默认快照存储（按需创建），容量预算为 0 时返回 None"""
+    global _default_store
+    if DEFAULT_SNAPSHOT_BUDGET <= 0:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SnapshotStore()
+        return _default_store
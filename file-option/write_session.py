@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+写入会话模块：一次打开文件、预分配空间，之后通过会话句柄在指定偏移量写入，关闭时统一落盘
+
+适合分多次生成大文件的场景，避免每次追加都重新打开文件并造成碎片；全零的数据块不会真正写入，保持稀疏
+"""
+
+import os
+import time
+import errno
+import uuid
+import threading
+from typing import Dict, Any, Optional
+
+# 同时打开的写入会话上限
+MAX_SESSIONS = 64
+# 会话空闲超过该时间（秒）后，在打开新会话时自动关闭
+SESSION_IDLE_TIMEOUT = 3600
+# 检测全零数据块的粒度
+ZERO_SCAN_BLOCK = 64 * 1024
+
+
+class WriteSession:
+    """单个文件的写入会话"""
+
+    def __init__(self, file_path: str, expected_size: int = 0, truncate: bool = False, sparse: bool = False):
+        """
+        打开文件并按需预分配空间
+
+        Args:
+            file_path: 文件路径
+            expected_size: 预计的最终大小（字节），大于当前大小时预分配
+            truncate: 是否清空已有内容
+            sparse: 是否保持稀疏（不预分配，未写入的区域保留为空洞）
+        """
+        self.path = file_path
+        self.fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if truncate else 0), 0o666)
+        # 逻辑大小（追加写入的位置）以及已写入数据的最高位置，高于该位置的区域一定全为零
+        self.size = os.fstat(self.fd).st_size
+        self.high_water = self.size
+        self.bytes_written = 0
+        self.bytes_skipped = 0
+        self.writes = 0
+        self.preallocated = 0
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+
+        if not sparse and expected_size > self.size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(self.fd, self.size, expected_size - self.size)
+                self.preallocated = expected_size - self.size
+            except OSError as e:
+                # 文件系统不支持预分配时照常写入；其他错误（例如空间不足）关闭文件后抛出
+                if e.errno not in (errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL):
+                    os.close(self.fd)
+                    raise
+            except BaseException:
+                os.close(self.fd)
+                raise
+
+    def _pwrite_all(self, data: memoryview, offset: int) -> int:
+        """在指定偏移量写入全部数据"""
+        done = 0
+        while done < len(data):
+            done += os.pwrite(self.fd, data[done:], offset + done)
+        return done
+
+    def write(self, data: bytes, offset: Optional[int] = None) -> Dict[str, Any]:
+        """
+        在指定偏移量写入数据，不指定偏移量时追加到末尾
+
+        已写入区域之后的全零数据块直接跳过，读取时同样为零
+        """
+        with self.lock:
+            if offset is None:
+                offset = self.size
+            if offset < 0:
+                raise ValueError("偏移量不能为负数")
+
+            view = memoryview(data)
+            written = skipped = 0
+            # 连续的需写入块合并为一次 pwrite
+            run_start = None
+            for pos in range(0, len(view), ZERO_SCAN_BLOCK):
+                block = view[pos:pos + ZERO_SCAN_BLOCK]
+                if offset + pos >= self.high_water and not block.tobytes().strip(b"\0"):
+                    if run_start is not None:
+                        written += self._pwrite_all(view[run_start:pos], offset + run_start)
+                        run_start = None
+                    skipped += len(block)
+                else:
+                    if run_start is None:
+                        run_start = pos
+                    self.high_water = max(self.high_water, offset + pos + len(block))
+            if run_start is not None:
+                written += self._pwrite_all(view[run_start:], offset + run_start)
+
+            self.size = max(self.size, offset + len(view))
+            self.bytes_written += written
+            self.bytes_skipped += skipped
+            self.writes += 1
+            self.last_used = time.time()
+            return {"offset": offset, "length": len(view), "written": written, "skipped": skipped, "size": self.size}
+
+    def close(self, sync: bool = True) -> Dict[str, Any]:
+        """
+        关闭会话：截断到逻辑大小（去掉未用完的预分配空间，或补齐末尾的空洞），并可选落盘
+        """
+        with self.lock:
+            try:
+                if os.fstat(self.fd).st_size != self.size:
+                    os.ftruncate(self.fd, self.size)
+                if sync:
+                    os.fsync(self.fd)
+                st = os.fstat(self.fd)
+            finally:
+                os.close(self.fd)
+            return {
+                "size": self.size,
+                "bytes_written": self.bytes_written,
+                "bytes_skipped": self.bytes_skipped,
+                "writes": self.writes,
+                "preallocated": self.preallocated,
+                "allocated_bytes": getattr(st, "st_blocks", 0) * 512
+            }
+
+
+_sessions: Dict[str, WriteSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(file_path: str, expected_size: int = 0, truncate: bool = False, sparse: bool = False) -> str:
+    """打开写入会话，返回会话ID"""
+    now = time.time()
+    with _sessions_lock:
+        for session_id, session in list(_sessions.items()):
+            if now - session.last_used > SESSION_IDLE_TIMEOUT:
+                _sessions.pop(session_id).close(sync=False)
+        if len(_sessions) >= MAX_SESSIONS:
+            raise RuntimeError(f"打开的写入会话过多（上限 {MAX_SESSIONS}），请先关闭不用的会话")
+        session = WriteSession(file_path, expected_size, truncate, sparse)
+        session_id = uuid.uuid4().hex[:16]
+        _sessions[session_id] = session
+        return session_id
+
+
+def get_session(session_id: str) -> WriteSession:
+    """获取写入会话，不存在时抛出 KeyError"""
+    with _sessions_lock:
+        if session_id not in _sessions:
+            raise KeyError(f"写入会话不存在或已关闭: {session_id}")
+        return _sessions[session_id]
+
+
+def close_session(session_id: str, sync: bool = True) -> Dict[str, Any]:
+    """关闭写入会话，返回统计信息"""
+    with _sessions_lock:
+        if session_id not in _sessions:
+            raise KeyError(f"写入会话不存在或已关闭: {session_id}")
+        session = _sessions.pop(session_id)
+    result = session.close(sync)
+    result["path"] = session.path
+    return result
@@ -0,0 +1,181 @@
+"""
+并行 k 路二分查找
+
+在 good..bad 的第一父提交序列上查找第一个测试失败的提交。每一轮同时在 k 个工作树（来自工作树池）中
+测试 k 个均匀分布的提交，把剩余范围分成 k+1 段，轮数约为 log_{k+1}(n)，而 `git bisect` 需要 log_2(n) 轮。
+
+测试命令的退出码沿用 `git bisect run` 的约定：0 表示正常，125 表示无法测试（跳过），
+1-127 的其他值表示有问题，大于 127 或超时则中止查找。
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from git_runner import run_git, kill_process, GitError
+from worktree_pool import worktree_pool, WORKTREE_POOL_SIZE
+
+# 单次测试的默认超时时间（秒）
+BISECT_TEST_TIMEOUT = float(os.environ.get("GIT_OPTION_BISECT_TEST_TIMEOUT", "600"))
+# 每次测试保留的输出长度（字节，取末尾）
+BISECT_OUTPUT_TAIL = 2000
+
+SKIP_EXIT_CODE = 125
+
+
+async def _git(args: List[str], repo: str) -> str:
+    result = await run_git(args, repo)
+    if not result.ok:
+        raise GitError(result.error.strip() or f"git {args[0]} 失败", result.returncode)
+    return result.text.strip()
+
+
+def _classify(exit_code: Optional[int]) -> str:
+    if exit_code is None:
+        return "timeout"
+    if exit_code == 0:
+        return "good"
+    if exit_code == SKIP_EXIT_CODE:
+        return "skip"
+    if 0 < exit_code < 128:
+        return "bad"
+    return "error"
+
+
+def pick_probes(candidates: List[int], k: int) -> List[int]:
+    """从待测的下标中选出 k 个，把范围尽量均匀地分成 k+1 段"""
+    if len(candidates) <= k:
+        return list(candidates)
+    positions = sorted({(j + 1) * len(candidates) // (k + 1) for j in range(k)})
+    return [candidates[min(position, len(candidates) - 1)] for position in positions]
+
+
+async def run_test(repo: str, commit: str, command: str, timeout: float, lease_wait: float) -> Dict[str, Any]:
+    """租用一个检出到 commit 的工作树，在其中执行测试命令"""
+    started = time.monotonic()
+    lease = await worktree_pool.lease(repo, commit, wait=lease_wait)
+    checkout_seconds = time.monotonic() - started
+    try:
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            cwd=lease["worktree"],
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=(os.name == "posix"),
+        )
+        try:
+            output, _ = await asyncio.wait_for(proc.communicate(), timeout)
+            exit_code = proc.returncode
+        except asyncio.TimeoutError:
+            kill_process(proc)
+            output, _ = await proc.communicate()
+            exit_code = None
+        except asyncio.CancelledError:
+            kill_process(proc)
+            raise
+    finally:
+        await worktree_pool.release(lease["lease_id"])
+    return {
+        "commit": commit,
+        "result": _classify(exit_code),
+        "exit_code": exit_code,
+        "checkout_seconds": round(checkout_seconds, 3),
+        "seconds": round(time.monotonic() - started, 3),
+        "output": output[-BISECT_OUTPUT_TAIL:].decode("utf-8", errors="replace"),
+    }
+
+
+async def bisect_run(repo: str, good: str, bad: str, command: str, parallelism: int = 3,
+                     timeout: float = BISECT_TEST_TIMEOUT) -> Dict[str, Any]:
+    """
+    在 good..bad 的第一父提交序列上并行查找第一个测试失败的提交
+
+    Args:
+        repo: 仓库路径
+        good: 已知正常的版本
+        bad: 已知有问题的版本
+        command: 测试命令（在工作树根目录中通过 shell 执行）
+        parallelism: 每轮同时测试的提交数（k），不超过工作树池的容量
+        timeout: 单次测试的超时时间（秒）
+
+    Returns:
+        Dict[str, Any]: 找到的提交（culprit）及其信息、每一轮的测试结果和耗时
+    """
+    good_commit = await _git(['rev-parse', '--verify', '--end-of-options', f'{good}^{{commit}}'], repo)
+    bad_commit = await _git(['rev-parse', '--verify', '--end-of-options', f'{bad}^{{commit}}'], repo)
+    if not (await run_git(['merge-base', '--is-ancestor', good_commit, bad_commit], repo)).ok:
+        raise ValueError(f"{good} 不是 {bad} 的祖先")
+    output = await _git(['rev-list', '--first-parent', '--reverse', bad_commit, f'^{good_commit}'], repo)
+    commits = output.split()
+    if not commits:
+        raise ValueError(f"{good} 与 {bad} 是同一个提交")
+    parallelism = max(1, min(parallelism, WORKTREE_POOL_SIZE))
+
+    # lo 是已知正常的最大下标（-1 表示 good 本身），hi 是已知有问题的最小下标（bad 本身为最后一个）
+    lo, hi = -1, len(commits) - 1
+    skipped = set()
+    rounds = []
+    started = time.monotonic()
+    aborted = None
+    while True:
+        candidates = [i for i in range(lo + 1, hi) if i not in skipped]
+        if not candidates:
+            break
+        probes = pick_probes(candidates, parallelism)
+        round_started = time.monotonic()
+        tasks = [asyncio.ensure_future(run_test(repo, commits[i], command, timeout, timeout)) for i in probes]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # 一个测试出错（例如无法检出）时停止其他测试，确保工作树都被归还
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        for index, result in zip(probes, results):
+            result["index"] = index
+            if result["result"] == "good":
+                lo = max(lo, index)
+            elif result["result"] == "bad":
+                hi = min(hi, index)
+            elif result["result"] == "skip":
+                skipped.add(index)
+            elif aborted is None:
+                reason = "超时" if result["result"] == "timeout" else f"退出码为 {result['exit_code']}"
+                aborted = f"测试 {commits[index]} 时{reason}，查找中止"
+        rounds.append({"probes": results, "remaining": max(0, hi - lo - 1),
+                       "seconds": round(time.monotonic() - round_started, 3)})
+        if aborted:
+            break
+        if lo >= hi:
+            aborted = "测试结果不一致：较新的提交正常而较旧的提交有问题"
+            break
+
+    response = {
+        "good": good_commit,
+        "bad": bad_commit,
+        "commits_in_range": len(commits),
+        "parallelism": parallelism,
+        "tests": sum(len(item["probes"]) for item in rounds),
+        "rounds": rounds,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    if aborted:
+        response.update(culprit=None, message=aborted)
+        return response
+
+    # 跳过的提交夹在中间时无法确定是哪一个，返回所有可能的提交
+    remaining = [commits[i] for i in range(lo + 1, hi + 1)]
+    culprit = remaining[-1] if len(remaining) == 1 else None
+    response["culprit"] = culprit
+    if culprit is None:
+        response["candidates"] = remaining
+        response["message"] = "跳过的提交太多，无法确定第一个有问题的提交"
+    else:
+        info = await _git(['log', '-1', '--format=%H%x1f%an%x1f%ae%x1f%aI%x1f%s', culprit], repo)
+        sha, name, email, date, subject = info.split("\x1f", 4)
+        response["culprit_info"] = {"sha": sha, "author_name": name, "author_email": email, "date": date,
+                                    "subject": subject}
+    return response
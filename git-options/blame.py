@@ -0,0 +1,165 @@
+"""
+git blame 模块
+
+以 `--incremental` 格式流式解析 blame 输出，结果按 (提交, 路径, blob, 选项) 缓存：
+同一个不可变提交中同一个文件的 blame 永远不会变化，重复查询直接从内存返回。
+"""
+
+import os
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional, Tuple
+
+from git_runner import stream_records
+
+# 缓存的 blame 结果数量上限
+BLAME_CACHE_SIZE = int(os.environ.get("GIT_OPTION_BLAME_CACHE_SIZE", "256"))
+
+# 提交信息中保留的字段（incremental 输出中的键 -> 结果中的键）
+_COMMIT_HEADERS = {
+    "author": "author_name",
+    "author-mail": "author_email",
+    "author-time": "author_time",
+    "author-tz": "author_tz",
+    "committer": "committer_name",
+    "committer-mail": "committer_email",
+    "committer-time": "committer_time",
+    "summary": "summary",
+}
+
+
+class BlameResult:
+    """一次 blame 的结果：按最终行号排序的区块列表，以及区块引用的提交信息"""
+
+    def __init__(self, hunks: List[Dict[str, Any]], commits: Dict[str, Dict[str, Any]]):
+        self.hunks = hunks
+        self.commits = commits
+
+    def slice(self, start_line: Optional[int], end_line: Optional[int]) -> "BlameResult":
+        """截取 [start_line, end_line] 范围内的区块（行号从 1 开始，包含两端）"""
+        if start_line is None and end_line is None:
+            return self
+        start = start_line or 1
+        end = end_line or float("inf")
+        hunks = []
+        for hunk in self.hunks:
+            first = hunk["final_line"]
+            last = first + hunk["lines"] - 1
+            if last < start or first > end:
+                continue
+            skip = max(0, start - first)
+            hunk = dict(hunk, final_line=first + skip, orig_line=hunk["orig_line"] + skip,
+                        lines=min(last, end) - first - skip + 1)
+            hunks.append(hunk)
+        commits = {hunk["commit"]: self.commits[hunk["commit"]] for hunk in hunks}
+        return BlameResult(hunks, commits)
+
+
+async def run_blame(repo: str, commit: str, path: str, start_line: Optional[int] = None,
+                    end_line: Optional[int] = None, options: Tuple[str, ...] = ()) -> BlameResult:
+    """
+    运行 `git blame --incremental` 并边读边解析
+
+    Raises:
+        GitError: git blame 失败（例如文件在该提交中不存在）
+    """
+    command = ['blame', '--incremental'] + list(options)
+    if start_line is not None or end_line is not None:
+        command.append(f"-L{start_line or 1},{end_line or ''}")
+    command += [commit, '--', path]
+
+    hunks = []
+    commits: Dict[str, Dict[str, Any]] = {}
+    current = None
+    async with aclosing(stream_records(command, repo, separator=b"\n")) as lines:
+        async for line in lines:
+            text = line.decode("utf-8", errors="replace")
+            if current is None:
+                sha, orig_line, final_line, count = text.split(" ")[:4]
+                current = {"commit": sha, "orig_line": int(orig_line), "final_line": int(final_line),
+                           "lines": int(count)}
+                commits.setdefault(sha, {"sha": sha})
+                continue
+            key, _, value = text.partition(" ")
+            info = commits[current["commit"]]
+            if key in _COMMIT_HEADERS:
+                if key.endswith("-mail"):
+                    value = value.strip("<>")
+                elif key.endswith("-time"):
+                    value = int(value)
+                info[_COMMIT_HEADERS[key]] = value
+            elif key == "boundary":
+                info["boundary"] = True
+            elif key == "previous":
+                current["previous_commit"], _, current["previous_path"] = value.partition(" ")
+            elif key == "filename":
+                # 每个区块以 filename 行结束
+                current["orig_path"] = value
+                hunks.append(current)
+                current = None
+
+    hunks.sort(key=lambda hunk: hunk["final_line"])
+    return BlameResult(hunks, commits)
+
+
+class BlameCache:
+    """blame 结果的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = BLAME_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, BlameResult]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[BlameResult]:
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: tuple, result: BlameResult) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+blame_cache = BlameCache()
+
+
+async def blame(repo: str, commit: str, blob: str, path: str, start_line: Optional[int] = None,
+                end_line: Optional[int] = None, options: Tuple[str, ...] = ()) -> Tuple[BlameResult, bool]:
+    """
+    获取 blame 结果，优先使用缓存；已缓存整个文件时，任意行范围都直接从缓存截取
+
+    Args:
+        repo: 仓库路径
+        commit: 提交ID（必须是已解析的完整ID，保证缓存键不可变）
+        blob: 文件在该提交中的 blob ID
+        path: 文件路径
+        start_line: 起始行（从 1 开始），None 表示从第一行开始
+        end_line: 结束行（包含），None 表示到最后一行
+        options: 额外的 blame 选项，例如 ("-w", "-M")
+
+    Returns:
+        Tuple[BlameResult, bool]: 结果，以及是否命中缓存
+    """
+    root = os.path.realpath(repo)
+    full_key = (root, commit, path, blob, options, None, None)
+    range_key = (root, commit, path, blob, options, start_line, end_line)
+    cached = blame_cache.get(full_key)
+    if cached is not None:
+        blame_cache.hits += 1
+        return cached.slice(start_line, end_line), True
+    cached = blame_cache.get(range_key)
+    if cached is not None:
+        blame_cache.hits += 1
+        return cached, True
+
+    blame_cache.misses += 1
+    result = await run_blame(repo, commit, path, start_line, end_line, options)
+    blame_cache.put(range_key, result)
+    return result, False
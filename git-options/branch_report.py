@@ -0,0 +1,118 @@
+"""
+分支概览
+
+一次 `for-each-ref` 列出所有分支及其最后一次提交的信息（按提交时间倒序），并计算每个分支相对基准分支
+领先/落后的提交数：
+- git >= 2.41 时直接使用 for-each-ref 的 `%(ahead-behind:<基准>)`，在同一个进程中一次遍历算出所有分支的结果
+- 否则对每个不同的分支提交并发执行 `rev-list --left-right --count`（多个分支指向同一提交时只算一次）
+
+两种方式都会利用提交图（commit-graph）加速遍历，后台维护会为操作过的仓库写入提交图。
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from git_runner import run_git, git_version, GitError
+
+# 支持 %(ahead-behind:...) 的最低 git 版本
+AHEAD_BEHIND_ATOM_VERSION = (2, 41)
+
+_REF_FIELDS = ["ref", "name", "commit", "committer_time", "author_name", "author_email", "subject",
+               "upstream", "upstream_track"]
+_REF_FORMAT = "%00".join(["%(refname)", "%(refname:short)", "%(objectname)", "%(committerdate:unix)",
+                          "%(authorname)", "%(authoremail:trim)", "%(subject)", "%(upstream:short)",
+                          "%(upstream:track,nobracket)"])
+
+
+async def _git(args: List[str], repo: str) -> str:
+    result = await run_git(args, repo)
+    if not result.ok:
+        raise GitError(result.error.strip() or f"git {args[0]} 失败", result.returncode)
+    return result.text
+
+
+async def _ahead_behind(repo: str, base: str, commit: str) -> Tuple[int, int]:
+    """commit 相对 base 领先（base 中没有的提交）和落后的提交数"""
+    if commit == base:
+        return 0, 0
+    output = await _git(['rev-list', '--left-right', '--count', f'{base}...{commit}'], repo)
+    behind, ahead = output.split()
+    return int(ahead), int(behind)
+
+
+async def _merge_base(repo: str, base: str, commit: str) -> Optional[str]:
+    result = await run_git(['merge-base', base, commit], repo)
+    return result.text.strip() if result.ok else None
+
+
+async def branch_report(repo: str, base: Optional[str] = None, include_remotes: bool = False,
+                        patterns: Optional[List[str]] = None, include_merge_base: bool = False,
+                        limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    所有分支相对基准分支的领先/落后情况以及最后一次提交的信息
+
+    Args:
+        repo: 仓库路径
+        base: 基准版本，不指定则使用 HEAD
+        include_remotes: 是否包括远程跟踪分支
+        patterns: 只包括匹配这些模式的引用（for-each-ref 的模式，例如 refs/heads/feature/）
+        include_merge_base: 是否计算每个分支与基准的合并基础（每个不同的提交执行一次 merge-base）
+        limit: 只返回最近提交的若干个分支
+
+    Returns:
+        Dict[str, Any]: 基准提交、使用的计算方式以及分支列表
+    """
+    base_name = base or "HEAD"
+    base_commit = (await _git(['rev-parse', '--verify', '--end-of-options', f'{base_name}^{{commit}}'],
+                              repo)).strip()
+    use_atom = await git_version() >= AHEAD_BEHIND_ATOM_VERSION
+
+    # 字段之间用 NUL 分隔，每条记录以 NUL 加换行结束（提交主题和作者名中可能含有各种换行类字符）
+    ref_format = _REF_FORMAT + (f"%00%(ahead-behind:{base_commit})" if use_atom else "") + "%00"
+    command = ['for-each-ref', '--sort=-committerdate', f'--format={ref_format}']
+    if patterns:
+        command += patterns
+    else:
+        command += ['refs/heads/'] + (['refs/remotes/'] if include_remotes else [])
+
+    branches = []
+    for record in (await _git(command, repo)).split("\0\n")[:-1]:
+        values = record.split("\0")
+        branch: Dict[str, Any] = dict(zip(_REF_FIELDS, values))
+        if branch["ref"].startswith("refs/remotes/") and branch["ref"].endswith("/HEAD"):
+            continue
+        branch["committer_time"] = int(branch["committer_time"] or 0)
+        branch["upstream"] = branch["upstream"] or None
+        branch["upstream_track"] = branch["upstream_track"] or None
+        if use_atom:
+            ahead, behind = values[len(_REF_FIELDS)].split()
+            branch["ahead"], branch["behind"] = int(ahead), int(behind)
+        branches.append(branch)
+    # 在排除远程的 HEAD 之后再截取，保证返回的数量
+    if limit:
+        branches = branches[:limit]
+
+    # 多个分支指向同一提交时只计算一次
+    commits = list(dict.fromkeys(branch["commit"] for branch in branches))
+    if not use_atom:
+        counts = dict(zip(commits, await asyncio.gather(*(_ahead_behind(repo, base_commit, commit)
+                                                          for commit in commits))))
+        for branch in branches:
+            branch["ahead"], branch["behind"] = counts[branch["commit"]]
+    if include_merge_base:
+        bases = dict(zip(commits, await asyncio.gather(*(_merge_base(repo, base_commit, commit)
+                                                         for commit in commits))))
+        for branch in branches:
+            branch["merge_base"] = bases[branch["commit"]]
+    for branch in branches:
+        # 没有基准中不存在的提交，即已经合并到基准
+        branch["merged"] = branch["ahead"] == 0
+
+    return {
+        "base": base_name,
+        "base_commit": base_commit,
+        "method": "ahead-behind" if use_atom else "rev-list",
+        "total": len(branches),
+        "merged": sum(branch["merged"] for branch in branches),
+        "branches": branches,
+    }
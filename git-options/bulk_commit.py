@@ -0,0 +1,201 @@
+"""
+不经过工作区的批量提交
+
+直接用底层命令构建提交：在临时索引文件中读入父提交的树，`hash-object -w --stdin-paths` 一次写入所有 blob，
+`update-index --index-info` 一次更新所有条目，`write-tree` + `commit-tree` 生成提交，
+最后用 `update-ref <新值> <旧值>` 原子地更新引用（引用在此期间被其他人修改时失败，不会覆盖别人的提交）。
+目标是当前检出的分支时，再用两棵树的 `read-tree -m` 把暂存区同步到新提交，避免下一次普通提交把这次的变更还原。
+"""
+
+import os
+import base64
+import asyncio
+import tempfile
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional
+
+from git_runner import run_git, stream_records, git_dirs, GitError
+
+ZERO_OID = "0" * 40
+DEFAULT_FILE_MODE = "100644"
+VALID_MODES = {"100644", "100755", "120000"}
+
+
+async def _git(args: List[str], repo: str, env: Optional[Dict[str, str]] = None,
+               input: Optional[bytes] = None, allow_failure: bool = False) -> Optional[str]:
+    """执行 git 命令并返回去掉首尾空白的输出；失败时抛出 GitError（allow_failure 时返回 None）"""
+    result = await run_git(args, repo, input=input, env=env)
+    if not result.ok:
+        if allow_failure:
+            return None
+        raise GitError(result.error.strip() or f"git {args[0]} 失败", result.returncode)
+    return result.text.strip()
+
+
+def _check_path(path: str) -> str:
+    """规范化仓库内的相对路径，拒绝绝对路径、.. 以及 .git 目录"""
+    parts = [part for part in path.replace("\\", "/").split("/") if part and part != "."]
+    if not parts or path.startswith("/") or ".." in parts or parts[0] == ".git" or "\0" in path or "\n" in path:
+        raise ValueError(f"无效的文件路径: {path}")
+    return "/".join(parts)
+
+
+def _write_blobs(directory: str, contents: List[bytes]) -> List[str]:
+    """把内容写入临时文件，返回文件路径列表"""
+    files = []
+    for i, data in enumerate(contents):
+        file_path = os.path.join(directory, str(i))
+        with open(file_path, "wb") as f:
+            f.write(data)
+        files.append(file_path)
+    return files
+
+
+async def _current_modes(repo: str, env: Dict[str, str], paths: set) -> Dict[str, str]:
+    """从临时索引中读取已有文件的模式（用于保留可执行位和符号链接）"""
+    modes = {}
+    async with aclosing(stream_records(['ls-files', '--stage', '-z'], repo, env=env)) as records:
+        async for record in records:
+            meta, name = record.split(b"\t", 1)
+            name = name.decode("utf-8", errors="surrogateescape")
+            if name in paths:
+                modes[name] = meta.split(b" ", 1)[0].decode()
+    return modes
+
+
+async def commit_changes(repo: str, changes: List[Dict[str, Any]], message: str, branch: Optional[str] = None,
+                         expected_parent: Optional[str] = None, author_name: Optional[str] = None,
+                         author_email: Optional[str] = None, allow_empty: bool = False,
+                         update_worktree: bool = False) -> Dict[str, Any]:
+    """
+    不经过工作区，直接根据文件变更创建提交并原子地更新分支
+
+    Args:
+        repo: 仓库路径
+        changes: 变更列表，每项为 {"path", "content", "encoding": "utf-8"|"base64", "mode"} 或 {"path", "delete": True}
+        message: 提交信息
+        branch: 目标分支，不指定则使用当前检出的分支
+        expected_parent: 期望的分支当前提交，不一致时失败；不指定则以开始时读到的值为准
+        author_name: 作者名称，不指定则使用仓库配置
+        author_email: 作者邮箱，不指定则使用仓库配置
+        allow_empty: 树没有变化时是否仍然创建提交
+        update_worktree: 目标分支是当前检出的分支时，是否同时更新工作区（暂存区总是会同步）
+
+    Returns:
+        Dict[str, Any]: 新提交、树、引用和父提交
+
+    Raises:
+        GitError: git 命令失败，或引用在此期间被修改
+        ValueError: 变更内容无效
+    """
+    if not changes and not allow_empty:
+        raise ValueError("没有任何变更")
+
+    # 解析目标引用
+    head_ref = await _git(['symbolic-ref', '-q', 'HEAD'], repo, allow_failure=True)
+    if branch:
+        ref = branch if branch.startswith("refs/") else f"refs/heads/{branch}"
+    elif head_ref:
+        ref = head_ref
+    else:
+        raise GitError("HEAD 处于分离状态，请指定 branch")
+    if await _git(['check-ref-format', ref], repo, allow_failure=True) is None:
+        raise ValueError(f"无效的引用名称: {ref}")
+
+    parent = await _git(['rev-parse', '-q', '--verify', f'{ref}^{{commit}}'], repo, allow_failure=True)
+    if expected_parent is not None:
+        expected = await _git(['rev-parse', '-q', '--verify', f'{expected_parent}^{{commit}}'], repo,
+                              allow_failure=True)
+        if expected != parent:
+            raise GitError(f"{ref} 当前指向 {parent or '(不存在)'}，与期望的 {expected_parent} 不一致")
+
+    # 整理变更：同一路径出现多次时以最后一次为准
+    entries: Dict[str, Dict[str, Any]] = {}
+    for change in changes:
+        path = _check_path(change["path"])
+        if change.get("delete"):
+            entries[path] = {"delete": True}
+            continue
+        mode = change.get("mode")
+        if mode is not None and mode not in VALID_MODES:
+            raise ValueError(f"不支持的文件模式: {mode}")
+        content = change.get("content", "")
+        data = base64.b64decode(content) if change.get("encoding") == "base64" else content.encode("utf-8")
+        entries[path] = {"data": data, "mode": mode}
+
+    git_dir, _ = await git_dirs(repo)
+    fd, index_file = tempfile.mkstemp(prefix="mcp-index-", dir=git_dir)
+    os.close(fd)
+    os.remove(index_file)
+    env = {"GIT_INDEX_FILE": index_file}
+    try:
+        await _git(['read-tree', parent] if parent else ['read-tree', '--empty'], repo, env)
+
+        writes = [(path, entry) for path, entry in entries.items() if not entry.get("delete")]
+        oids: List[str] = []
+        if writes:
+            with tempfile.TemporaryDirectory(prefix="mcp-blobs-", dir=git_dir) as directory:
+                files = await asyncio.to_thread(_write_blobs, directory, [entry["data"] for _, entry in writes])
+                # --no-filters：内容按原样存储，不受临时文件路径上的属性影响
+                output = await _git(['hash-object', '-w', '--no-filters', '--stdin-paths'], repo, env,
+                                    input="".join(f + "\n" for f in files).encode())
+                oids = output.split()
+            if len(oids) != len(writes):
+                raise GitError("hash-object 输出的对象数与文件数不一致")
+
+        modes = {}
+        if parent and any(entry.get("mode") is None for _, entry in writes):
+            modes = await _current_modes(repo, env, {path for path, entry in writes if entry.get("mode") is None})
+
+        index_info = []
+        for (path, entry), oid in zip(writes, oids):
+            mode = entry["mode"] or modes.get(path, DEFAULT_FILE_MODE)
+            index_info.append(f"{mode} {oid}\t{path}")
+        for path, entry in entries.items():
+            if entry.get("delete"):
+                index_info.append(f"0 {ZERO_OID}\t{path}")
+        if index_info:
+            await _git(['update-index', '-z', '--index-info'], repo, env,
+                       input="".join(line + "\0" for line in index_info).encode("utf-8", errors="surrogateescape"))
+
+        tree = await _git(['write-tree'], repo, env)
+    finally:
+        if os.path.exists(index_file):
+            os.remove(index_file)
+
+    if parent and not allow_empty:
+        parent_tree = await _git(['rev-parse', f'{parent}^{{tree}}'], repo)
+        if parent_tree == tree:
+            return {"ref": ref, "commit": None, "tree": tree, "parent": parent, "changed": False}
+
+    commit_env = {}
+    if author_name:
+        commit_env["GIT_AUTHOR_NAME"] = author_name
+    if author_email:
+        commit_env["GIT_AUTHOR_EMAIL"] = author_email
+    commit = await _git(['commit-tree', tree] + (['-p', parent] if parent else []) + ['-F', '-'], repo,
+                        commit_env or None, input=message.encode("utf-8"))
+
+    # 旧值为空表示引用此前必须不存在；引用在此期间被修改时 update-ref 失败
+    await _git(['update-ref', '-m', f'commit (bulk): {message.splitlines()[0] if message else ""}',
+                ref, commit, parent or ""], repo)
+
+    result = {"ref": ref, "commit": commit, "tree": tree, "parent": parent, "changed": True,
+              "files": len(entries), "index_updated": False, "worktree_updated": False}
+    if ref == head_ref:
+        # 两棵树的快进合并：只改写发生变化的条目，暂存的修改与之冲突时失败（提交本身已经完成）。
+        # 不同步暂存区的话，下一次普通的 git commit 会把这次的变更还原
+        old_tree = parent or await _git(['hash-object', '-w', '-t', 'tree', '--stdin'], repo, input=b"")
+        try:
+            if update_worktree:
+                # 刷新索引中的文件状态信息，否则内容未变但状态信息过期的文件会被当作有本地修改
+                await _git(['update-index', '-q', '--refresh'], repo, allow_failure=True)
+            await _git(['read-tree', '-m'] + (['-u'] if update_worktree else []) + [old_tree, commit], repo)
+            result["index_updated"] = True
+            result["worktree_updated"] = update_worktree
+        except GitError as e:
+            result["warning"] = f"提交已创建，但同步{'暂存区和工作区' if update_worktree else '暂存区'}失败: {e}"
+        else:
+            if not update_worktree:
+                result["warning"] = "目标分支是当前检出的分支，暂存区已同步，工作区中的文件未更新"
+    return result
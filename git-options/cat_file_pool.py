@@ -0,0 +1,214 @@
+"""
+常驻的 git cat-file 进程池
+
+为每个仓库维护长期运行的 `git cat-file --batch` / `--batch-check` 进程，通过管道读取对象，
+避免每次查询都 fork/exec 一个新的 git 进程。进程意外退出时自动重启，空闲一段时间后自动关闭。
+"""
+
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from git_runner import spawn_git, kill_process, GitError
+
+# 进程空闲多久（秒）后关闭
+CAT_FILE_IDLE_TIMEOUT = float(os.environ.get("GIT_OPTION_CAT_FILE_IDLE", "60"))
+# 每个仓库、每种模式最多同时运行的进程数
+CAT_FILE_WORKERS = int(os.environ.get("GIT_OPTION_CAT_FILE_WORKERS", "2"))
+# 单次对象请求的超时时间（秒）
+CAT_FILE_TIMEOUT = float(os.environ.get("GIT_OPTION_CAT_FILE_TIMEOUT", "30"))
+
+_READ_CHUNK = 256 * 1024
+
+
+@dataclass
+class GitObject:
+    """对象查询结果；data 只包含请求的字节范围，批量检查模式下为 None"""
+    oid: str
+    type: str
+    size: int
+    data: Optional[bytes] = None
+
+
+class CatFileWorker:
+    """单个 `git cat-file --batch` 或 `--batch-check` 进程"""
+
+    def __init__(self, repo: str, check_only: bool):
+        self.repo = repo
+        self.check_only = check_only
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.restarts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def _start(self) -> None:
+        if self.proc is not None:
+            self.restarts += 1
+        mode = "--batch-check" if self.check_only else "--batch"
+        self.proc = await spawn_git(["cat-file", mode], self.repo, stdin=True)
+
+    async def _read_body(self, size: int, offset: int, length: Optional[int]) -> bytes:
+        """读取对象内容（以及末尾的换行），只保留 [offset, offset + length) 范围"""
+        end = size if length is None else min(size, offset + length)
+        kept = []
+        pos = 0
+        remaining = size + 1
+        while remaining > 0:
+            chunk = await self.proc.stdout.readexactly(min(_READ_CHUNK, remaining))
+            chunk_end = pos + len(chunk)
+            if chunk_end > offset and pos < end:
+                kept.append(chunk[max(0, offset - pos):end - pos])
+            pos = chunk_end
+            remaining -= len(chunk)
+        return b"".join(kept)
+
+    async def _request(self, spec: str, offset: int, length: Optional[int]) -> Optional[GitObject]:
+        self.proc.stdin.write(spec.encode() + b"\n")
+        await self.proc.stdin.drain()
+        header = await self.proc.stdout.readline()
+        if not header:
+            raise ConnectionResetError("git cat-file 进程已退出")
+        header = header.rstrip(b"\n")
+        if header.endswith(b" missing") or header.endswith(b" ambiguous"):
+            return None
+        oid, object_type, size = header.decode().split(" ")
+        size = int(size)
+        if self.check_only:
+            return GitObject(oid, object_type, size)
+        return GitObject(oid, object_type, size, await self._read_body(size, offset, length))
+
+    async def request(self, spec: str, offset: int = 0, length: Optional[int] = None) -> Optional[GitObject]:
+        """
+        查询一个对象，进程已退出时自动重启并重试一次
+
+        Returns:
+            Optional[GitObject]: 对象不存在或名称有歧义时返回 None
+        """
+        if "\n" in spec:
+            raise ValueError("对象名称不能包含换行符")
+        async with self.lock:
+            self.last_used = time.monotonic()
+            for attempt in range(2):
+                if not self.alive:
+                    await self._start()
+                try:
+                    return await asyncio.wait_for(self._request(spec, offset, length), CAT_FILE_TIMEOUT)
+                except (BrokenPipeError, ConnectionResetError, asyncio.IncompleteReadError):
+                    error = await self._exit_error()
+                    await self.close()
+                    if attempt:
+                        raise GitError(error or "git cat-file 进程意外退出")
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    # 协议状态未知，直接丢弃这个进程
+                    await self.close()
+                    raise
+                finally:
+                    self.last_used = time.monotonic()
+
+    async def _exit_error(self) -> str:
+        """进程已退出时读取它的错误输出（例如路径不是 git 仓库）"""
+        try:
+            await asyncio.wait_for(self.proc.wait(), 1)
+            return (await self.proc.stderr.read()).decode("utf-8", errors="replace").strip()
+        except (asyncio.TimeoutError, OSError):
+            return ""
+
+    async def close(self) -> None:
+        """关闭进程：先关闭标准输入让 git 正常退出，超时则强制结束"""
+        proc, self.proc = self.proc, None
+        if proc is None or proc.returncode is not None:
+            return
+        try:
+            proc.stdin.close()
+            await asyncio.wait_for(proc.wait(), 2)
+        except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+            kill_process(proc)
+            await proc.wait()
+
+
+class CatFilePool:
+    """按仓库管理 cat-file 进程"""
+
+    def __init__(self, idle_timeout: float = CAT_FILE_IDLE_TIMEOUT, workers_per_repo: int = CAT_FILE_WORKERS):
+        self.idle_timeout = idle_timeout
+        self.workers_per_repo = workers_per_repo
+        self._workers: Dict[Tuple[str, bool], List[CatFileWorker]] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def _worker(self, repo: str, check_only: bool) -> CatFileWorker:
+        """优先选择空闲的进程，没有空闲进程且未达上限时新建"""
+        key = (os.path.realpath(repo), check_only)
+        workers = self._workers.setdefault(key, [])
+        for worker in workers:
+            if not worker.lock.locked():
+                return worker
+        if len(workers) < self.workers_per_repo:
+            worker = CatFileWorker(key[0], check_only)
+            workers.append(worker)
+            self._ensure_reaper()
+            return worker
+        return min(workers, key=lambda w: w.last_used)
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap())
+
+    async def _reap(self) -> None:
+        """定期关闭空闲的进程，所有进程都关闭后退出"""
+        while self._workers:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+            now = time.monotonic()
+            for key, workers in list(self._workers.items()):
+                for worker in list(workers):
+                    if not worker.lock.locked() and now - worker.last_used >= self.idle_timeout:
+                        workers.remove(worker)
+                        await worker.close()
+                if not workers:
+                    del self._workers[key]
+
+    async def read(self, repo: str, spec: str, offset: int = 0, length: Optional[int] = None) -> Optional[GitObject]:
+        """
+        读取对象内容
+
+        Args:
+            repo: 仓库路径
+            spec: 对象名称，如 "HEAD:README.md"、提交或 blob 的 ID
+            offset: 内容的起始字节
+            length: 读取的字节数，None 表示读到末尾
+
+        Returns:
+            Optional[GitObject]: 对象不存在时返回 None
+        """
+        return await self._worker(repo, False).request(spec, offset, length)
+
+    async def info(self, repo: str, spec: str) -> Optional[GitObject]:
+        """查询对象的 ID、类型和大小，不读取内容"""
+        return await self._worker(repo, True).request(spec)
+
+    def stats(self) -> List[Dict[str, object]]:
+        """当前进程池状态"""
+        now = time.monotonic()
+        return [{
+            "repo": repo,
+            "mode": "batch-check" if check_only else "batch",
+            "alive": worker.alive,
+            "busy": worker.lock.locked(),
+            "idle_seconds": round(now - worker.last_used, 1),
+            "restarts": worker.restarts,
+        } for (repo, check_only), workers in self._workers.items() for worker in workers]
+
+    async def close(self) -> None:
+        """关闭所有进程"""
+        workers = [worker for workers in self._workers.values() for worker in workers]
+        self._workers.clear()
+        for worker in workers:
+            await worker.close()
+
+
+cat_file_pool = CatFilePool()
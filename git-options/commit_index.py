@@ -0,0 +1,341 @@
+"""
+提交元数据索引
+
+为每个仓库维护一个 SQLite 索引（存放在公共 git 目录下），记录所有分支、标签和远程分支可达的提交的
+作者、时间、提交信息以及涉及的文件和增删行数，按作者/时间/关键词/路径查询时不再需要重新遍历历史。
+
+索引按引用增量更新：只遍历上次索引的各引用位置之后新增的提交；某个引用被改写（旧的提交不再可达）时，
+删除不再被任何引用包含的提交。
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import datetime
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional
+
+from git_runner import run_git, stream_records, git_dirs, GitError
+from git_parsers import parse_log_record
+from cat_file_pool import cat_file_pool
+
+INDEX_FILE_NAME = "mcp-commit-index.sqlite"
+# 建立/更新索引时遍历历史的超时时间（秒），首次索引大仓库可能需要较长时间
+INDEX_TIMEOUT = float(os.environ.get("GIT_OPTION_INDEX_TIMEOUT", "3600"))
+# 被索引的引用
+INDEX_REF_PATTERNS = ["refs/heads", "refs/tags", "refs/remotes"]
+
+_INSERT_BATCH = 2000
+_INDEX_FIELDS = ["sha", "author_name", "author_email", "author_time", "committer_time", "subject", "body"]
+_INDEX_FORMAT = "%x1e" + "%x1f".join(["%H", "%an", "%ae", "%at", "%ct", "%s", "%b"]) + "%x1f"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY,
+    author_name TEXT,
+    author_email TEXT,
+    author_time INTEGER,
+    committer_time INTEGER,
+    subject TEXT,
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_commits_committer_time ON commits(committer_time);
+CREATE INDEX IF NOT EXISTS idx_commits_author ON commits(author_email, author_name);
+CREATE TABLE IF NOT EXISTS commit_files (
+    sha TEXT NOT NULL,
+    path TEXT NOT NULL,
+    added INTEGER,
+    deleted INTEGER,
+    PRIMARY KEY (sha, path)
+);
+CREATE INDEX IF NOT EXISTS idx_commit_files_path ON commit_files(path);
+CREATE TABLE IF NOT EXISTS refs (
+    name TEXT PRIMARY KEY,
+    tip TEXT NOT NULL
+);
+"""
+# FTS 表的 rowid 与 commits 表的 rowid 一致（按 rowid 删除，避免扫描整个 FTS 表），之前的索引需要重建 FTS 表
+_FTS_ROWID_VERSION = 1
+
+
+def _iso(timestamp: int) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+class CommitIndex:
+    """单个仓库的提交元数据索引"""
+
+    def __init__(self, repo: str, db_path: str):
+        self.repo = repo
+        self.db_path = db_path
+        self.lock = asyncio.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS commits_fts USING fts5(sha UNINDEXED, subject, body)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite 未编译 FTS5 时退化为 LIKE 查询
+            self.fts = False
+        if self.fts and self._conn.execute("PRAGMA user_version").fetchone()[0] < _FTS_ROWID_VERSION:
+            self._conn.execute("DELETE FROM commits_fts")
+            self._conn.execute("INSERT INTO commits_fts (rowid, sha, subject, body) "
+                               "SELECT rowid, sha, subject, body FROM commits")
+            self._conn.execute(f"PRAGMA user_version = {_FTS_ROWID_VERSION}")
+        self._conn.commit()
+
+    # ---- 以下同步方法在线程池中执行 ----
+
+    def _load_refs(self) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT name, tip FROM refs"))
+
+    def _insert_commits(self, commits: List[Dict[str, Any]]) -> None:
+        fts_rows = []
+        for c in commits:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO commits (sha, author_name, author_email, author_time, committer_time, subject, "
+                "body) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (c["sha"], c["author_name"], c["author_email"], int(c["author_time"]), int(c["committer_time"]),
+                 c["subject"], c["body"].strip())
+            )
+            # 已存在的提交不再重复写入 FTS 表
+            if cursor.rowcount:
+                fts_rows.append((cursor.lastrowid, c["sha"], c["subject"], c["body"].strip()))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO commit_files (sha, path, added, deleted) VALUES (?, ?, ?, ?)",
+            [(c["sha"], f["path"], f["added"], f["deleted"]) for c in commits for f in c["files"]]
+        )
+        if self.fts:
+            self._conn.executemany("INSERT INTO commits_fts (rowid, sha, subject, body) VALUES (?, ?, ?, ?)", fts_rows)
+
+    def _delete_commits(self, shas: List[str]) -> int:
+        rows = [(sha,) for sha in shas]
+        if self.fts:
+            rowids = [row for (sha,) in rows for row in self._conn.execute(
+                "SELECT rowid FROM commits WHERE sha = ?", (sha,))]
+            self._conn.executemany("DELETE FROM commits_fts WHERE rowid = ?", rowids)
+        before = self._conn.total_changes
+        self._conn.executemany("DELETE FROM commits WHERE sha = ?", rows)
+        deleted = self._conn.total_changes - before
+        self._conn.executemany("DELETE FROM commit_files WHERE sha = ?", rows)
+        return deleted
+
+    def _delete_unreachable(self, reachable: List[str]) -> int:
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS reachable (sha TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM reachable")
+        self._conn.executemany("INSERT OR IGNORE INTO reachable (sha) VALUES (?)", [(sha,) for sha in reachable])
+        orphans = [row[0] for row in self._conn.execute(
+            "SELECT sha FROM commits WHERE sha NOT IN (SELECT sha FROM reachable)")]
+        self._conn.execute("DELETE FROM reachable")
+        return self._delete_commits(orphans)
+
+    def _save_refs(self, refs: Dict[str, str]) -> None:
+        self._conn.execute("DELETE FROM refs")
+        self._conn.executemany("INSERT INTO refs (name, tip) VALUES (?, ?)", list(refs.items()))
+        self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
+
+    # ---- 异步接口 ----
+
+    async def _current_refs(self) -> Dict[str, str]:
+        """当前所有被索引引用指向的提交（标签会解引用到提交）"""
+        result = await run_git(
+            ["for-each-ref", "--format=%(refname)%00%(objecttype)%00%(objectname)%00%(*objecttype)%00%(*objectname)"]
+            + INDEX_REF_PATTERNS, self.repo)
+        if not result.ok:
+            raise GitError(result.error.strip(), result.returncode)
+        refs = {}
+        for line in result.text.splitlines():
+            name, object_type, oid, peeled_type, peeled_oid = line.split("\0")
+            if object_type == "commit":
+                refs[name] = oid
+            elif peeled_type == "commit":
+                refs[name] = peeled_oid
+        return refs
+
+    async def _rev_list(self, revisions: List[str]) -> List[str]:
+        """通过标准输入传入版本列表（避免命令行过长），返回可达的提交"""
+        shas = []
+        async with aclosing(stream_records(["rev-list", "--stdin"], self.repo, b"\n", INDEX_TIMEOUT,
+                                           input="\n".join(revisions).encode() + b"\n")) as records:
+            async for record in records:
+                shas.append(record.decode())
+        return shas
+
+    async def _object_exists(self, oid: str) -> bool:
+        return await cat_file_pool.info(self.repo, f"{oid}^{{commit}}") is not None
+
+    async def update(self) -> Dict[str, Any]:
+        """
+        增量更新索引
+
+        Returns:
+            Dict[str, Any]: 新增、删除的提交数以及索引中的提交总数
+        """
+        async with self.lock:
+            start = time.monotonic()
+            old_refs = await asyncio.to_thread(self._load_refs)
+            new_refs = await self._current_refs()
+            if old_refs == new_refs:
+                return {"updated": False, "added": 0, "removed": 0,
+                        "total_commits": await asyncio.to_thread(self._count), "seconds": 0.0}
+
+            try:
+                old_tips = set(old_refs.values())
+                new_tips = set(new_refs.values())
+                existing_old = [tip for tip in old_tips if await self._object_exists(tip)]
+
+                # 引用被删除或改写：删除不再被任何引用包含的提交
+                removed = 0
+                vanished = old_tips - new_tips
+                if vanished:
+                    if vanished.issubset(existing_old):
+                        orphans = await self._rev_list(sorted(vanished) + [f"^{tip}" for tip in sorted(new_tips)])
+                        removed = await asyncio.to_thread(self._delete_commits, orphans)
+                    else:
+                        # 旧提交已被 gc 清理，无法计算差集，按当前引用的可达集合重新校对
+                        reachable = await self._rev_list(sorted(new_tips))
+                        removed = await asyncio.to_thread(self._delete_unreachable, reachable)
+
+                # 只遍历旧位置之后新增的提交：索引中已包含旧引用可达的全部提交
+                added = 0
+                fresh = new_tips - old_tips
+                if fresh:
+                    revisions = sorted(fresh) + [f"^{tip}" for tip in sorted(existing_old)]
+                    command = ["log", "--stdin", "-z", f"--format={_INDEX_FORMAT}", "--numstat", "--no-renames"]
+                    batch = []
+                    async with aclosing(stream_records(command, self.repo, b"\x1e", INDEX_TIMEOUT,
+                                                       input="\n".join(revisions).encode() + b"\n")) as records:
+                        async for record in records:
+                            if not record:
+                                continue
+                            batch.append(parse_log_record(record, True, _INDEX_FIELDS))
+                            if len(batch) >= _INSERT_BATCH:
+                                await asyncio.to_thread(self._insert_commits, batch)
+                                added += len(batch)
+                                batch = []
+                    if batch:
+                        await asyncio.to_thread(self._insert_commits, batch)
+                        added += len(batch)
+
+                # 引用位置与提交在同一个事务中提交，中途失败时回滚，下次会重新遍历
+                await asyncio.to_thread(self._save_refs, new_refs)
+            except BaseException:
+                # 遍历中途失败或超时：丢弃已经写入的部分，避免下次更新时与重新遍历的结果一起提交
+                await asyncio.to_thread(self._conn.rollback)
+                raise
+            return {"updated": True, "added": added, "removed": removed,
+                    "total_commits": await asyncio.to_thread(self._count),
+                    "seconds": round(time.monotonic() - start, 3)}
+
+    def _query(self, author: Optional[str], since: Optional[int], until: Optional[int], text: Optional[str],
+               path: Optional[str], limit: int, offset: int) -> List[Dict[str, Any]]:
+        where = []
+        params: List[Any] = []
+        if author:
+            where.append("(author_name LIKE ? OR author_email LIKE ?)")
+            params += [f"%{author}%", f"%{author}%"]
+        if since is not None:
+            where.append("committer_time >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("committer_time <= ?")
+            params.append(until)
+        if text:
+            if self.fts:
+                where.append("rowid IN (SELECT rowid FROM commits_fts WHERE commits_fts MATCH ?)")
+                params.append(" ".join('"{}"'.format(token.replace('"', '""')) for token in text.split()))
+            else:
+                where.append("(subject LIKE ? OR body LIKE ?)")
+                params += [f"%{text}%", f"%{text}%"]
+        if path:
+            # 精确匹配文件，或匹配目录下的所有文件（'/' 的下一个字符是 '0'）
+            path = path.strip("/")
+            where.append("sha IN (SELECT sha FROM commit_files WHERE path = ? OR (path >= ? AND path < ?))")
+            params += [path, path + "/", path + "0"]
+        sql = ("SELECT sha, author_name, author_email, author_time, committer_time, subject FROM commits"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY committer_time DESC LIMIT ? OFFSET ?")
+        rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [{
+            "sha": sha,
+            "author_name": author_name,
+            "author_email": author_email,
+            "author_date": _iso(author_time),
+            "committer_date": _iso(committer_time),
+            "subject": subject,
+        } for sha, author_name, author_email, author_time, committer_time, subject in rows]
+
+    def _commit_files(self, shas: List[str]) -> Dict[str, Dict[str, Any]]:
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (sha TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM wanted")
+        self._conn.executemany("INSERT OR IGNORE INTO wanted (sha) VALUES (?)", [(sha,) for sha in shas])
+        commits = {}
+        for sha, author_name, author_email, author_time in self._conn.execute(
+                "SELECT c.sha, c.author_name, c.author_email, c.author_time FROM commits c JOIN wanted w ON c.sha = w.sha"):
+            commits[sha] = {"sha": sha, "author_name": author_name, "author_email": author_email,
+                            "author_time": author_time, "files": []}
+        for sha, path, added, deleted in self._conn.execute(
+                "SELECT f.sha, f.path, f.added, f.deleted FROM commit_files f JOIN wanted w ON f.sha = w.sha"):
+            commits[sha]["files"].append({"path": path, "added": added, "deleted": deleted})
+        self._conn.execute("DELETE FROM wanted")
+        return commits
+
+    async def commit_files(self, shas: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        读取一批提交的作者、时间和涉及的文件（含增删行数），不在索引中的提交不会出现在结果中
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 提交ID -> {sha, author_name, author_email, author_time, files}
+        """
+        async with self.lock:
+            return await asyncio.to_thread(self._commit_files, shas)
+
+    async def query(self, author: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+                    text: Optional[str] = None, path: Optional[str] = None,
+                    limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        查询索引中的提交（按提交时间倒序）
+
+        Args:
+            author: 作者名称或邮箱（子串匹配）
+            since: 起始时间戳（提交时间）
+            until: 结束时间戳（提交时间）
+            text: 提交信息全文检索关键词（多个词需同时出现）
+            path: 文件或目录路径
+            limit: 返回条数
+            offset: 分页起始位置
+        """
+        async with self.lock:
+            return await asyncio.to_thread(self._query, author, since, until, text, path, limit, offset)
+
+
+_indexes: Dict[str, CommitIndex] = {}
+
+
+async def get_commit_index(repo: str, create: bool = True) -> Optional[CommitIndex]:
+    """
+    获取仓库的提交索引
+
+    Args:
+        repo: 仓库路径
+        create: 索引文件不存在时是否创建；为 False 且尚未建立索引时返回 None
+    """
+    _, common_dir = await git_dirs(repo)
+    db_path = os.path.join(common_dir, INDEX_FILE_NAME)
+    if db_path not in _indexes:
+        if not create and not os.path.exists(db_path):
+            return None
+        _indexes[db_path] = CommitIndex(repo, db_path)
+    return _indexes[db_path]
+
+
+async def parse_git_date(repo: str, text: str) -> int:
+    """使用 git 的日期解析规则（支持 "1 week ago"、"2023-01-01" 等）把日期转换为时间戳"""
+    result = await run_git(["rev-parse", f"--since={text}"], repo)
+    if not result.ok or not result.text.startswith("--max-age="):
+        raise GitError(f"无法解析日期: {text}")
+    return int(result.text.strip().split("=", 1)[1])
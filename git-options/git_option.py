@@ -1,129 +1,192 @@
 from mcp.server.fastmcp import FastMCP
-import subprocess
-from typing import List, Optional
+import os
+import re
+import time
+import asyncio
+import base64
+from contextlib import aclosing
+from typing import List, Optional, Dict, Any
+
+from git_runner import run_git, stream_git, stream_records, git_dirs, GitError, GIT_DEFAULT_TIMEOUT, GIT_NETWORK_TIMEOUT, GIT_MAX_OUTPUT
+from cat_file_pool import cat_file_pool
+from blame import blame, blame_cache
+from maintenance import maintenance_scheduler
+from bulk_commit import commit_changes
+from result_cache import result_cache, ref_fingerprint, config_fingerprint
+from repo_stats import collect_stats, BUCKET_FORMATS
+from object_analyzer import analyze_repository
+from jobs import job_manager
+from worktree_pool import worktree_pool
+from bisect_runner import bisect_run, BISECT_TEST_TIMEOUT
+from branch_report import branch_report
+from git_parsers import LOG_FORMAT, parse_log_record, parse_numstat, parse_status_v2, parse_grep_line
+from commit_index import get_commit_index, parse_git_date
 
 mcp = FastMCP("git_option")
 
-def run_git_command(command: List[str], cwd: Optional[str] = None) -> str:
+# 结构化状态缓存的默认有效期（秒）：索引文件和 HEAD 都没有变化时，在有效期内直接返回上次扫描的结果
+# （只修改工作区中的文件不会使缓存失效，有效期内可能返回修改前的状态）
+STATUS_CACHE_TTL = float(os.environ.get("GIT_OPTION_STATUS_CACHE_TTL", "5"))
+STATUS_CACHE_SIZE = 64
+
+_status_cache: Dict[tuple, tuple] = {}
+
+# git grep 的正则语法选项
+GREP_PATTERN_TYPES = {"basic": "-G", "extended": "-E", "perl": "-P", "fixed": "-F"}
+# 单行匹配内容返回的最大字符数（避免压缩后的超长行）
+GREP_MAX_LINE_LENGTH = 1000
+
+# 提交历史游标中最多携带的已遍历提交数（与下一页起点时间相同的提交），超过后丢弃较早的
+LOG_CURSOR_MAX_SEEN = int(os.environ.get("GIT_OPTION_LOG_CURSOR_MAX_SEEN", "1000"))
+
+# 可以作为后台作业运行的操作
+JOB_OPERATIONS = ("push", "pull", "fetch", "clone")
+
+# 克隆支持的对象过滤器：blob:none、blob:limit=<大小>、tree:<深度>、object:type=<类型>
+CLONE_FILTER_RE = re.compile(r"^(blob:none|blob:limit=\d+[kmg]?|tree:\d+|object:type=(blob|tree|commit|tag))$")
+
+# 批量操作支持的操作类型
+BATCH_OPERATIONS = ("status", "fetch", "pull", "log")
+# 在根目录下查找仓库时跳过的目录
+BATCH_SKIP_DIRS = {"node_modules", ".venv", "venv", "__pycache__", ".tox"}
+
+async def run_git_command(command: List[str], cwd: Optional[str] = None,
+                          timeout: Optional[float] = GIT_DEFAULT_TIMEOUT) -> str:
     try:
-        result = subprocess.run(
-            ['git'] + command,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        return f"错误: {e.stderr}"
+        result = await run_git(command, cwd, timeout=timeout)
+    except OSError as e:
+        return f"错误: {e}"
+    if result.timed_out:
+        return f"错误: 命令执行超时（{timeout}秒）: git {' '.join(command)}"
+    if not result.ok:
+        return f"错误: {result.error}"
+    if result.truncated:
+        return result.text + f"\n...（输出超过 {GIT_MAX_OUTPUT} 字节，已截断）"
+    return result.text
+
+async def run_cached_git_command(command: List[str], cwd: str, fingerprint=None) -> str:
+    """
+    执行 git 命令并缓存成功的结果
+    
+    fingerprint 为依赖的状态（例如引用指纹）的异步获取函数，状态变化后自动重新执行；
+    为 None 时命令只依赖不可变对象，结果一直有效。无法获取指纹（例如不是仓库）时不使用缓存
+    """
+    try:
+        state = await fingerprint(cwd) if fingerprint else None
+    except Exception:
+        return await run_git_command(command, cwd)
+    key = (os.path.realpath(cwd), tuple(command), state)
+    output = result_cache.get(key)
+    if output is None:
+        output = await run_git_command(command, cwd)
+        if not output.startswith("错误:"):
+            result_cache.put(key, output)
+    return output
+
+def _decode_content(data: bytes, truncated: bool = False) -> tuple:
+    """把文件内容解码为文本，二进制内容使用 base64，返回 (content, encoding)"""
+    if b"\0" not in data:
+        try:
+            return data.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError as e:
+            if truncated and e.start >= len(data) - 3:
+                try:
+                    return data[:e.start].decode("utf-8"), "utf-8"
+                except UnicodeDecodeError:
+                    pass
+    return base64.b64encode(data).decode(), "base64"
 
 @mcp.tool()
 async def git_init(path: str) -> str:
     """初始化Git仓库"""
-    return run_git_command(['init'], path)
+    return await run_git_command(['init'], path)
 
 @mcp.tool()
 async def git_status(path: str) -> str:
     """获取Git仓库状态"""
-    return run_git_command(['status'], path)
+    return await run_git_command(['status'], path)
 
 @mcp.tool()
 async def git_add(path: str, files: str) -> str:
     """添加文件到暂存区"""
-    return run_git_command(['add', files], path)
+    return await run_git_command(['add', files], path)
 
 @mcp.tool()
 async def git_commit(path: str, message: str) -> str:
     """提交更改"""
-    return run_git_command(['commit', '-m', message], path)
+    return await run_git_command(['commit', '-m', message], path)
 
 @mcp.tool()
 async def git_push(path: str, remote: str = 'origin', branch: str = 'main') -> str:
     """推送更改到远程仓库"""
-    return run_git_command(['push', remote, branch], path)
+    return await run_git_command(['push', remote, branch], path, timeout=GIT_NETWORK_TIMEOUT)
 
 @mcp.tool()
 async def git_pull(path: str, remote: str = 'origin', branch: str = 'main') -> str:
     """从远程仓库拉取更改"""
-    return run_git_command(['pull', remote, branch], path)
+    return await run_git_command(['pull', remote, branch], path, timeout=GIT_NETWORK_TIMEOUT)
 
 @mcp.tool()
 async def git_branch(path: str) -> str:
     """列出所有分支"""
-    return run_git_command(['branch'], path)
+    return await run_cached_git_command(['branch'], path, ref_fingerprint)
 
 @mcp.tool()
 async def git_checkout(path: str, branch: str) -> str:
     """切换分支"""
-    return run_git_command(['checkout', branch], path)
+    return await run_git_command(['checkout', branch], path)
 
 @mcp.tool()
 async def git_log(path: str, num_entries: int = 5) -> str:
     """查看提交历史"""
-    return run_git_command(['log', f'-n{num_entries}', '--oneline'], path)
+    return await run_cached_git_command(['log', f'-n{num_entries}', '--oneline'], path, ref_fingerprint)
 
 @mcp.tool()
 async def git_remote_list(path: str) -> str:
     """列出所有远程仓库"""
-    return run_git_command(['remote', '-v'], path)
+    return await run_cached_git_command(['remote', '-v'], path, config_fingerprint)
 
 @mcp.tool()
 async def git_remote_add(path: str, name: str, url: str) -> str:
     """添加远程仓库"""
-    return run_git_command(['remote', 'add', name, url], path)
+    return await run_git_command(['remote', 'add', name, url], path)
 
 @mcp.tool()
 async def git_remote_set_url(path: str, name: str, url: str) -> str:
     """修改远程仓库地址"""
-    return run_git_command(['remote', 'set-url', name, url], path)
+    return await run_git_command(['remote', 'set-url', name, url], path)
 
 @mcp.tool()
 async def git_remote_remove(path: str, name: str) -> str:
     """删除远程仓库"""
-    return run_git_command(['remote', 'remove', name], path)
+    return await run_git_command(['remote', 'remove', name], path)
 
 @mcp.tool()
 async def git_credential_store(path: str, username: str, password: str) -> str:
     """设置Git凭证存储（用户名和密码/令牌）"""
     # 设置凭证存储模式为缓存
-    run_git_command(['config', '--global', 'credential.helper', 'store'], path)
+    await run_git_command(['config', '--global', 'credential.helper', 'store'], path)
     
-    # 创建一个临时脚本来输入凭证
-    import os
-    import tempfile
+    # 使用git credential approve命令存储凭证（通过标准输入传入，不落盘）
+    credential = f"protocol=https\nhost=github.com\nusername={username}\npassword={password}\n"
+    result = await run_git(['credential', 'approve'], path, input=credential.encode())
     
-    fd, temp_path = tempfile.mkstemp()
-    try:
-        with os.fdopen(fd, 'w') as f:
-            f.write(f"protocol=https\nhost=github.com\nusername={username}\npassword={password}\n")
-        
-        # 使用git credential approve命令存储凭证
-        result = subprocess.run(
-            ['git', 'credential', 'approve'],
-            input=open(temp_path, 'r').read(),
-            text=True,
-            shell=True,
-            capture_output=True
-        )
-        
-        if result.returncode == 0:
-            return "凭证已成功存储"
-        else:
-            return f"存储凭证时出错: {result.stderr}"
-    finally:
-        os.unlink(temp_path)
+    if result.ok:
+        return "凭证已成功存储"
+    else:
+        return f"存储凭证时出错: {result.error}"
 
 @mcp.tool()
 async def git_config_user(path: str, name: str, email: str) -> str:
     """设置Git用户名和邮箱"""
-    name_result = run_git_command(['config', '--global', 'user.name', name], path)
-    email_result = run_git_command(['config', '--global', 'user.email', email], path)
+    name_result = await run_git_command(['config', '--global', 'user.name', name], path)
+    email_result = await run_git_command(['config', '--global', 'user.email', email], path)
     return f"用户名设置: {name_result}\n邮箱设置: {email_result}"
 
 @mcp.tool()
 async def git_log(path: str, num_entries: int = 5) -> str:
     """查看提交历史"""
-    return run_git_command(['log', f'-n{num_entries}', '--oneline'], path)
+    return await run_cached_git_command(['log', f'-n{num_entries}', '--oneline'], path, ref_fingerprint)
 
 @mcp.tool()
 async def git_log_advanced(path: str, author: str = None, since: str = None, until: str = None, 
@@ -164,7 +227,7 @@ async def git_log_advanced(path: str, author: str = None, since: str = None, unt
     if num_entries:
         command.append(f'-n{num_entries}')
     
-    return run_git_command(command, path)
+    return await run_git_command(command, path)
 
 @mcp.tool()
 async def git_diff(path: str, commit1: str = None, commit2: str = None, file_path: str = None, cached: bool = False) -> str:
@@ -181,6 +244,7 @@ async def git_diff(path: str, commit1: str = None, commit2: str = None, file_pat
         str: diff结果文本
     """
     command = ['diff']
+    immutable = False
     
     # 比较暂存区和最新提交
     if cached:
@@ -188,6 +252,14 @@ async def git_diff(path: str, commit1: str = None, commit2: str = None, file_pat
     
     # 指定提交或分支进行比较
     if commit1 and commit2:
+        # 两端都解析为对象ID后，结果只依赖不可变对象，可以一直缓存
+        try:
+            objects = [await cat_file_pool.info(path, commit) for commit in (commit1, commit2)]
+        except Exception:
+            objects = []
+        if objects and all(objects):
+            commit1, commit2 = objects[0].oid, objects[1].oid
+            immutable = not cached
         command.append(f'{commit1}..{commit2}')
     elif commit1:
         command.append(commit1)
@@ -197,10 +269,1324 @@ async def git_diff(path: str, commit1: str = None, commit2: str = None, file_pat
         command.append('--')
         command.append(file_path)
     
-    # 添加颜色输出
-    command.append('--color')
+    # 不输出颜色控制字符，便于调用方直接解析
+    command.append('--no-color')
+    
+    if immutable:
+        return await run_cached_git_command(command, path)
+    return await run_git_command(command, path)
+
+def _diff_revisions(commit1: Optional[str], commit2: Optional[str], cached: bool) -> List[str]:
+    """git diff 的比较对象参数"""
+    revisions = ['--cached'] if cached else []
+    if commit1:
+        revisions.append(commit1)
+    if commit2:
+        revisions.append(commit2)
+    return revisions
+
+async def _read_patches(command: List[str], path: str, count: int, max_file_bytes: int,
+                        max_total_bytes: int) -> List[tuple]:
+    """
+    流式读取补丁输出并按文件切分，每个文件只保留前 max_file_bytes 字节
+    
+    累计字节数超过 max_total_bytes 后不再读取后续文件（至少返回一个文件），
+    返回 [(补丁内容, 是否截断, 原始大小), ...]
+    """
+    marker = b"\ndiff --git "
+    patches = []
+    current = None
+    buffer = b""
+    total = 0
+    
+    def append(data: bytes) -> None:
+        kept = current[0]
+        if len(kept) < max_file_bytes:
+            current[0] = kept + data[:max_file_bytes - len(kept)]
+        current[1] += len(data)
+    
+    async with aclosing(stream_git(command, path)) as chunks:
+        async for chunk in chunks:
+            buffer += chunk
+            while True:
+                if current is None:
+                    if not buffer.startswith(marker[1:]):
+                        break
+                    current = [b"", 0]
+                    search_from = 1
+                else:
+                    search_from = 0
+                position = buffer.find(marker, search_from)
+                if position < 0:
+                    # 保留可能跨块的分隔符前缀，其余内容归入当前文件
+                    keep = len(marker) - 1
+                    if len(buffer) > keep:
+                        append(buffer[:-keep])
+                        buffer = buffer[-keep:]
+                    break
+                append(buffer[:position + 1])
+                buffer = buffer[position + 1:]
+                patches.append((current[0], current[1] > max_file_bytes, current[1]))
+                total += len(current[0])
+                current = None
+                if len(patches) >= count or total >= max_total_bytes:
+                    return patches
+    if current is not None:
+        append(buffer)
+        patches.append((current[0], current[1] > max_file_bytes, current[1]))
+    return patches
+
+@mcp.tool()
+async def git_diff_structured(path: str, commit1: Optional[str] = None, commit2: Optional[str] = None,
+                              cached: bool = False, paths: Optional[List[str]] = None,
+                              offset: int = 0, limit: int = 50, include_patch: bool = True,
+                              max_file_bytes: int = 256 * 1024, max_total_bytes: int = 2 * 1024 * 1024,
+                              detect_renames: bool = True, rename_limit: int = 1000,
+                              context_lines: int = 3) -> Dict[str, Any]:
+    """结构化的差异：先返回全部文件的增删行数汇总，再按文件分页返回补丁内容，单个文件和单页的大小都有上限
+    
+    参数:
+        path: 仓库路径
+        commit1: 第一个提交或分支，不指定则比较工作区与暂存区（cached 为 True 时比较暂存区与 HEAD）
+        commit2: 第二个提交或分支，不指定则比较 commit1 与工作区（cached 为 True 时与暂存区）
+        cached: 是否比较暂存区，默认为False
+        paths: 只比较这些路径
+        offset: 文件分页的起始位置
+        limit: 每页最多返回的文件数，默认50
+        include_patch: 是否返回补丁内容，为False时只返回每个文件的增删行数
+        max_file_bytes: 单个文件补丁的最大字节数，超出部分截断，默认256KB
+        max_total_bytes: 单页补丁的累计字节数上限，达到后本页提前结束，默认2MB
+        detect_renames: 是否检测重命名，默认为True
+        rename_limit: 重命名检测时最多比较的文件数，超过后不再检测，默认1000
+        context_lines: 补丁的上下文行数，默认3
+    
+    返回:
+        Dict[str, Any]: summary（文件数、总增删行数）和本页的 files 列表；二进制文件不返回补丁（binary 为 True），
+        还有更多文件时 next_offset 不为空
+    """
+    try:
+        options = ['--no-color', '--no-ext-diff', '--no-textconv']
+        options += ['-M', f'-l{rename_limit}'] if detect_renames else ['--no-renames']
+        revisions = _diff_revisions(commit1, commit2, cached)
+        
+        command = ['diff', '--numstat', '-z'] + options + revisions
+        if paths:
+            command += ['--'] + paths
+        async with aclosing(stream_git(command, path)) as chunks:
+            numstat = parse_numstat(b"".join([chunk async for chunk in chunks]))
+        
+        summary = {
+            "files": len(numstat),
+            "added": sum(entry["added"] or 0 for entry in numstat),
+            "deleted": sum(entry["deleted"] or 0 for entry in numstat),
+            "binary_files": sum(1 for entry in numstat if entry["added"] is None),
+        }
+        files = []
+        for entry in numstat[offset:offset + limit]:
+            files.append({**entry, "binary": entry["added"] is None})
+        
+        if include_patch:
+            text_files = [entry for entry in files if not entry["binary"]]
+            if text_files:
+                pathspecs = []
+                for entry in text_files:
+                    if "old_path" in entry:
+                        pathspecs.append(entry["old_path"])
+                    pathspecs.append(entry["path"])
+                # 只为本页的文本文件生成补丁，补丁的顺序与 numstat 一致
+                command = (['--literal-pathspecs', 'diff', f'-U{context_lines}'] + options + revisions
+                           + ['--'] + pathspecs)
+                patches = await _read_patches(command, path, len(text_files), max_file_bytes, max_total_bytes)
+                for entry, (patch, truncated, size) in zip(text_files, patches):
+                    entry["patch"] = patch.decode("utf-8", errors="replace")
+                    entry["patch_bytes"] = size
+                    entry["truncated"] = truncated
+                if patches and len(patches) < len(text_files):
+                    # 达到单页大小上限：本页在最后一个有补丁的文件处结束
+                    files = files[:files.index(text_files[len(patches) - 1]) + 1]
+        
+        next_offset = offset + len(files)
+        return {
+            "success": True,
+            "summary": summary,
+            "files": files,
+            "offset": offset,
+            "next_offset": next_offset if next_offset < len(numstat) else None,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_grep(path: str, pattern: str, revisions: Optional[List[str]] = None, cached: bool = False,
+                   paths: Optional[List[str]] = None, pattern_type: str = "extended",
+                   ignore_case: bool = False, word: bool = False, context_lines: int = 0,
+                   max_per_file: Optional[int] = 50, offset: int = 0, limit: int = 200,
+                   threads: Optional[int] = None) -> Dict[str, Any]:
+    """多线程代码搜索（git grep），可以搜索工作区、暂存区或任意多个版本（直接读取对象库，不需要切换分支）
+    
+    参数:
+        path: 仓库路径
+        pattern: 搜索的模式
+        revisions: 要搜索的版本列表（分支、标签或提交），不指定则搜索工作区中被跟踪的文件
+        cached: 是否搜索暂存区而不是工作区（指定 revisions 时忽略）
+        paths: 只搜索这些路径，支持通配符，例如 ["src/", "*.py"]
+        pattern_type: 正则语法："basic"、"extended"（默认）、"perl" 或 "fixed"（普通字符串）
+        ignore_case: 是否忽略大小写
+        word: 是否只匹配完整单词
+        context_lines: 每个匹配前后返回的上下文行数，默认0
+        max_per_file: 每个文件（每个版本中）最多返回的匹配数，默认50，None 表示不限制
+        offset: 分页起始位置（按匹配计数）
+        limit: 每页匹配数，默认200
+        threads: 搜索线程数，默认使用 CPU 核数
+    
+    返回:
+        Dict[str, Any]: matches 列表（revision、path、line、column、text，可选 before/after 上下文），
+        还有更多匹配时 next_offset 不为空；二进制文件不参与搜索
+    """
+    try:
+        if pattern_type not in GREP_PATTERN_TYPES:
+            return {"success": False, "message": f"错误: 不支持的正则语法: {pattern_type}"}
+        command = ['grep', '-z', '-n', '--column', '-I', '--no-color', GREP_PATTERN_TYPES[pattern_type],
+                   f'--threads={threads or os.cpu_count() or 1}']
+        if ignore_case:
+            command.append('-i')
+        if word:
+            command.append('-w')
+        if context_lines:
+            command.append(f'-C{context_lines}')
+        if max_per_file:
+            command.append(f'--max-count={max_per_file}')
+        if cached and not revisions:
+            command.append('--cached')
+        command += ['-e', pattern]
+        command += list(revisions or [])
+        if paths:
+            command += ['--'] + paths
+        
+        matches = []
+        has_more = False
+        index = 0
+        last_match = None
+        before = []
+        try:
+            async with aclosing(stream_records(command, path, separator=b"\n")) as lines:
+                async for line in lines:
+                    entry = parse_grep_line(line, revisions or [])
+                    if entry is None:
+                        last_match, before = None, []
+                        continue
+                    entry["text"] = entry["text"][:GREP_MAX_LINE_LENGTH]
+                    if not entry["match"]:
+                        # 上下文行：紧跟在匹配之后的归入 after，同时留作下一个匹配的 before
+                        if (last_match is not None and last_match["path"] == entry["path"]
+                                and last_match["revision"] == entry["revision"]
+                                and entry["line"] - last_match["line"] <= context_lines):
+                            last_match["after"].append({"line": entry["line"], "text": entry["text"]})
+                        before = (before + [entry])[-context_lines:]
+                        continue
+                    
+                    if index >= offset:
+                        if len(matches) >= limit:
+                            has_more = True
+                            break
+                        match = {key: entry[key] for key in ("revision", "path", "line", "column", "text")}
+                        if context_lines:
+                            match["before"] = [{"line": item["line"], "text": item["text"]} for item in before
+                                               if item["path"] == entry["path"] and item["revision"] == entry["revision"]
+                                               and entry["line"] - item["line"] <= context_lines]
+                            match["after"] = []
+                        matches.append(match)
+                        last_match = match if context_lines else None
+                    else:
+                        last_match = None
+                    index += 1
+                    before = []
+        except GitError as e:
+            # git grep 没有匹配时以状态码 1 退出
+            if e.returncode != 1:
+                raise
+        
+        return {
+            "success": True,
+            "matches": matches,
+            "offset": offset,
+            "next_offset": offset + len(matches) if has_more else None,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_commit_files(path: str, changes: List[Dict[str, Any]], message: str, branch: Optional[str] = None,
+                           expected_parent: Optional[str] = None, author_name: Optional[str] = None,
+                           author_email: Optional[str] = None, allow_empty: bool = False,
+                           update_worktree: bool = False) -> Dict[str, Any]:
+    """不经过工作区直接提交一批文件变更（适合一次提交大量生成的文件），并原子地更新分支
+    
+    参数:
+        path: 仓库路径
+        changes: 变更列表，每项为 {"path": "相对路径", "content": "内容", "encoding": "utf-8" 或 "base64",
+            "mode": "100644"/"100755"/"120000"（可选，默认保留原模式）}，删除文件为 {"path": "相对路径", "delete": true}
+        message: 提交信息
+        branch: 目标分支，不指定则使用当前检出的分支；分支不存在时创建
+        expected_parent: 期望的分支当前提交，不一致时失败，用于避免覆盖并发的提交
+        author_name: 作者名称，不指定则使用仓库配置
+        author_email: 作者邮箱，不指定则使用仓库配置
+        allow_empty: 没有实际变化时是否仍然创建提交
+        update_worktree: 目标分支是当前检出的分支时，是否同时更新工作区中变化的文件（暂存区总是会同步到新提交）
+    
+    返回:
+        Dict[str, Any]: 新提交ID、树ID、引用名称和父提交；没有实际变化时 changed 为 False
+    """
+    try:
+        result = await commit_changes(path, changes, message, branch, expected_parent, author_name,
+                                      author_email, allow_empty, update_worktree)
+        return {"success": True, **result}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_object_info(path: str, objects: List[str]) -> Dict[str, Any]:
+    """批量查询对象的ID、类型和大小（通过常驻的 cat-file 进程，不为每个对象启动 git）
+    
+    参数:
+        path: 仓库路径
+        objects: 对象名称列表，例如 ["HEAD", "main:README.md", "v1.0^{tree}"]
+    
+    返回:
+        Dict[str, Any]: 每个对象的查询结果，不存在的对象 missing 为 True
+    """
+    try:
+        results = []
+        for spec in objects:
+            obj = await cat_file_pool.info(path, spec)
+            if obj is None:
+                results.append({"object": spec, "missing": True})
+            else:
+                results.append({"object": spec, "oid": obj.oid, "type": obj.type, "size": obj.size})
+        return {"success": True, "objects": results}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_ls_tree(path: str, revision: str = "HEAD", tree_path: str = "", recursive: bool = True,
+                      offset: int = 0, limit: int = 1000) -> Dict[str, Any]:
+    """列出任意版本的目录树（直接读取对象库，不需要切换分支）
+    
+    参数:
+        path: 仓库路径
+        revision: 版本，可以是分支、标签、提交或树对象，默认 HEAD
+        tree_path: 只列出该目录下的内容（相对仓库根目录），默认整个仓库
+        recursive: 是否递归列出所有文件，默认为True；为False时只列出一层（包括子目录）
+        offset: 分页起始位置
+        limit: 每页条目数
+    
+    返回:
+        Dict[str, Any]: 条目列表（path、mode、type、oid、size），还有更多条目时 next_offset 不为空
+    """
+    try:
+        # 先把版本解析为树对象ID，翻页时结果保持一致
+        tree = await cat_file_pool.info(path, f"{revision}^{{tree}}")
+        if tree is None:
+            return {"success": False, "message": f"错误: 无法解析版本: {revision}"}
+        
+        command = ['ls-tree', '-z', '--long', '--full-tree']
+        if recursive:
+            command.append('-r')
+        command.append(tree.oid)
+        tree_path = tree_path.strip('/')
+        if tree_path:
+            command += ['--', tree_path + '/']
+        
+        entries = []
+        has_more = False
+        index = 0
+        async with aclosing(stream_records(command, path)) as records:
+            async for record in records:
+                if index >= offset:
+                    if len(entries) >= limit:
+                        has_more = True
+                        break
+                    meta, name = record.split(b"\t", 1)
+                    mode, object_type, oid, size = meta.split()
+                    entries.append({
+                        "path": name.decode("utf-8", errors="replace"),
+                        "mode": mode.decode(),
+                        "type": object_type.decode(),
+                        "oid": oid.decode(),
+                        "size": int(size) if size != b"-" else None,
+                    })
+                index += 1
+        
+        return {
+            "success": True,
+            "revision": revision,
+            "tree": tree.oid,
+            "entries": entries,
+            "offset": offset,
+            "next_offset": offset + len(entries) if has_more else None,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_show_file(path: str, file_path: str, revision: str = "HEAD", offset: int = 0,
+                        length: Optional[int] = None, max_bytes: int = 1024 * 1024) -> Dict[str, Any]:
+    """读取任意版本中的文件内容（直接读取对象库，不需要切换分支），支持按字节范围读取
+    
+    参数:
+        path: 仓库路径
+        file_path: 文件路径（相对仓库根目录）
+        revision: 版本，可以是分支、标签或提交，默认 HEAD
+        offset: 起始字节
+        length: 读取的字节数，不指定则读到末尾（仍受 max_bytes 限制）
+        max_bytes: 单次最多返回的字节数，默认 1MB
+    
+    返回:
+        Dict[str, Any]: 文件内容；文本以 utf-8 返回，二进制内容以 base64 返回（encoding 字段标明），
+        truncated 为 True 时可以用 offset 继续读取
+    """
+    try:
+        length = max_bytes if length is None else min(length, max_bytes)
+        obj = await cat_file_pool.read(path, f"{revision}:{file_path.lstrip('/')}", offset, length)
+        if obj is None:
+            return {"success": False, "message": f"错误: 文件不存在: {revision}:{file_path}"}
+        if obj.type != "blob":
+            return {"success": False, "message": f"错误: {file_path} 是 {obj.type} 而不是文件，目录请使用 git_ls_tree"}
+        
+        data = obj.data
+        content, encoding = _decode_content(data, offset + len(data) < obj.size)
+        if encoding == "utf-8":
+            # 截断在多字节字符中间时，末尾不完整的字节留给下一次读取
+            data = data[:len(content.encode("utf-8"))]
+        
+        return {
+            "success": True,
+            "revision": revision,
+            "path": file_path,
+            "oid": obj.oid,
+            "size": obj.size,
+            "offset": offset,
+            "length": len(data),
+            "truncated": offset + len(data) < obj.size,
+            "encoding": encoding,
+            "content": content,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_blame(path: str, file_path: str, revision: str = "HEAD", start_line: Optional[int] = None,
+                    end_line: Optional[int] = None, ignore_whitespace: bool = False,
+                    detect_moves: bool = False, include_content: bool = True) -> Dict[str, Any]:
+    """逐行追溯文件内容的最后修改提交，支持行范围；同一提交中同一文件的结果会被缓存，重复查询直接返回
+    
+    参数:
+        path: 仓库路径
+        file_path: 文件路径（相对仓库根目录）
+        revision: 版本，可以是分支、标签或提交，默认 HEAD（不包含工作区中未提交的修改）
+        start_line: 起始行（从 1 开始），不指定则从第一行开始
+        end_line: 结束行（包含），不指定则到最后一行
+        ignore_whitespace: 是否忽略空白字符的修改
+        detect_moves: 是否检测文件内移动或复制的行
+        include_content: 是否在每个区块中返回对应的行内容
+    
+    返回:
+        Dict[str, Any]: hunks 列表（commit、final_line、orig_line、lines、orig_path，可选 content）和 commits 信息
+    """
+    try:
+        if start_line is not None and start_line < 1 or end_line is not None and end_line < (start_line or 1):
+            return {"success": False, "message": "错误: 行范围无效"}
+        file_path = file_path.lstrip('/')
+        commit = await cat_file_pool.info(path, f"{revision}^{{commit}}")
+        if commit is None:
+            return {"success": False, "message": f"错误: 无法解析版本: {revision}"}
+        blob = await cat_file_pool.info(path, f"{commit.oid}:{file_path}")
+        if blob is None or blob.type != "blob":
+            return {"success": False, "message": f"错误: 文件不存在: {revision}:{file_path}"}
+        
+        options = tuple(option for option, enabled in (("-w", ignore_whitespace), ("-M", detect_moves)) if enabled)
+        result, cached = await blame(path, commit.oid, blob.oid, file_path, start_line, end_line, options)
+        
+        hunks = [dict(hunk) for hunk in result.hunks]
+        if include_content and hunks:
+            obj = await cat_file_pool.read(path, blob.oid)
+            # 只按 \n 切分，与 git 的行号一致（splitlines 还会在 \f、\v、\u2028 等字符处切分）
+            lines = obj.data.decode("utf-8", errors="replace").split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            for hunk in hunks:
+                hunk["content"] = lines[hunk["final_line"] - 1:hunk["final_line"] - 1 + hunk["lines"]]
+        
+        return {
+            "success": True,
+            "revision": revision,
+            "commit": commit.oid,
+            "path": file_path,
+            "blob": blob.oid,
+            "hunks": hunks,
+            "commits": result.commits,
+            "cached": cached,
+            "cache": blame_cache.stats(),
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+async def _log_walk_queue(path: str, queue: List[str], seen: Dict[str, None], walk_options: List[str],
+                          pathspec: List[str], stop: str) -> tuple:
+    """
+    重放一页的遍历（不显示过滤、不格式化提交内容），得到遍历到 stop 时的待遍历队列，作为下一页的起点
+    
+    被作者、关键词等条件隐藏的提交也会被遍历，它们的父提交同样需要进入队列，所以不能只看显示出来的提交；
+    --sparse 使路径过滤时被简化掉的提交也被输出，%P 是简化后实际沿着遍历的父提交。
+    
+    从队列重新开始遍历时，提交时间不早于队列中最新提交的已遍历提交（时间相同）可能再次被遍历到，
+    这些提交也一并返回，下一页跳过它们（最多 LOG_CURSOR_MAX_SEEN 个，优先保留本页的）；父提交比子提交还新（时钟偏差）、
+    或者大量提交的时间完全相同时，个别提交仍可能在后面的页中重复出现
+    
+    返回:
+        (队列, 需要跳过的已遍历提交)
+    """
+    pending = dict.fromkeys(queue)
+    walked = {}
+    command = ['log', '--stdin', '--sparse', '--format=%H %ct %P'] + walk_options + pathspec
+    async with aclosing(stream_records(command, path, separator=b"\n",
+                                       input="\n".join(queue).encode() + b"\n")) as records:
+        async for record in records:
+            sha, date, *parents = record.decode().split()
+            if sha == stop:
+                # 下一个被遍历的提交总是队列中最新的
+                latest = int(date)
+                break
+            if sha in seen or sha in walked:
+                continue
+            walked[sha] = int(date)
+            pending.pop(sha, None)
+            if '--first-parent' in walk_options:
+                parents = parents[:1]
+            pending.update(dict.fromkeys(parent for parent in parents if parent not in walked and parent not in seen))
+        else:
+            latest = None
+    if latest is None:
+        return list(pending), []
+    revisit = [sha for sha, date in reversed(walked.items()) if date <= latest]
+    skip = revisit + [sha for sha in seen if sha not in pending]
+    return list(pending), skip[:LOG_CURSOR_MAX_SEEN]
+
+@mcp.tool()
+async def git_log_structured(path: str, revision: str = "HEAD", cursor: Optional[str] = None, limit: int = 100,
+                             paths: Optional[List[str]] = None, include_numstat: bool = False,
+                             author: Optional[str] = None, since: Optional[str] = None,
+                             until: Optional[str] = None, grep: Optional[str] = None,
+                             first_parent: bool = False) -> Dict[str, Any]:
+    """结构化的提交历史（JSON 记录），按游标分页，每次调用的内存和返回大小都有上限
+    
+    参数:
+        path: 仓库路径
+        revision: 起始版本，默认 HEAD
+        cursor: 上一页返回的 next_cursor，用于继续翻页（从上一页结束的位置继续遍历，不会重新遍历之前的提交）
+        limit: 每页提交数，默认100
+        paths: 只查看涉及这些路径的提交
+        include_numstat: 是否包含每个文件的增删行数
+        author: 作者名称或邮箱
+        since: 开始时间，例如 "1 week ago", "2023-01-01"
+        until: 结束时间，例如 "yesterday", "2023-12-31"
+        grep: 在提交信息中搜索的关键词
+        first_parent: 是否只沿第一父提交遍历
+    
+    返回:
+        Dict[str, Any]: commits 列表（sha、parents、作者、日期、subject，可选 files），还有更多时 next_cursor 不为空
+    """
+    try:
+        if cursor:
+            # 游标是上一页结束时的遍历状态（起始提交:待遍历队列:需要跳过的已遍历提交）
+            tip, queue, seen = (cursor.split(":") + [""])[:3]
+            queue = queue.split(",")
+            seen = dict.fromkeys(filter(None, seen.split(",")))
+        else:
+            commit = await cat_file_pool.info(path, f"{revision}^{{commit}}")
+            if commit is None:
+                return {"success": False, "message": f"错误: 无法解析版本: {revision}"}
+            tip, queue, seen = commit.oid, [commit.oid], {}
+        
+        # 影响遍历范围的选项；其余选项只决定是否显示某个提交
+        walk_options = ['--first-parent'] if first_parent else []
+        if since:
+            walk_options.append(f'--since={since}')
+        pathspec = ['--'] + paths if paths else []
+        
+        command = ['log', '--stdin', '-z', f'--format={LOG_FORMAT}'] + walk_options
+        if include_numstat:
+            command += ['--numstat', '-M']
+        if author:
+            command.append(f'--author={author}')
+        if until:
+            command.append(f'--until={until}')
+        if grep:
+            command.append(f'--grep={grep}')
+        
+        commits = []
+        lookahead = None
+        async with aclosing(stream_records(command + pathspec, path, separator=b"\x1e",
+                                           input="\n".join(queue).encode() + b"\n")) as records:
+            async for record in records:
+                if not record:
+                    continue
+                sha = record.split(b"\x1f", 1)[0].decode()
+                if sha in seen:
+                    continue
+                if len(commits) >= limit:
+                    lookahead = sha
+                    break
+                commits.append(parse_log_record(record, include_numstat))
+        
+        next_cursor = None
+        if lookahead is not None:
+            next_queue, next_seen = await _log_walk_queue(path, queue, seen, walk_options, pathspec, lookahead)
+            next_cursor = f"{tip}:{','.join(next_queue)}:{','.join(next_seen)}"
+        
+        return {
+            "success": True,
+            "revision": revision,
+            "tip": tip,
+            "commits": commits,
+            "next_cursor": next_cursor,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_index_update(path: str) -> Dict[str, Any]:
+    """建立或增量更新仓库的提交元数据索引（首次建立大仓库的索引可能需要较长时间）
+    
+    参数:
+        path: 仓库路径
+    
+    返回:
+        Dict[str, Any]: 新增、删除的提交数以及索引中的提交总数
+    """
+    try:
+        index = await get_commit_index(path)
+        return {"success": True, **(await index.update())}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_index_search(path: str, author: Optional[str] = None, since: Optional[str] = None,
+                           until: Optional[str] = None, grep: Optional[str] = None,
+                           file_path: Optional[str] = None, limit: int = 100, offset: int = 0,
+                           update: bool = True) -> Dict[str, Any]:
+    """通过本地提交索引按作者、时间、提交信息或路径查询提交，不需要重新遍历历史
+    
+    索引覆盖所有分支、标签和远程分支可达的提交，按提交时间倒序返回
+    
+    参数:
+        path: 仓库路径
+        author: 作者名称或邮箱（子串匹配）
+        since: 开始时间，例如 "1 week ago", "2023-01-01"
+        until: 结束时间，例如 "yesterday", "2023-12-31"
+        grep: 在提交信息中全文检索的关键词（多个词需同时出现）
+        file_path: 只返回涉及该文件或目录的提交
+        limit: 返回条数，默认100
+        offset: 分页起始位置
+        update: 查询前是否先增量更新索引（引用没有变化时几乎没有开销），默认为True
+    
+    返回:
+        Dict[str, Any]: 匹配的提交列表
+    """
+    try:
+        index = await get_commit_index(path)
+        update_result = await index.update() if update else None
+        commits = await index.query(
+            author=author,
+            since=await parse_git_date(path, since) if since else None,
+            until=await parse_git_date(path, until) if until else None,
+            text=grep,
+            path=file_path,
+            limit=limit,
+            offset=offset,
+        )
+        return {
+            "success": True,
+            "commits": commits,
+            "offset": offset,
+            "next_offset": offset + len(commits) if len(commits) == limit else None,
+            "index_update": update_result,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+async def _status_fingerprint(path: str) -> tuple:
+    """索引文件和 HEAD 的 stat 信息，任何暂存、提交或切换分支都会改变它"""
+    git_dir, _ = await git_dirs(path)
+    fingerprint = []
+    for name in ("index", "HEAD"):
+        try:
+            st = os.stat(os.path.join(git_dir, name))
+            fingerprint.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except FileNotFoundError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+def _status_summary(entries: List[Dict[str, Any]]) -> Dict[str, int]:
+    """按类别统计状态条目数"""
+    summary = {"staged": 0, "unstaged": 0, "unmerged": 0, "untracked": 0, "ignored": 0}
+    for entry in entries:
+        kind = entry["kind"]
+        if kind in ("untracked", "ignored", "unmerged"):
+            summary[kind] += 1
+            continue
+        if entry["index"] != ".":
+            summary["staged"] += 1
+        if entry["worktree"] != ".":
+            summary["unstaged"] += 1
+    return summary
+
+@mcp.tool()
+async def git_status_structured(path: str, untracked: str = "normal", ignored: bool = False,
+                                offset: int = 0, limit: int = 1000,
+                                max_age: Optional[float] = None) -> Dict[str, Any]:
+    """结构化的仓库状态（基于 porcelain v2 输出），结果按索引文件和 HEAD 的变化缓存，适合频繁轮询
+    
+    参数:
+        path: 仓库路径
+        untracked: 未跟踪文件的显示方式："normal"（只显示目录）、"all"（逐个文件）或 "no"（不显示）
+        ignored: 是否包含被忽略的文件
+        offset: 分页起始位置
+        limit: 每页条目数
+        max_age: 缓存结果的最长有效时间（秒），0 表示强制重新扫描，默认使用 GIT_OPTION_STATUS_CACHE_TTL；
+            缓存只检查索引文件和 HEAD，只编辑工作区中的文件（未暂存）不会使缓存失效，有效期内可能仍返回修改前的状态
+            （例如 clean 为 True），刚修改过文件、需要准确结果时请传 0
+    
+    返回:
+        Dict[str, Any]: 分支信息（head、oid、upstream、ahead、behind）、各类别计数和条目列表；
+        条目的 index / worktree 为暂存区和工作区的状态字母，"." 表示未修改
+    """
+    try:
+        if untracked not in ("normal", "all", "no"):
+            return {"success": False, "message": f"错误: 不支持的 untracked 取值: {untracked}"}
+        max_age = STATUS_CACHE_TTL if max_age is None else max_age
+        key = (os.path.realpath(path), untracked, ignored)
+        
+        cached = _status_cache.get(key)
+        now = time.monotonic()
+        if cached and now - cached[1] <= max_age and cached[0] == await _status_fingerprint(path):
+            status, scanned_at, from_cache = cached[2], cached[1], True
+        else:
+            command = ['status', '--porcelain=v2', '-z', '--branch', f'--untracked-files={untracked}']
+            if ignored:
+                command.append('--ignored')
+            async with aclosing(stream_records(command, path)) as records:
+                status = parse_status_v2([record async for record in records])
+            status["summary"] = _status_summary(status["entries"])
+            # status 可能顺带刷新索引文件，所以在扫描之后再记录指纹
+            scanned_at, from_cache = time.monotonic(), False
+            _status_cache.pop(key, None)
+            _status_cache[key] = (await _status_fingerprint(path), scanned_at, status)
+            while len(_status_cache) > STATUS_CACHE_SIZE:
+                _status_cache.pop(next(iter(_status_cache)))
+        
+        entries = status["entries"]
+        page = entries[offset:offset + limit]
+        return {
+            "success": True,
+            "branch": status["branch"],
+            "summary": status["summary"],
+            "clean": not any(entry["kind"] != "ignored" for entry in entries),
+            "total": len(entries),
+            "entries": page,
+            "offset": offset,
+            "next_offset": offset + len(page) if offset + len(page) < len(entries) else None,
+            "cached": from_cache,
+            "age_seconds": round(time.monotonic() - scanned_at, 3),
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+async def _git_config_get(path: str, name: str) -> Optional[str]:
+    result = await run_git(['config', '--get', name], path)
+    return result.text.strip() if result.ok else None
+
+@mcp.tool()
+async def git_status_acceleration(path: str, fsmonitor: Optional[bool] = None,
+                                  untracked_cache: Optional[bool] = None) -> Dict[str, Any]:
+    """查看或设置仓库的状态加速选项（core.fsmonitor 和 core.untrackedCache），用于加快大工作区的 git status
+    
+    参数:
+        path: 仓库路径
+        fsmonitor: 是否启用内置的文件系统监控守护进程，不指定则不修改（需要 git 编译时支持 fsmonitor--daemon）
+        untracked_cache: 是否启用未跟踪文件缓存，不指定则不修改
+    
+    返回:
+        Dict[str, Any]: 当前的设置，以及 fsmonitor 是否受支持、守护进程是否在运行
+    """
+    try:
+        build_options = await run_git(['version', '--build-options'])
+        fsmonitor_supported = "fsmonitor--daemon" in build_options.text
+        changes = []
+        
+        if untracked_cache is not None:
+            value = "true" if untracked_cache else "false"
+            for command in (['config', 'core.untrackedCache', value],
+                            ['update-index', '--untracked-cache' if untracked_cache else '--no-untracked-cache']):
+                result = await run_git(command, path)
+                if not result.ok:
+                    return {"success": False, "message": f"错误: {result.error}"}
+            changes.append(f"core.untrackedCache={value}")
+        
+        if fsmonitor is not None:
+            if fsmonitor:
+                if not fsmonitor_supported:
+                    return {"success": False, "message": "错误: 当前 git 不支持内置的 fsmonitor 守护进程"}
+                result = await run_git(['config', 'core.fsmonitor', 'true'], path)
+                if not result.ok:
+                    return {"success": False, "message": f"错误: {result.error}"}
+                # 守护进程已经在运行时 start 会失败，忽略即可
+                await run_git(['fsmonitor--daemon', 'start'], path)
+            else:
+                result = await run_git(['config', 'core.fsmonitor', 'false'], path)
+                if not result.ok:
+                    return {"success": False, "message": f"错误: {result.error}"}
+                if fsmonitor_supported:
+                    await run_git(['fsmonitor--daemon', 'stop'], path)
+            changes.append(f"core.fsmonitor={'true' if fsmonitor else 'false'}")
+        
+        if changes:
+            root = os.path.realpath(path)
+            for key in [key for key in _status_cache if key[0] == root]:
+                del _status_cache[key]
+        
+        daemon_running = False
+        if fsmonitor_supported:
+            daemon_running = (await run_git(['fsmonitor--daemon', 'status'], path)).ok
+        return {
+            "success": True,
+            "changes": changes,
+            "fsmonitor": await _git_config_get(path, 'core.fsmonitor'),
+            "untracked_cache": await _git_config_get(path, 'core.untrackedCache'),
+            "fsmonitor_supported": fsmonitor_supported,
+            "fsmonitor_daemon_running": daemon_running,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_stats(path: str, revision: str = "HEAD", paths: Optional[List[str]] = None,
+                    since: Optional[str] = None, until: Optional[str] = None,
+                    max_commits: Optional[int] = None, no_merges: bool = True, bucket: str = "month",
+                    directory_depth: int = 2, cochange_max_files: int = 50, top: int = 20,
+                    use_index: bool = True) -> Dict[str, Any]:
+    """仓库统计分析（一次遍历历史）：文件/目录的变更频率和增删行数、目录的主要作者、按时间的作者贡献、经常一起修改的文件
     
-    return run_git_command(command, path)
+    参数:
+        path: 仓库路径
+        revision: 统计的版本，默认 HEAD
+        paths: 只统计这些路径
+        since: 开始时间，例如 "6 months ago", "2023-01-01"
+        until: 结束时间，例如 "yesterday", "2023-12-31"
+        max_commits: 最多统计的提交数
+        no_merges: 是否排除合并提交，默认为True
+        bucket: 作者贡献的时间区间："day"、"week"、"month"（默认）或 "year"
+        directory_depth: 统计目录的最大深度，默认2
+        cochange_max_files: 计算共同修改时忽略修改文件数超过该值的提交（例如批量格式化），默认50
+        top: 各排行榜返回的条数，默认20
+        use_index: 已建立提交索引时是否直接从索引读取文件变更，默认为True
     
+    返回:
+        Dict[str, Any]: top_files、top_directories、ownership、authors、timeline、cochange_hotspots 等统计结果，
+        source 标明数据来自提交索引（index）还是直接遍历（log）；cochange_error 大于 0 时共同修改的计数为近似值
+    """
+    try:
+        if bucket not in BUCKET_FORMATS:
+            return {"success": False, "message": f"错误: 不支持的时间区间: {bucket}"}
+        stats = await collect_stats(path, revision, paths, since, until, max_commits, no_merges, bucket,
+                                    directory_depth, cochange_max_files, top, use_index)
+        return {"success": True, **stats}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_large_objects(path: str, top: int = 20, min_size: int = 0, include_paths: bool = True,
+                            include_delta_chains: bool = False) -> Dict[str, Any]:
+    """分析仓库中的大文件和包文件膨胀情况：历史中最大的 blob 及其最早出现的提交和路径、各类型对象的汇总、包文件统计
+    
+    参数:
+        path: 仓库路径
+        top: 返回最大的 blob 数量，默认20
+        min_size: 只考虑不小于该大小（字节）的 blob
+        include_paths: 是否查找大 blob 最早出现的提交和路径（需要遍历一次全部历史），默认为True
+        include_delta_chains: 是否统计增量链长度分布（需要校验所有包文件，大仓库上较慢），默认为False
+    
+    返回:
+        Dict[str, Any]: largest_blobs、by_type、count_objects（大小单位 KiB）、packs 等分析结果
+    """
+    try:
+        return {"success": True, **(await analyze_repository(path, top, min_size, include_paths,
+                                                             include_delta_chains))}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_worktree_lease(path: str, revision: str = 'HEAD', branch: Optional[str] = None,
+                             wait_seconds: float = 0, clean_ignored: bool = True) -> Dict[str, Any]:
+    """从仓库的工作树池中租用一个检出到指定版本的独立工作树，多个调用方可以在不同版本上并行工作，互不影响
+    
+    空闲的工作树会被复用（只改写两个版本之间不同的文件），用完后请调用 git_worktree_release 归还
+    
+    参数:
+        path: 仓库路径
+        revision: 要检出的版本（分离 HEAD），默认为 HEAD
+        branch: 检出的分支（代替 revision，可以在工作树中提交），同一分支只能在一个工作树中检出
+        wait_seconds: 池中的工作树都在使用中时最多等待的秒数，默认不等待
+        clean_ignored: 复用工作树时是否同时删除被忽略的文件（例如构建产物），默认为 True
+    
+    返回:
+        Dict[str, Any]: 租用ID、工作树路径、检出的提交以及是否复用了已有的工作树
+    """
+    try:
+        lease = await worktree_pool.lease(path, revision, branch, wait_seconds, clean_ignored)
+        return {"success": True, **lease}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_worktree_release(lease_id: str, discard: bool = False) -> Dict[str, Any]:
+    """归还租用的工作树，之后它可能被其他调用方复用（其中未提交的修改会被丢弃）
+    
+    参数:
+        lease_id: git_worktree_lease 返回的租用ID
+        discard: 是否直接删除这个工作树，默认为 False
+    
+    返回:
+        Dict[str, Any]: 归还的工作树路径以及因超出空闲数量或过期而删除的工作树
+    """
+    try:
+        return {"success": True, **await worktree_pool.release(lease_id, discard)}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_worktree_pool_status(path: str, gc: bool = False, keep_idle: Optional[int] = None) -> Dict[str, Any]:
+    """查看仓库工作树池中的工作树及其租用情况，可选地清理空闲的工作树
+    
+    参数:
+        path: 仓库路径
+        gc: 是否按最近使用时间删除多余的空闲工作树
+        keep_idle: 清理时保留的空闲工作树数量，默认使用 GIT_OPTION_WORKTREE_IDLE_KEEP
+    
+    返回:
+        Dict[str, Any]: 池目录、容量、租用中和空闲的工作树，以及本次删除的工作树
+    """
+    try:
+        removed = []
+        if gc:
+            removed = await worktree_pool.gc(path, **({"keep": keep_idle} if keep_idle is not None else {}))
+        return {"success": True, **await worktree_pool.status(path), "removed": removed}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_bisect_run(path: str, good: str, bad: str, command: str, parallelism: int = 3,
+                         timeout: Optional[float] = None) -> Dict[str, Any]:
+    """并行二分查找引入问题的提交：每轮在多个工作树中同时测试多个提交，比 git bisect 逐个测试快得多
+    
+    在 good..bad 的第一父提交序列上查找，不会改动当前工作区
+    
+    参数:
+        path: 仓库路径
+        good: 已知正常的版本
+        bad: 已知有问题的版本
+        command: 测试命令，在检出的工作树根目录中执行；退出码 0 表示正常，125 表示无法测试（跳过），
+            1-127 的其他值表示有问题，大于 127 时中止查找
+        parallelism: 每轮同时测试的提交数，默认3，不超过工作树池的容量
+        timeout: 单次测试的超时时间（秒），默认使用 GIT_OPTION_BISECT_TEST_TIMEOUT
+    
+    返回:
+        Dict[str, Any]: 第一个有问题的提交及其信息，以及每一轮测试的提交、结果、输出和耗时
+    """
+    try:
+        result = await bisect_run(path, good, bad, command, parallelism, timeout or BISECT_TEST_TIMEOUT)
+        return {"success": result["culprit"] is not None, **result}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_branch_report(path: str, base: Optional[str] = None, include_remotes: bool = False,
+                            patterns: Optional[List[str]] = None, include_merge_base: bool = False,
+                            limit: Optional[int] = None) -> Dict[str, Any]:
+    """一次调用获取所有分支的概览：相对基准分支领先/落后的提交数、是否已合并、最后一次提交的信息，按提交时间倒序
+    
+    参数:
+        path: 仓库路径
+        base: 基准版本（例如 main 或 origin/main），不指定则使用 HEAD
+        include_remotes: 是否包括远程跟踪分支，默认为 False
+        patterns: 只包括匹配这些模式的引用，例如 ["refs/heads/feature/"]
+        include_merge_base: 是否返回每个分支与基准的合并基础，默认为 False
+        limit: 只返回最近提交的若干个分支
+    
+    返回:
+        Dict[str, Any]: 基准提交、分支总数、已合并的分支数，以及每个分支的提交、作者、主题、上游跟踪状态、
+        ahead、behind 和 merged
+    """
+    try:
+        if patterns and any(pattern.startswith("-") for pattern in patterns):
+            return {"success": False, "message": "错误: 无效的引用模式"}
+        key = ("branch_report", os.path.realpath(path), await ref_fingerprint(path), base, include_remotes,
+               tuple(patterns or ()), include_merge_base, limit)
+        report = result_cache.get(key)
+        if report is None:
+            report = await branch_report(path, base, include_remotes, patterns, include_merge_base, limit)
+            result_cache.put(key, report, len(report["branches"]) * 512)
+        return {"success": True, **report}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_maintenance_status(path: Optional[str] = None) -> Dict[str, Any]:
+    """查看后台仓库维护的状态（提交图、重新打包、multi-pack-index、位图等任务的上次执行结果和下次到期时间）
+    
+    服务会记录操作过的仓库，并在空闲时自动在后台执行到期的维护任务
+    
+    参数:
+        path: 仓库路径，不指定则返回所有已记录的仓库
+    
+    返回:
+        Dict[str, Any]: 是否启用、当前空闲时间以及每个仓库各维护任务的状态
+    """
+    try:
+        return {"success": True, **(await maintenance_scheduler.status(path))}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_maintenance_run(path: str, tasks: Optional[List[str]] = None) -> Dict[str, Any]:
+    """立即执行仓库维护任务（不等待空闲）
+    
+    参数:
+        path: 仓库路径
+        tasks: 要执行的任务，可选 "commit-graph"、"loose-objects"、"incremental-repack"、"bitmap"、"pack-refs"，
+            不指定则全部执行
+    
+    返回:
+        Dict[str, Any]: 每个任务的执行结果（status 为 ok、failed 或 skipped）和耗时
+    """
+    try:
+        return {"success": True, "tasks": await maintenance_scheduler.run_now(path, tasks)}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+def _discover_repos(root: str, max_depth: int) -> List[str]:
+    """在根目录下查找 git 仓库（包含 .git 目录或文件的目录），不进入已找到的仓库内部"""
+    repos = []
+    stack = [(os.path.abspath(root), 0)]
+    while stack:
+        directory, depth = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = [entry for entry in it if entry.is_dir(follow_symlinks=False) or entry.name == ".git"]
+        except OSError:
+            continue
+        if any(entry.name == ".git" for entry in entries):
+            repos.append(directory)
+            continue
+        if depth < max_depth:
+            for entry in entries:
+                if entry.name not in BATCH_SKIP_DIRS and not entry.name.startswith("."):
+                    stack.append((entry.path, depth + 1))
+    return sorted(repos)
+
+async def _batch_one(operation: str, repo: str, remote: Optional[str], branch: Optional[str],
+                     num_entries: int) -> Dict[str, Any]:
+    """对单个仓库执行批量操作中的一项"""
+    if operation == "status":
+        result = await git_status_structured(repo, limit=0)
+        if result["success"]:
+            result = {key: result[key] for key in ("success", "branch", "summary", "clean")}
+        return result
+    if operation == "log":
+        result = await git_log_structured(repo, limit=num_entries)
+        if result["success"]:
+            result = {"success": True, "commits": result["commits"]}
+        return result
+    
+    if operation == "fetch":
+        command = ['fetch', '--prune'] + ([remote] if remote else ['--all'])
+    else:
+        # 批量拉取只做快进合并，避免在多个仓库中意外产生合并提交
+        command = ['pull', '--ff-only'] + ([remote] if remote else []) + ([branch] if remote and branch else [])
+    result = await run_git(command, repo, timeout=GIT_NETWORK_TIMEOUT)
+    if result.timed_out:
+        return {"success": False, "message": f"错误: 命令执行超时（{GIT_NETWORK_TIMEOUT}秒）"}
+    if not result.ok:
+        return {"success": False, "message": f"错误: {result.error.strip()}"}
+    return {"success": True, "output": (result.text + result.error).strip()}
+
+@mcp.tool()
+async def git_batch(operation: str, paths: Optional[List[str]] = None, root: Optional[str] = None,
+                    max_depth: int = 3, max_parallel: int = 8, remote: Optional[str] = None,
+                    branch: Optional[str] = None, num_entries: int = 5) -> Dict[str, Any]:
+    """对多个仓库并行执行同一操作，返回汇总的结构化结果
+    
+    参数:
+        operation: 操作类型："status"、"fetch"、"pull"（只做快进合并）或 "log"
+        paths: 仓库路径列表
+        root: 在该目录下自动查找仓库（可与 paths 同时使用）
+        max_depth: 在 root 下查找仓库的最大目录深度，默认3
+        max_parallel: 最多同时处理的仓库数，默认8
+        remote: fetch/pull 使用的远程仓库，不指定时 fetch 所有远程、pull 使用跟踪分支
+        branch: pull 的远程分支（需同时指定 remote）
+        num_entries: log 操作每个仓库返回的提交数，默认5
+    
+    返回:
+        Dict[str, Any]: 成功和失败的仓库数，以及每个仓库的结果（失败的仓库单独给出错误信息）
+    """
+    try:
+        if operation not in BATCH_OPERATIONS:
+            return {"success": False, "message": f"错误: 不支持的操作: {operation}，可选 {', '.join(BATCH_OPERATIONS)}"}
+        repos = list(paths or [])
+        if root:
+            repos += await asyncio.to_thread(_discover_repos, root, max_depth)
+        repos = list(dict.fromkeys(repos))
+        if not repos:
+            return {"success": False, "message": "错误: 没有找到任何仓库"}
+        
+        semaphore = asyncio.Semaphore(max(1, max_parallel))
+        
+        async def run(repo: str) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    if not os.path.isdir(repo):
+                        result = {"success": False, "message": f"错误: 目录不存在: {repo}"}
+                    else:
+                        result = await _batch_one(operation, repo, remote, branch, num_entries)
+                except Exception as e:
+                    result = {"success": False, "message": f"错误: {e}"}
+                return {"path": repo, **result, "duration": round(time.monotonic() - started, 3)}
+        
+        results = await asyncio.gather(*(run(repo) for repo in repos))
+        succeeded = sum(1 for result in results if result["success"])
+        return {
+            "success": True,
+            "operation": operation,
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
+        }
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_cache_stats() -> Dict[str, Any]:
+    """查看服务内各类缓存（查询结果、blame、cat-file 进程池）的状态和命中情况
+    
+    返回:
+        Dict[str, Any]: 各缓存的条目数、大小和命中/未命中次数
+    """
+    return {
+        "success": True,
+        "result_cache": result_cache.stats(),
+        "blame_cache": blame_cache.stats(),
+        "cat_file_pool": cat_file_pool.stats(),
+    }
+
+async def _sparse_checkout(repo: str, command: str, paths: List[str]) -> None:
+    """执行 `sparse-checkout set/add`，路径通过标准输入传入（部分克隆时会按需下载新纳入的文件）"""
+    result = await run_git(['sparse-checkout', command, '--stdin'], repo, timeout=GIT_NETWORK_TIMEOUT,
+                           input="".join(path + "\n" for path in paths).encode())
+    if result.timed_out:
+        raise GitError(f"命令执行超时（{GIT_NETWORK_TIMEOUT}秒）")
+    if not result.ok:
+        raise GitError(result.error.strip() or f"sparse-checkout {command} 失败", result.returncode)
+
+async def _sparse_patterns(repo: str) -> Optional[List[str]]:
+    """当前的稀疏检出目录列表，未启用稀疏检出时返回 None"""
+    if (await run_git(['config', '--bool', 'core.sparseCheckout'], repo)).text.strip() != "true":
+        return None
+    result = await run_git(['sparse-checkout', 'list'], repo)
+    return result.text.splitlines() if result.ok else None
+
+@mcp.tool()
+async def git_clone(url: str, path: str, filter: Optional[str] = None, depth: Optional[int] = None,
+                    branch: Optional[str] = None, single_branch: bool = False,
+                    sparse_paths: Optional[List[str]] = None, background: bool = False,
+                    timeout: Optional[float] = None) -> Dict[str, Any]:
+    """克隆仓库，支持部分克隆、浅克隆和稀疏检出，避免为大仓库下载完整的历史和所有文件
+    
+    参数:
+        url: 远程仓库地址；本地路径在使用 filter 或 depth 时会自动转换为 file:// 地址（本地克隆会忽略这两个选项）
+        path: 克隆的目标目录（不存在或为空）
+        filter: 部分克隆的对象过滤器，例如 "blob:none"（按需下载文件内容）、"blob:limit=1m"、"tree:0"（按需下载目录树）
+        depth: 浅克隆的提交深度
+        branch: 检出的分支，不指定则使用远程的默认分支
+        single_branch: 是否只获取一个分支的历史（指定 depth 时 git 默认如此）
+        sparse_paths: 稀疏检出（cone 模式）的目录列表，只检出这些目录以及根目录下的文件；之后可以用 git_sparse_add 扩大
+        background: 是否作为后台作业运行，立即返回作业ID（用 git_job_status 查看进度）
+        timeout: 总超时时间（秒），默认使用 GIT_OPTION_NETWORK_TIMEOUT
+    
+    返回:
+        Dict[str, Any]: 作业状态；同步执行时还包括检出的提交和稀疏检出目录
+    """
+    try:
+        if filter is not None and not CLONE_FILTER_RE.match(filter):
+            return {"success": False, "message": f"错误: 不支持的过滤器: {filter}"}
+        if depth is not None and depth < 1:
+            return {"success": False, "message": "错误: depth 必须大于 0"}
+        target = os.path.abspath(path)
+        if os.path.exists(target) and (not os.path.isdir(target) or os.listdir(target)):
+            return {"success": False, "message": f"错误: 目标路径已存在且不是空目录: {path}"}
+        if (filter or depth) and os.path.isdir(url):
+            url = "file://" + os.path.abspath(url)
+        
+        args = ['clone', '--progress']
+        if filter:
+            args.append(f'--filter={filter}')
+        if depth:
+            args.append(f'--depth={depth}')
+        if branch:
+            args += ['--branch', branch]
+        if single_branch:
+            args.append('--single-branch')
+        if sparse_paths:
+            # --sparse 先只检出根目录下的文件，克隆完成后再设置需要的目录
+            args.append('--sparse')
+        args += ['--', url, target]
+        
+        async def configure_sparse():
+            await _sparse_checkout(target, 'set', sparse_paths)
+        
+        after = configure_sparse if sparse_paths else None
+        
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        job = job_manager.start("clone", args, os.path.dirname(target), timeout=timeout or GIT_NETWORK_TIMEOUT,
+                                after=after)
+        if background:
+            return {"success": True, **job.to_dict()}
+        
+        await job.done.wait()
+        response = {"success": job.status == "succeeded", **job.to_dict()}
+        if job.status == "succeeded":
+            head = await run_git(['rev-parse', 'HEAD'], target)
+            response["head"] = head.text.strip() if head.ok else None
+            response["sparse_paths"] = await _sparse_patterns(target)
+        # 例如服务器不支持过滤器时 git 会忽略 filter 并下载全部对象，只输出一条警告
+        warnings = [line for line in job.output if line.startswith("warning:")]
+        if warnings:
+            response["warnings"] = warnings
+        return response
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_sparse_add(path: str, paths: List[str]) -> Dict[str, Any]:
+    """扩大稀疏检出的范围，检出更多目录（部分克隆时按需下载这些目录中的文件）
+    
+    参数:
+        path: 仓库路径
+        paths: 要加入的目录列表
+    
+    返回:
+        Dict[str, Any]: 加入后的稀疏检出目录列表
+    """
+    try:
+        if not paths:
+            return {"success": False, "message": "错误: 没有指定目录"}
+        if await _sparse_patterns(path) is None:
+            return {"success": False, "message": "错误: 仓库没有启用稀疏检出"}
+        await _sparse_checkout(path, 'add', paths)
+        return {"success": True, "sparse_paths": await _sparse_patterns(path)}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_job_start(operation: str, path: str, remote: str = 'origin', branch: Optional[str] = None,
+                        url: Optional[str] = None, timeout: Optional[float] = None,
+                        stall_timeout: Optional[float] = None) -> Dict[str, Any]:
+    """以后台作业的方式运行耗时的网络操作（push、pull、fetch、clone），立即返回作业ID
+    
+    之后用 git_job_status 查看进度和结果，用 git_job_cancel 取消
+    
+    参数:
+        operation: 操作类型："push"、"pull"、"fetch" 或 "clone"
+        path: 仓库路径；clone 时为克隆的目标目录
+        remote: 远程仓库名称，默认为 origin（fetch 时传入空字符串表示所有远程）
+        branch: 分支名称，不指定则使用默认的跟踪分支
+        url: clone 的源地址
+        timeout: 总超时时间（秒），默认使用 GIT_OPTION_NETWORK_TIMEOUT
+        stall_timeout: 持续没有输出多久（秒）后终止作业，默认使用 GIT_OPTION_JOB_STALL_TIMEOUT
+    
+    返回:
+        Dict[str, Any]: 作业ID和初始状态
+    """
+    try:
+        if operation not in JOB_OPERATIONS:
+            return {"success": False, "message": f"错误: 不支持的操作: {operation}，可选 {', '.join(JOB_OPERATIONS)}"}
+        cwd = path
+        if operation == "clone":
+            if not url:
+                return {"success": False, "message": "错误: clone 需要指定 url"}
+            target = os.path.abspath(path)
+            cwd = os.path.dirname(target)
+            os.makedirs(cwd, exist_ok=True)
+            args = ['clone', '--progress'] + (['--branch', branch] if branch else []) + ['--', url, target]
+        elif operation == "fetch":
+            args = ['fetch', '--progress', '--prune'] + ([remote] if remote else ['--all'])
+        else:
+            args = [operation, '--progress', remote] + ([branch] if branch else [])
+        
+        options = {}
+        if timeout is not None:
+            options["timeout"] = timeout
+        if stall_timeout is not None:
+            options["stall_timeout"] = stall_timeout
+        job = job_manager.start(operation, args, cwd, **options)
+        return {"success": True, **job.to_dict()}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_job_status(job_id: str, wait_seconds: float = 0, output_lines: int = 20) -> Dict[str, Any]:
+    """查看后台作业的进度和结果
+    
+    参数:
+        job_id: 作业ID
+        wait_seconds: 作业仍在运行时最多等待多少秒（用于等待最终结果），默认不等待
+        output_lines: 返回最近多少行输出，默认20
+    
+    返回:
+        Dict[str, Any]: 作业状态（running、succeeded、failed、cancelled、timed_out）、当前阶段的进度
+        （percent、current、total、bytes、bytes_per_second）、各阶段进度以及最近的输出
+    """
+    try:
+        job = await job_manager.wait(job_id, wait_seconds)
+        return {"success": True, **job.to_dict(output_lines)}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_job_cancel(job_id: str) -> Dict[str, Any]:
+    """取消正在运行的后台作业（终止 git 进程）
+    
+    参数:
+        job_id: 作业ID
+    
+    返回:
+        Dict[str, Any]: 作业的最终状态
+    """
+    try:
+        job = await job_manager.cancel(job_id)
+        return {"success": True, **job.to_dict()}
+    except Exception as e:
+        return {"success": False, "message": f"错误: {e}"}
+
+@mcp.tool()
+async def git_job_list() -> Dict[str, Any]:
+    """列出所有后台作业（包括最近结束的作业）
+    
+    返回:
+        Dict[str, Any]: 作业列表，按启动时间倒序
+    """
+    return {"success": True, "jobs": [job.to_dict(output_lines=0) for job in job_manager.list()]}
+
 if __name__ == "__main__":
     mcp.run(transport='stdio')
\ No newline at end of file
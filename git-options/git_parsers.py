@@ -0,0 +1,135 @@
+"""
+git 输出解析模块：解析使用 NUL / 控制字符分隔的机器可读输出
+"""
+
+from typing import Any, Dict, List, Optional
+
+# 结构化日志的输出格式：每条提交以 \x1e 开头，字段之间用 \x1f 分隔
+LOG_FIELDS = ["sha", "parents", "author_name", "author_email", "author_date",
+              "committer_name", "committer_email", "committer_date", "subject"]
+LOG_FORMAT = "%x1e" + "%x1f".join(["%H", "%P", "%an", "%ae", "%aI", "%cn", "%ce", "%cI", "%s"]) + "%x1f"
+
+
+def parse_numstat(data: bytes) -> List[Dict[str, Any]]:
+    """解析 `--numstat -z` 的输出，二进制文件的增删行数为 None"""
+    tokens = data.lstrip(b"\0\n").split(b"\0")
+    files = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if not token:
+            continue
+        added, deleted, name = token.split(b"\t", 2)
+        entry = {
+            "added": int(added) if added != b"-" else None,
+            "deleted": int(deleted) if deleted != b"-" else None,
+        }
+        if not name:
+            # 重命名/复制：后面依次是原路径和新路径
+            entry["old_path"] = tokens[i].decode("utf-8", errors="replace")
+            name = tokens[i + 1]
+            i += 2
+        entry["path"] = name.decode("utf-8", errors="replace")
+        files.append(entry)
+    return files
+
+
+def parse_log_record(record: bytes, include_numstat: bool = False,
+                     field_names: List[str] = LOG_FIELDS) -> Dict[str, Any]:
+    """解析一条结构化日志记录（字段顺序与格式字符串一致，最后一个字段之后是 numstat）"""
+    fields = record.split(b"\x1f", len(field_names))
+    commit = {name: value.decode("utf-8", errors="replace") for name, value in zip(field_names, fields)}
+    if "parents" in commit:
+        commit["parents"] = commit["parents"].split()
+    if include_numstat:
+        commit["files"] = parse_numstat(fields[len(field_names)]) if len(fields) > len(field_names) else []
+    return commit
+
+
+def _status_entry(kind: str, xy: bytes, path: bytes) -> Dict[str, Any]:
+    return {
+        "path": path.decode("utf-8", errors="replace"),
+        "kind": kind,
+        "index": xy[:1].decode(),
+        "worktree": xy[1:2].decode(),
+    }
+
+
+def parse_status_v2(records: List[bytes]) -> Dict[str, Any]:
+    """
+    解析 `git status --porcelain=v2 -z --branch` 的输出（按 NUL 切分后的记录列表）
+
+    返回分支信息和条目列表；每个条目的 index / worktree 为暂存区和工作区的状态字母（"." 表示未修改），
+    kind 为 changed / renamed / copied / unmerged / untracked / ignored
+    """
+    branch: Dict[str, Any] = {}
+    entries = []
+    i = 0
+    while i < len(records):
+        record = records[i]
+        i += 1
+        if not record:
+            continue
+        tag = record[:1]
+        if tag == b"#":
+            _, key, value = record.decode("utf-8", errors="replace").split(" ", 2)
+            if key == "branch.oid":
+                branch["oid"] = None if value == "(initial)" else value
+            elif key == "branch.head":
+                branch["head"] = None if value == "(detached)" else value
+            elif key == "branch.upstream":
+                branch["upstream"] = value
+            elif key == "branch.ab":
+                ahead, behind = value.split()
+                branch["ahead"] = int(ahead)
+                branch["behind"] = -int(behind)
+        elif tag == b"1":
+            fields = record.split(b" ", 8)
+            entry = _status_entry("changed", fields[1], fields[8])
+            entry["submodule"] = fields[2].decode() != "N..."
+            entries.append(entry)
+        elif tag == b"2":
+            # 重命名/复制：下一条记录是原路径
+            fields = record.split(b" ", 9)
+            entry = _status_entry("renamed" if fields[8][:1] == b"R" else "copied", fields[1], fields[9])
+            entry["submodule"] = fields[2].decode() != "N..."
+            entry["score"] = int(fields[8][1:])
+            entry["old_path"] = records[i].decode("utf-8", errors="replace")
+            i += 1
+            entries.append(entry)
+        elif tag == b"u":
+            fields = record.split(b" ", 10)
+            entry = _status_entry("unmerged", fields[1], fields[10])
+            entry["submodule"] = fields[2].decode() != "N..."
+            entries.append(entry)
+        elif tag in (b"?", b"!"):
+            kind = "untracked" if tag == b"?" else "ignored"
+            entries.append({"path": record[2:].decode("utf-8", errors="replace"), "kind": kind})
+    return {"branch": branch, "entries": entries}
+
+
+def parse_grep_line(line: bytes, revisions: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    解析 `git grep -z -n --column` 的一行输出；分组分隔行 "--" 返回 None
+
+    匹配行为 "文件\\0行号\\0列号\\0内容"，上下文行没有列号；搜索版本时文件名前带有 "版本:"
+    """
+    parts = line.split(b"\0", 3)
+    if len(parts) < 3:
+        return None
+    name = parts[0].decode("utf-8", errors="replace")
+    revision = None
+    for candidate in revisions:
+        if name.startswith(candidate + ":"):
+            revision, name = candidate, name[len(candidate) + 1:]
+            break
+    is_match = len(parts) == 4
+    return {
+        "revision": revision,
+        "path": name,
+        "line": int(parts[1]),
+        "column": int(parts[2]) if is_match else None,
+        "text": (parts[3] if is_match else parts[2]).decode("utf-8", errors="replace"),
+        "match": is_match,
+    }
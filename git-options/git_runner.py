@@ -0,0 +1,337 @@
+"""
+Git 命令异步执行模块
+
+基于 asyncio 子进程运行 git，不阻塞 MCP 服务的事件循环：
+- 按仓库限制同时运行的 git 进程数
+- 每次调用都有超时，超时或被取消时杀掉整个子进程组
+- 标准输出超过大小限制时截断并提前结束子进程
+- 支持流式读取输出，调用方可以边读边解析，读够即停
+- 记录前台 git 调用的活动情况，供后台维护任务判断是否空闲
+"""
+
+import os
+import time
+import signal
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 每个仓库同时运行的 git 进程上限
+GIT_MAX_CONCURRENCY = int(os.environ.get("GIT_OPTION_MAX_CONCURRENCY", "4"))
+# 默认超时时间（秒）
+GIT_DEFAULT_TIMEOUT = float(os.environ.get("GIT_OPTION_TIMEOUT", "120"))
+# 网络操作（push/pull/fetch/clone）的默认超时时间（秒）
+GIT_NETWORK_TIMEOUT = float(os.environ.get("GIT_OPTION_NETWORK_TIMEOUT", "600"))
+# 标准输出的大小上限（字节）
+GIT_MAX_OUTPUT = int(os.environ.get("GIT_OPTION_MAX_OUTPUT", str(10 * 1024 * 1024)))
+# 标准错误只保留这么多字节
+GIT_MAX_STDERR = 1024 * 1024
+
+_READ_CHUNK = 64 * 1024
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_git_dirs: Dict[str, Tuple[str, str]] = {}
+_git_version: Optional[Tuple[int, ...]] = None
+
+# 后台任务（例如仓库维护）在此上下文中运行 git，不计入前台活动
+background_context: ContextVar[bool] = ContextVar("git_background", default=False)
+_activity_listeners: List[Callable[[str], None]] = []
+_last_activity = time.monotonic()
+_active_calls = 0
+
+
+@dataclass
+class GitResult:
+    """git 命令的执行结果"""
+    returncode: Optional[int]
+    stdout: bytes
+    stderr: bytes
+    truncated: bool = False
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """命令是否成功（因输出过大被截断时视为成功）"""
+        return not self.timed_out and (self.returncode == 0 or self.truncated)
+
+    @property
+    def text(self) -> str:
+        return self.stdout.decode("utf-8", errors="replace")
+
+    @property
+    def error(self) -> str:
+        return self.stderr.decode("utf-8", errors="replace")
+
+
+class GitError(Exception):
+    """git 命令执行失败"""
+
+    def __init__(self, message: str, returncode: Optional[int] = None):
+        super().__init__(message)
+        self.returncode = returncode
+
+
+class GitTimeoutError(GitError):
+    """git 命令执行超时"""
+
+
+def repo_semaphore(cwd: Optional[str]) -> asyncio.Semaphore:
+    """获取仓库对应的并发信号量"""
+    key = os.path.realpath(cwd) if cwd else ""
+    semaphore = _semaphores.get(key)
+    if semaphore is None:
+        semaphore = _semaphores[key] = asyncio.Semaphore(GIT_MAX_CONCURRENCY)
+    return semaphore
+
+
+def add_activity_listener(listener: Callable[[str], None]) -> None:
+    """注册回调：每次前台 git 调用开始时以工作目录为参数调用"""
+    _activity_listeners.append(listener)
+
+
+def idle_seconds() -> float:
+    """距离最近一次前台 git 调用结束的秒数，有前台调用正在运行时为 0"""
+    if _active_calls:
+        return 0.0
+    return time.monotonic() - _last_activity
+
+
+def _activity_begin(cwd: Optional[str]) -> bool:
+    global _active_calls
+    if background_context.get():
+        return False
+    _active_calls += 1
+    if cwd:
+        for listener in _activity_listeners:
+            listener(cwd)
+    return True
+
+
+def _activity_end(counted: bool) -> None:
+    global _active_calls, _last_activity
+    if counted:
+        _active_calls -= 1
+        _last_activity = time.monotonic()
+
+
+@contextmanager
+def foreground_activity(cwd: Optional[str]) -> Iterator[None]:
+    """把一段不经过 run_git / stream_git 的 git 调用（例如后台作业）计为前台活动"""
+    counted = _activity_begin(cwd)
+    try:
+        yield
+    finally:
+        _activity_end(counted)
+
+
+def kill_process(proc: asyncio.subprocess.Process) -> None:
+    """杀掉子进程及其进程组（git 可能再启动 ssh、远程助手等子进程）"""
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def spawn_git(args: List[str], cwd: Optional[str] = None, stdin: bool = False,
+                    env: Optional[Dict[str, str]] = None) -> asyncio.subprocess.Process:
+    """启动 git 子进程（独立进程组，便于整体终止）"""
+    return await asyncio.create_subprocess_exec(
+        "git", *args,
+        cwd=cwd,
+        stdin=asyncio.subprocess.PIPE if stdin else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, **env} if env else None,
+        start_new_session=(os.name == "posix"),
+    )
+
+
+async def _read_limited(stream: asyncio.StreamReader, limit: int) -> bytes:
+    """读取全部数据，只保留前 limit 字节"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await stream.read(_READ_CHUNK)
+        if not chunk:
+            return b"".join(chunks)
+        if size < limit:
+            chunks.append(chunk[:limit - size])
+            size += len(chunks[-1])
+
+
+async def _feed(proc: asyncio.subprocess.Process, input: Optional[bytes]) -> None:
+    """写入标准输入后关闭；子进程提前退出时忽略管道错误"""
+    if input is None:
+        return
+    try:
+        proc.stdin.write(input)
+        await proc.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        proc.stdin.close()
+
+
+async def _communicate(proc: asyncio.subprocess.Process, input: Optional[bytes], max_output: int):
+    """写入标准输入并读取输出；标准输出超过上限时截断并结束子进程"""
+    async def read_stdout():
+        chunks = []
+        size = 0
+        while True:
+            chunk = await proc.stdout.read(_READ_CHUNK)
+            if not chunk:
+                return b"".join(chunks), False
+            if size + len(chunk) > max_output:
+                chunks.append(chunk[:max_output - size])
+                kill_process(proc)
+                return b"".join(chunks), True
+            chunks.append(chunk)
+            size += len(chunk)
+
+    (stdout, truncated), stderr, _ = await asyncio.gather(
+        read_stdout(), _read_limited(proc.stderr, GIT_MAX_STDERR), _feed(proc, input)
+    )
+    returncode = await proc.wait()
+    return GitResult(returncode, stdout, stderr, truncated=truncated)
+
+
+async def run_git(args: List[str], cwd: Optional[str] = None, timeout: Optional[float] = GIT_DEFAULT_TIMEOUT,
+                  max_output: int = GIT_MAX_OUTPUT, input: Optional[bytes] = None,
+                  env: Optional[Dict[str, str]] = None) -> GitResult:
+    """
+    异步执行 git 命令
+
+    Args:
+        args: git 子命令及参数
+        cwd: 工作目录（仓库路径）
+        timeout: 超时时间（秒），None 表示不限制
+        max_output: 标准输出的大小上限（字节）
+        input: 写入标准输入的数据
+        env: 额外的环境变量
+
+    Returns:
+        GitResult: 执行结果；超时时 timed_out 为 True
+
+    Raises:
+        OSError: git 无法启动（例如工作目录不存在）
+    """
+    counted = _activity_begin(cwd)
+    try:
+        async with repo_semaphore(cwd):
+            proc = await spawn_git(args, cwd, stdin=input is not None, env=env)
+            try:
+                return await asyncio.wait_for(_communicate(proc, input, max_output), timeout)
+            except asyncio.TimeoutError:
+                kill_process(proc)
+                await proc.wait()
+                return GitResult(proc.returncode, b"", b"", timed_out=True)
+            except asyncio.CancelledError:
+                kill_process(proc)
+                await proc.wait()
+                raise
+    finally:
+        _activity_end(counted)
+
+
+async def git_dirs(path: str) -> Tuple[str, str]:
+    """
+    获取仓库的 git 目录和公共 git 目录（多个工作树共享）的绝对路径，结果按路径缓存
+
+    Raises:
+        GitError: 路径不在 git 仓库中
+    """
+    key = os.path.realpath(path)
+    if key not in _git_dirs:
+        result = await run_git(['rev-parse', '--absolute-git-dir', '--git-common-dir'], path)
+        if not result.ok:
+            raise GitError(result.error.strip() or f"不是 git 仓库: {path}", result.returncode)
+        git_dir, common_dir = result.text.splitlines()[:2]
+        _git_dirs[key] = (git_dir, os.path.normpath(os.path.join(key, common_dir)))
+    return _git_dirs[key]
+
+
+async def git_version() -> Tuple[int, ...]:
+    """已安装的 git 的版本号，例如 (2, 39, 5)，结果会被缓存"""
+    global _git_version
+    if _git_version is None:
+        result = await run_git(['version'])
+        digits = result.text.split()[2] if result.ok and len(result.text.split()) > 2 else ""
+        _git_version = tuple(int(part) for part in digits.split(".") if part.isdigit())
+    return _git_version
+
+
+async def stream_git(args: List[str], cwd: Optional[str] = None,
+                     timeout: Optional[float] = GIT_DEFAULT_TIMEOUT,
+                     input: Optional[bytes] = None, env: Optional[Dict[str, str]] = None) -> AsyncIterator[bytes]:
+    """
+    流式读取 git 命令的标准输出，可选通过标准输入传入数据（例如 --stdin 形式的版本列表）
+
+    调用方应配合 contextlib.aclosing 使用，提前结束迭代时子进程会被立即终止
+
+    Raises:
+        GitTimeoutError: 超过总超时时间
+        GitError: git 以非零状态退出
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+    counted = _activity_begin(cwd)
+    try:
+        async with repo_semaphore(cwd):
+            proc = await spawn_git(args, cwd, stdin=input is not None, env=env)
+            stderr_task = asyncio.ensure_future(_read_limited(proc.stderr, GIT_MAX_STDERR))
+            feed_task = asyncio.ensure_future(_feed(proc, input)) if input is not None else None
+            try:
+                while True:
+                    remaining = deadline - loop.time() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        raise asyncio.TimeoutError
+                    chunk = await asyncio.wait_for(proc.stdout.read(_READ_CHUNK), remaining)
+                    if not chunk:
+                        break
+                    yield chunk
+                returncode = await proc.wait()
+                stderr = await stderr_task
+                if returncode != 0:
+                    raise GitError(stderr.decode("utf-8", errors="replace").strip() or f"git 退出码 {returncode}",
+                                   returncode)
+            except asyncio.TimeoutError:
+                raise GitTimeoutError(f"命令执行超时（{timeout}秒）: git {' '.join(args)}")
+            finally:
+                kill_process(proc)
+                await proc.wait()
+                stderr_task.cancel()
+                if feed_task is not None:
+                    feed_task.cancel()
+    finally:
+        _activity_end(counted)
+
+
+async def stream_records(args: List[str], cwd: Optional[str] = None, separator: bytes = b"\0",
+                         timeout: Optional[float] = GIT_DEFAULT_TIMEOUT,
+                         input: Optional[bytes] = None,
+                         env: Optional[Dict[str, str]] = None) -> AsyncIterator[bytes]:
+    """
+    流式读取 git 输出，按分隔符切分后逐条产出（最后一条不以分隔符结尾时同样产出）
+
+    调用方应配合 contextlib.aclosing 使用
+    """
+    buffer = b""
+    stream = stream_git(args, cwd, timeout, input, env)
+    try:
+        async for chunk in stream:
+            buffer += chunk
+            records = buffer.split(separator)
+            buffer = records.pop()
+            for record in records:
+                yield record
+        if buffer:
+            yield buffer
+    finally:
+        await stream.aclose()
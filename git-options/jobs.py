@@ -0,0 +1,252 @@
+"""
+后台作业
+
+push / pull / fetch / clone 等网络操作可能持续很久，以后台作业的方式运行：启动后立即返回作业ID，
+调用方轮询解析后的进度（`--progress` 输出中的对象数、传输字节数和速率），可以随时取消，结束后获取结果。
+
+除了总超时之外还有停滞超时：一段时间内 git 没有任何输出（例如远程无响应）时终止作业。
+"""
+
+import os
+import re
+import time
+import uuid
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from git_runner import spawn_git, kill_process, foreground_activity, GIT_NETWORK_TIMEOUT
+
+# 没有任何输出超过该时间（秒）时认为作业停滞并终止
+JOB_STALL_TIMEOUT = float(os.environ.get("GIT_OPTION_JOB_STALL_TIMEOUT", "120"))
+# 保留的已结束作业数量
+JOB_HISTORY = 100
+# 每个作业保留的输出行数
+JOB_OUTPUT_LINES = 200
+
+# 例如 "Receiving objects:  45% (450/1000), 1.20 MiB | 2.00 MiB/s"、"Writing objects: 100% (3/3), 250 bytes | 250.00 KiB/s, done."
+# 或 "Enumerating objects: 5, done."
+_PROGRESS_RE = re.compile(
+    r"^(?:remote: )?(?P<phase>[A-Z][A-Za-z ]+?):\s+"
+    r"(?:(?P<percent>\d+)% \((?P<current>\d+)/(?P<total>\d+)\)|(?P<count>\d+))"
+    r"(?:, (?P<bytes>[\d.]+ (?:[KMGT]?i?B|bytes))(?: \| (?P<rate>[\d.]+ (?:[KMGT]?i?B|bytes)/s))?)?"
+    r"(?P<done>, done\.?)?"
+)
+
+_UNITS = {"B": 1, "bytes": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "TiB": 1024 ** 4,
+          "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4}
+
+# 作业的最终状态
+FINISHED_STATES = ("succeeded", "failed", "cancelled", "timed_out")
+
+
+def _parse_bytes(text: Optional[str]) -> Optional[int]:
+    if not text:
+        return None
+    value, unit = text.split(" ")
+    unit = unit[:-len("/s")] if unit.endswith("/s") else unit
+    return int(float(value) * _UNITS.get(unit, 1))
+
+
+def parse_progress(line: str) -> Optional[Dict[str, Any]]:
+    """解析一行 git 进度输出，不是进度行时返回 None"""
+    match = _PROGRESS_RE.match(line.strip())
+    if not match:
+        return None
+    progress = {"phase": match.group("phase").strip(), "done": bool(match.group("done"))}
+    if match.group("percent") is not None:
+        progress.update(percent=int(match.group("percent")), current=int(match.group("current")),
+                        total=int(match.group("total")))
+    else:
+        progress["current"] = int(match.group("count"))
+    if match.group("bytes"):
+        progress["bytes"] = _parse_bytes(match.group("bytes"))
+    if match.group("rate"):
+        progress["bytes_per_second"] = _parse_bytes(match.group("rate"))
+    return progress
+
+
+class Job:
+    """一个后台运行的 git 命令"""
+
+    def __init__(self, operation: str, args: List[str], cwd: Optional[str], timeout: Optional[float],
+                 stall_timeout: Optional[float], after: Optional[Callable[[], Awaitable[None]]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.operation = operation
+        self.args = args
+        self.cwd = cwd
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.after = after
+        self.status = "running"
+        self.returncode: Optional[int] = None
+        self.message: Optional[str] = None
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.last_output = time.monotonic()
+        self.phase: Optional[str] = None
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.output: deque = deque(maxlen=JOB_OUTPUT_LINES)
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.task: Optional[asyncio.Task] = None
+        self.done = asyncio.Event()
+
+    def _handle_line(self, line: str) -> None:
+        line = line.strip()
+        if not line:
+            return
+        progress = parse_progress(line)
+        if progress is None:
+            self.output.append(line)
+            return
+        self.phase = progress["phase"]
+        self.phases[progress["phase"]] = progress
+        if progress["done"]:
+            # 阶段结束的那一行也保留在输出中，便于查看
+            self.output.append(line)
+
+    def _error_message(self) -> str:
+        """失败原因：优先取第一条 fatal/error 行（后面通常是补充说明），否则取最后一行输出"""
+        for line in self.output:
+            if line.startswith(("fatal:", "error:")):
+                return line
+        return self.output[-1] if self.output else f"git 退出码 {self.returncode}"
+
+    async def _read(self, stream: asyncio.StreamReader) -> None:
+        """读取输出；进度行以 \\r 刷新，需要同时按 \\r 和 \\n 切分"""
+        buffer = ""
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            self.last_output = time.monotonic()
+            buffer += chunk.decode("utf-8", errors="replace")
+            lines = re.split(r"[\r\n]", buffer)
+            buffer = lines.pop()
+            for line in lines:
+                self._handle_line(line)
+        self._handle_line(buffer)
+
+    async def _watch(self) -> None:
+        """总超时与停滞超时检查"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout if self.timeout else None
+        while True:
+            await asyncio.sleep(1)
+            if deadline is not None and loop.time() >= deadline:
+                self.message = f"执行超时（{self.timeout}秒）"
+                break
+            if self.stall_timeout and time.monotonic() - self.last_output >= self.stall_timeout:
+                self.message = f"超过 {self.stall_timeout} 秒没有任何输出，作业已终止"
+                break
+        self.status = "timed_out"
+        kill_process(self.proc)
+
+    async def run(self) -> None:
+        watcher = None
+        try:
+            with foreground_activity(self.cwd):
+                # 禁止交互式提示（例如要求输入密码），否则作业会一直挂起
+                self.proc = await spawn_git(self.args, self.cwd, env={"GIT_TERMINAL_PROMPT": "0"})
+                watcher = asyncio.ensure_future(self._watch())
+                await asyncio.gather(self._read(self.proc.stdout), self._read(self.proc.stderr))
+                self.returncode = await self.proc.wait()
+                watcher.cancel()
+                if self.status == "running" and self.returncode == 0 and self.after is not None:
+                    # 后续步骤（例如克隆后设置稀疏检出）失败时整个作业视为失败
+                    self.phase = "Finishing"
+                    try:
+                        await self.after()
+                    except Exception as e:
+                        self.status = "failed"
+                        self.message = str(e)
+            if self.status == "running":
+                self.status = "succeeded" if self.returncode == 0 else "failed"
+                if self.returncode != 0:
+                    self.message = self._error_message()
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            self.message = "作业已取消"
+            if self.proc is not None:
+                kill_process(self.proc)
+                await self.proc.wait()
+                self.returncode = self.proc.returncode
+        except OSError as e:
+            self.status = "failed"
+            self.message = str(e)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            self.finished = time.time()
+            self.done.set()
+
+    def to_dict(self, output_lines: int = 20) -> Dict[str, Any]:
+        end = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "operation": self.operation,
+            "command": "git " + " ".join(self.args),
+            "cwd": self.cwd,
+            "status": self.status,
+            "returncode": self.returncode,
+            "message": self.message,
+            "elapsed_seconds": round(end - self.started, 1),
+            "phase": self.phase,
+            "progress": self.phases.get(self.phase) if self.phase else None,
+            "phases": list(self.phases.values()),
+            "output": list(self.output)[-output_lines:] if output_lines else [],
+        }
+
+
+class JobManager:
+    """管理后台作业"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    def start(self, operation: str, args: List[str], cwd: Optional[str] = None,
+              timeout: Optional[float] = GIT_NETWORK_TIMEOUT,
+              stall_timeout: Optional[float] = JOB_STALL_TIMEOUT,
+              after: Optional[Callable[[], Awaitable[None]]] = None) -> Job:
+        """启动作业并立即返回；after 在 git 命令成功后执行"""
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATES]
+        for job in sorted(finished, key=lambda job: job.finished)[:max(0, len(finished) - JOB_HISTORY + 1)]:
+            del self._jobs[job.id]
+        job = Job(operation, args, cwd, timeout, stall_timeout, after)
+        job.task = asyncio.get_running_loop().create_task(job.run())
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Job:
+        if job_id not in self._jobs:
+            raise ValueError(f"作业不存在: {job_id}")
+        return self._jobs[job_id]
+
+    async def wait(self, job_id: str, timeout: Optional[float]) -> Job:
+        """等待作业结束，最多等待 timeout 秒"""
+        job = self.get(job_id)
+        if timeout:
+            try:
+                await asyncio.wait_for(asyncio.shield(job.done.wait()), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if job.status == "running":
+            job.task.cancel()
+            # 任务在 run 开始执行之前就被取消时，run 中的清理不会执行，等待任务本身结束而不是 done 事件
+            await asyncio.gather(job.task, return_exceptions=True)
+            if not job.done.is_set():
+                job.status = "cancelled"
+                job.message = "作业已取消"
+                job.finished = time.time()
+                job.done.set()
+        return job
+
+    def list(self) -> List[Job]:
+        return sorted(self._jobs.values(), key=lambda job: job.started, reverse=True)
+
+
+job_manager = JobManager()
@@ -0,0 +1,208 @@
+"""
+后台仓库维护
+
+记录服务操作过的仓库，在服务空闲（一段时间内没有前台 git 调用）时，按计划在后台执行维护任务：
+写入提交图（commit-graph）、打包松散对象、增量重新打包并更新 multi-pack-index、写入可达性位图、打包引用。
+这些数据结构能显著加快 log、blame、merge-base、ahead/behind 等遍历历史的操作。
+
+每个仓库的维护状态保存在公共 git 目录下的 JSON 文件中，服务重启后不会重复执行刚做过的任务。
+"""
+
+import os
+import json
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from git_runner import run_git, git_dirs, add_activity_listener, idle_seconds, background_context, GitError
+
+# 是否启用后台维护（设置为 0 关闭）
+MAINTENANCE_ENABLED = os.environ.get("GIT_OPTION_MAINTENANCE", "1") != "0"
+# 服务空闲多久（秒）后才开始执行维护任务
+MAINTENANCE_IDLE = float(os.environ.get("GIT_OPTION_MAINTENANCE_IDLE", "120"))
+# 检查是否有到期任务的间隔（秒）
+MAINTENANCE_CHECK_INTERVAL = float(os.environ.get("GIT_OPTION_MAINTENANCE_CHECK_INTERVAL", "30"))
+# 单个维护任务的超时时间（秒）
+MAINTENANCE_TIMEOUT = float(os.environ.get("GIT_OPTION_MAINTENANCE_TIMEOUT", "3600"))
+
+STATE_FILE_NAME = "mcp-maintenance.json"
+
+# 任务名称 -> (git 参数, 执行间隔秒数, 是否需要已有包文件)；同时到期时按这里的顺序执行
+MAINTENANCE_TASKS = {
+    "commit-graph": (['maintenance', 'run', '--task=commit-graph', '--quiet'], 3600, False),
+    "loose-objects": (['maintenance', 'run', '--task=loose-objects', '--quiet'], 86400, False),
+    "incremental-repack": (['maintenance', 'run', '--task=incremental-repack', '--quiet'], 86400, True),
+    "bitmap": (['multi-pack-index', 'write', '--bitmap'], 7 * 86400, True),
+    "pack-refs": (['maintenance', 'run', '--task=pack-refs', '--quiet'], 7 * 86400, False),
+}
+
+
+def _has_packs(common_dir: str) -> bool:
+    try:
+        return any(name.endswith(".pack") for name in os.listdir(os.path.join(common_dir, "objects", "pack")))
+    except FileNotFoundError:
+        return False
+
+
+class RepoMaintenance:
+    """单个仓库（按公共 git 目录区分，多个工作树共享）的维护状态"""
+
+    def __init__(self, path: str, common_dir: str):
+        self.path = path
+        self.common_dir = common_dir
+        self.state_file = os.path.join(common_dir, STATE_FILE_NAME)
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.running: Optional[str] = None
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self.tasks = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _save(self) -> None:
+        try:
+            temp_file = self.state_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.state_file)
+        except OSError:
+            pass
+
+    def next_due(self, task: str) -> float:
+        """任务下次到期的时间戳，从未执行过的任务立即到期"""
+        last_run = self.tasks.get(task, {}).get("last_run")
+        return last_run + MAINTENANCE_TASKS[task][1] if last_run else 0.0
+
+    async def run_task(self, task: str) -> Dict[str, Any]:
+        """执行一个维护任务并记录结果"""
+        args, _, needs_packs = MAINTENANCE_TASKS[task]
+        started = time.time()
+        self.running = task
+        try:
+            if needs_packs and not _has_packs(self.common_dir):
+                record = {"status": "skipped", "message": "仓库中还没有包文件"}
+            else:
+                result = await run_git(args, self.path, timeout=MAINTENANCE_TIMEOUT)
+                if result.timed_out:
+                    record = {"status": "failed", "message": f"执行超时（{MAINTENANCE_TIMEOUT}秒）"}
+                elif not result.ok:
+                    record = {"status": "failed", "message": result.error.strip()}
+                else:
+                    record = {"status": "ok"}
+        except OSError as e:
+            record = {"status": "failed", "message": str(e)}
+        finally:
+            self.running = None
+        record["last_run"] = started
+        record["duration"] = round(time.time() - started, 3)
+        self.tasks[task] = record
+        self._save()
+        return record
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        tasks = {}
+        for task in MAINTENANCE_TASKS:
+            record = dict(self.tasks.get(task, {"status": "never"}))
+            record["due_in_seconds"] = max(0, round(self.next_due(task) - now))
+            tasks[task] = record
+        return {"path": self.path, "common_dir": self.common_dir, "running": self.running, "tasks": tasks}
+
+
+class MaintenanceScheduler:
+    """记录被操作过的仓库，并在空闲时依次执行到期的维护任务"""
+
+    def __init__(self, enabled: bool = MAINTENANCE_ENABLED, idle: float = MAINTENANCE_IDLE,
+                 check_interval: float = MAINTENANCE_CHECK_INTERVAL):
+        self.enabled = enabled
+        self.idle = idle
+        self.check_interval = check_interval
+        self.repos: Dict[str, RepoMaintenance] = {}
+        self._pending: Dict[str, None] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self, path: str) -> None:
+        """记录一个被操作过的路径（在前台 git 调用开始时调用，不能阻塞）"""
+        if not self.enabled:
+            return
+        self._pending[os.path.realpath(path)] = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def register(self, path: str) -> Optional[RepoMaintenance]:
+        """把路径解析为仓库并登记，不是 git 仓库时返回 None"""
+        try:
+            _, common_dir = await git_dirs(path)
+        except (GitError, OSError):
+            return None
+        repo = self.repos.get(common_dir)
+        if repo is None:
+            repo = self.repos[common_dir] = RepoMaintenance(path, common_dir)
+        return repo
+
+    async def _register_pending(self) -> None:
+        while self._pending:
+            path = next(iter(self._pending))
+            del self._pending[path]
+            await self.register(path)
+
+    def _next_job(self) -> Optional[tuple]:
+        """所有仓库中最早到期的任务"""
+        now = time.time()
+        jobs = [(repo.next_due(task), order, repo, task)
+                for repo in self.repos.values()
+                for order, task in enumerate(MAINTENANCE_TASKS)
+                if repo.next_due(task) <= now]
+        if not jobs:
+            return None
+        _, _, repo, task = min(jobs, key=lambda job: job[:2])
+        return repo, task
+
+    async def _run(self) -> None:
+        # 维护任务自身的 git 调用不计入前台活动
+        background_context.set(True)
+        while self.enabled:
+            await asyncio.sleep(self.check_interval)
+            await self._register_pending()
+            # 每次只执行一个任务，执行完重新检查是否仍然空闲
+            while self.enabled and idle_seconds() >= self.idle:
+                job = self._next_job()
+                if job is None:
+                    break
+                await job[0].run_task(job[1])
+
+    async def run_now(self, path: str, tasks: Optional[List[str]] = None) -> Dict[str, Any]:
+        """立即执行指定仓库的维护任务（不等待空闲），默认执行所有任务"""
+        tasks = tasks or list(MAINTENANCE_TASKS)
+        for task in tasks:
+            if task not in MAINTENANCE_TASKS:
+                raise ValueError(f"未知的维护任务: {task}")
+        repo = await self.register(path)
+        if repo is None:
+            raise GitError(f"不是 git 仓库: {path}")
+        results = {}
+        for task in tasks:
+            results[task] = await repo.run_task(task)
+        return results
+
+    async def status(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """维护状态；指定路径时只返回该仓库"""
+        if path:
+            repo = await self.register(path)
+            if repo is None:
+                raise GitError(f"不是 git 仓库: {path}")
+            repos = [repo]
+        else:
+            await self._register_pending()
+            repos = list(self.repos.values())
+        return {
+            "enabled": self.enabled,
+            "idle_seconds": round(idle_seconds(), 1),
+            "idle_threshold": self.idle,
+            "scheduler_running": self._task is not None and not self._task.done(),
+            "repos": [repo.status() for repo in repos],
+        }
+
+
+maintenance_scheduler = MaintenanceScheduler()
+add_activity_listener(maintenance_scheduler.touch)
@@ -0,0 +1,175 @@
+"""
+大对象与包文件分析
+
+- 流式读取 `cat-file --batch-all-objects --batch-check`，用固定大小的小顶堆保留最大的若干个 blob，
+  同时按对象类型汇总数量、原始大小和磁盘占用；内存占用与对象总数无关
+- 一次遍历 `git log --all --raw` 找到这些 blob 最早出现的提交和路径
+- 汇总 count-objects、包文件列表，以及可选的 `verify-pack -s` 增量链长度分布
+"""
+
+import os
+import heapq
+from contextlib import aclosing
+from typing import Any, Dict, List
+
+from git_runner import run_git, stream_records, git_dirs, GitError
+
+# 遍历全部对象或历史的超时时间（秒）
+ANALYZE_TIMEOUT = float(os.environ.get("GIT_OPTION_ANALYZE_TIMEOUT", "3600"))
+
+_BATCH_CHECK_FORMAT = "%(objecttype) %(objectname) %(objectsize) %(objectsize:disk) %(deltabase)"
+_ZERO_OID = "0" * 40
+
+
+async def scan_objects(repo: str, top: int = 20, min_size: int = 0) -> Dict[str, Any]:
+    """遍历对象库中的所有对象，返回各类型的汇总以及最大的 blob"""
+    heap: List[tuple] = []
+    types: Dict[str, Dict[str, int]] = {}
+    deltas = 0
+    command = ['cat-file', '--batch-all-objects', '--unordered', f'--batch-check={_BATCH_CHECK_FORMAT}']
+    async with aclosing(stream_records(command, repo, b"\n", ANALYZE_TIMEOUT)) as records:
+        async for record in records:
+            object_type, oid, size, disk_size, delta_base = record.decode().split(" ")
+            size, disk_size = int(size), int(disk_size)
+            summary = types.setdefault(object_type, {"count": 0, "size": 0, "disk_size": 0})
+            summary["count"] += 1
+            summary["size"] += size
+            summary["disk_size"] += disk_size
+            is_delta = delta_base.strip("0") != ""
+            deltas += is_delta
+            if object_type == "blob" and size >= min_size:
+                item = (size, oid, disk_size, is_delta)
+                if len(heap) < top:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+    blobs = [{"oid": oid, "size": size, "disk_size": disk_size, "delta": is_delta}
+             for size, oid, disk_size, is_delta in sorted(heap, reverse=True)]
+    return {
+        "objects": sum(summary["count"] for summary in types.values()),
+        "deltified_objects": deltas,
+        "by_type": types,
+        "largest_blobs": blobs,
+    }
+
+
+async def find_introductions(repo: str, oids: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    一次遍历所有引用可达的历史，找到每个 blob 最早出现的提交和路径
+
+    历史按从新到旧输出，每次遇到都覆盖，最后留下的就是最早的一次
+    """
+    wanted = set(oids)
+    found: Dict[str, Dict[str, str]] = {}
+    command = ['log', '--all', '--raw', '--no-abbrev', '--no-renames', '-z', '--format=%x1e%H%x1f%aI']
+    async with aclosing(stream_records(command, repo, b"\x1e", ANALYZE_TIMEOUT)) as records:
+        async for record in records:
+            if not record:
+                continue
+            tokens = record.split(b"\0")
+            commit, _, date = tokens[0].strip().decode().partition("\x1f")
+            for i in range(1, len(tokens) - 1, 2):
+                meta = tokens[i].strip()
+                if not meta.startswith(b":"):
+                    continue
+                new_oid = meta.split(b" ")[3].decode()
+                if new_oid in wanted:
+                    found[new_oid] = {"commit": commit, "date": date,
+                                      "path": tokens[i + 1].decode("utf-8", errors="replace")}
+    return found
+
+
+async def count_objects(repo: str) -> Dict[str, int]:
+    """`git count-objects -v` 的结果（大小单位为 KiB）"""
+    result = await run_git(['count-objects', '-v'], repo)
+    if not result.ok:
+        raise GitError(result.error.strip(), result.returncode)
+    stats = {}
+    for line in result.text.splitlines():
+        key, _, value = line.partition(":")
+        stats[key.strip().replace("-", "_")] = int(value.strip())
+    return stats
+
+
+def list_packs(common_dir: str) -> Dict[str, Any]:
+    """包文件列表（大小、是否有位图/.keep/promisor 标记）以及 multi-pack-index 的情况"""
+    pack_dir = os.path.join(common_dir, "objects", "pack")
+    try:
+        names = set(os.listdir(pack_dir))
+    except FileNotFoundError:
+        names = set()
+    packs = []
+    for name in sorted(names):
+        if not name.endswith(".pack"):
+            continue
+        base = name[:-len(".pack")]
+        packs.append({
+            "name": name,
+            "size": os.path.getsize(os.path.join(pack_dir, name)),
+            "bitmap": base + ".bitmap" in names,
+            "keep": base + ".keep" in names,
+            "promisor": base + ".promisor" in names,
+        })
+    packs.sort(key=lambda pack: pack["size"], reverse=True)
+    return {
+        "packs": packs,
+        "multi_pack_index": "multi-pack-index" in names,
+        "multi_pack_index_bitmap": any(name.startswith("multi-pack-index-") and name.endswith(".bitmap")
+                                       for name in names),
+        "commit_graph": os.path.exists(os.path.join(common_dir, "objects", "info", "commit-graph"))
+                        or os.path.isdir(os.path.join(common_dir, "objects", "info", "commit-graphs")),
+    }
+
+
+async def delta_chains(repo: str, common_dir: str) -> Dict[str, Any]:
+    """汇总所有包文件的增量链长度分布（`verify-pack -s` 会校验整个包，耗时较长）"""
+    histogram: Dict[int, int] = {}
+    pack_dir = os.path.join(common_dir, "objects", "pack")
+    for name in sorted(os.listdir(pack_dir)) if os.path.isdir(pack_dir) else []:
+        if not name.endswith(".idx"):
+            continue
+        async with aclosing(stream_records(['verify-pack', '-s', os.path.join(pack_dir, name)], repo, b"\n",
+                                           ANALYZE_TIMEOUT)) as records:
+            async for record in records:
+                line = record.decode()
+                if line.startswith("non delta:"):
+                    depth, count = 0, line.split(":")[1].split()[0]
+                elif line.startswith("chain length = "):
+                    depth, _, rest = line[len("chain length = "):].partition(":")
+                    count = rest.split()[0]
+                else:
+                    continue
+                histogram[int(depth)] = histogram.get(int(depth), 0) + int(count)
+    deltified = sum(count for depth, count in histogram.items() if depth)
+    return {
+        "histogram": [{"depth": depth, "objects": count} for depth, count in sorted(histogram.items())],
+        "max_depth": max(histogram) if histogram else 0,
+        "mean_depth": round(sum(depth * count for depth, count in histogram.items()) / deltified, 2)
+        if deltified else 0.0,
+    }
+
+
+async def analyze_repository(repo: str, top: int = 20, min_size: int = 0, include_paths: bool = True,
+                             include_delta_chains: bool = False) -> Dict[str, Any]:
+    """
+    分析仓库的大对象和包文件
+
+    Args:
+        repo: 仓库路径
+        top: 返回最大的 blob 数量
+        min_size: 只考虑不小于该大小（字节）的 blob
+        include_paths: 是否查找大 blob 最早出现的提交和路径（需要遍历一次全部历史）
+        include_delta_chains: 是否统计增量链长度分布（需要校验所有包文件）
+    """
+    _, common_dir = await git_dirs(repo)
+    result = await scan_objects(repo, top, min_size)
+    if include_paths and result["largest_blobs"]:
+        introductions = await find_introductions(repo, [blob["oid"] for blob in result["largest_blobs"]])
+        for blob in result["largest_blobs"]:
+            blob["introduced"] = introductions.get(blob["oid"])
+    result["count_objects"] = await count_objects(repo)
+    result.update(list_packs(common_dir))
+    if include_delta_chains:
+        result["delta_chains"] = await delta_chains(repo, common_dir)
+    return result
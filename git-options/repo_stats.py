@@ -0,0 +1,233 @@
+"""
+仓库统计分析
+
+一次遍历提交历史（`git log --numstat -z`，或已有提交索引时直接从索引读取），汇总：
+- 每个文件和目录的变更频率与增删行数（churn）
+- 每个目录的作者贡献（ownership）
+- 按时间区间统计的作者贡献
+- 经常在同一提交中一起修改的文件对（co-change 热点，文件对数量有上限，超过后为近似结果）
+"""
+
+import os
+import datetime
+from collections import Counter, defaultdict
+from contextlib import aclosing
+from itertools import combinations
+from typing import Any, Dict, List, Optional
+
+from git_runner import stream_records
+from git_parsers import parse_log_record
+from commit_index import get_commit_index
+
+_STATS_FIELDS = ["sha", "author_name", "author_email", "author_time"]
+_STATS_FORMAT = "%x1e" + "%x1f".join(["%H", "%an", "%ae", "%at"]) + "%x1f"
+
+# 完整遍历提交历史的超时时间（秒），大仓库一次遍历可能远超默认的超时时间
+STATS_TIMEOUT = float(os.environ.get("GIT_OPTION_STATS_TIMEOUT", "3600"))
+# 共同修改的文件对最多保留的数量，超过后淘汰计数较小的一半
+COCHANGE_MAX_PAIRS = int(os.environ.get("GIT_OPTION_STATS_MAX_PAIRS", "200000"))
+
+BUCKET_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+
+
+class StatsAggregator:
+    """
+    逐个提交累加统计数据，内存占用与文件数、作者数成正比，与提交数无关
+
+    共同修改的文件对最多保留 max_pairs 个：超过后淘汰计数较小的一半（lossy counting）。
+    发生过淘汰时热点是近似结果：被淘汰后再次出现的文件对从头计数，任何文件对的计数最多少算
+    cochange_error（被淘汰的最大计数），计数远大于它的文件对排名是可靠的
+    """
+
+    def __init__(self, bucket: str = "month", directory_depth: int = 2, cochange_max_files: int = 50,
+                 max_pairs: int = COCHANGE_MAX_PAIRS):
+        self.bucket_format = BUCKET_FORMATS[bucket]
+        self.directory_depth = directory_depth
+        self.cochange_max_files = cochange_max_files
+        self.commits = 0
+        self.files: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])
+        self.directories: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])
+        self.owners: Dict[str, Counter] = defaultdict(Counter)
+        self.authors: Dict[str, Dict[str, Any]] = {}
+        self.timeline: Dict[str, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(lambda: [0, 0, 0]))
+        self.pairs: Counter = Counter()
+        self.max_pairs = max_pairs
+        self.pairs_error = 0
+        self.first_time: Optional[int] = None
+        self.last_time: Optional[int] = None
+
+    def _directories_of(self, path: str) -> List[str]:
+        parts = path.split("/")[:-1]
+        return ["/".join(parts[:depth]) for depth in range(1, min(len(parts), self.directory_depth) + 1)]
+
+    def add(self, commit: Dict[str, Any]) -> None:
+        """累加一个提交（author_time 为时间戳，files 为 [{path, added, deleted}]，二进制文件的行数为 None）"""
+        self.commits += 1
+        timestamp = int(commit["author_time"])
+        self.first_time = timestamp if self.first_time is None else min(self.first_time, timestamp)
+        self.last_time = timestamp if self.last_time is None else max(self.last_time, timestamp)
+
+        email = commit["author_email"].lower()
+        author = self.authors.setdefault(email, {"name": commit["author_name"], "email": email,
+                                                 "commits": 0, "added": 0, "deleted": 0})
+        bucket = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime(self.bucket_format)
+        period = self.timeline[bucket][email]
+
+        added_total = deleted_total = 0
+        touched_directories = set()
+        for entry in commit["files"]:
+            added, deleted = entry["added"] or 0, entry["deleted"] or 0
+            added_total += added
+            deleted_total += deleted
+            stats = self.files[entry["path"]]
+            stats[0] += 1
+            stats[1] += added
+            stats[2] += deleted
+            for directory in self._directories_of(entry["path"]):
+                stats = self.directories[directory]
+                if directory not in touched_directories:
+                    stats[0] += 1
+                    touched_directories.add(directory)
+                stats[1] += added
+                stats[2] += deleted
+                self.owners[directory][email] += added + deleted
+
+        author["commits"] += 1
+        author["added"] += added_total
+        author["deleted"] += deleted_total
+        period[0] += 1
+        period[1] += added_total
+        period[2] += deleted_total
+
+        paths = sorted(entry["path"] for entry in commit["files"])
+        if 2 <= len(paths) <= self.cochange_max_files:
+            self.pairs.update(combinations(paths, 2))
+            if len(self.pairs) > self.max_pairs:
+                self._prune_pairs()
+
+    def _prune_pairs(self) -> None:
+        """只保留计数最大的一半文件对，记录被淘汰的最大计数作为误差上界"""
+        ranked = self.pairs.most_common()
+        keep = self.max_pairs // 2
+        if len(ranked) > keep:
+            self.pairs_error = max(self.pairs_error, ranked[keep][1])
+            self.pairs = Counter(dict(ranked[:keep]))
+
+    def result(self, top: int = 20) -> Dict[str, Any]:
+        def ranked(table: Dict[str, List[int]]) -> List[Dict[str, Any]]:
+            rows = sorted(table.items(), key=lambda item: (item[1][0], item[1][1] + item[1][2]), reverse=True)
+            return [{"path": path, "commits": commits, "added": added, "deleted": deleted,
+                     "churn": added + deleted} for path, (commits, added, deleted) in rows[:top]]
+
+        def iso(timestamp: Optional[int]) -> Optional[str]:
+            if timestamp is None:
+                return None
+            return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+        top_directories = ranked(self.directories)
+        ownership = []
+        for row in top_directories:
+            owners = self.owners[row["path"]]
+            total = sum(owners.values()) or 1
+            ownership.append({
+                "directory": row["path"],
+                "owners": [{"email": email, "name": self.authors[email]["name"], "churn": churn,
+                            "share": round(churn / total, 3)} for email, churn in owners.most_common(5)],
+            })
+
+        hotspots = []
+        for (first, second), count in self.pairs.most_common(top):
+            hotspots.append({
+                "files": [first, second],
+                "commits": count,
+                # 一起修改的次数占两者中变更较少的文件的比例
+                "coupling": round(count / min(self.files[first][0], self.files[second][0]), 3),
+            })
+
+        return {
+            "commits": self.commits,
+            "files_changed": len(self.files),
+            "first_commit_date": iso(self.first_time),
+            "last_commit_date": iso(self.last_time),
+            "top_files": ranked(self.files),
+            "top_directories": top_directories,
+            "ownership": ownership,
+            "authors": sorted(self.authors.values(), key=lambda author: author["commits"], reverse=True)[:top],
+            "timeline": [{"period": period, "authors": [
+                {"email": email, "commits": commits, "added": added, "deleted": deleted}
+                for email, (commits, added, deleted) in sorted(authors.items(), key=lambda item: -item[1][0])
+            ]} for period, authors in sorted(self.timeline.items())],
+            "cochange_hotspots": hotspots,
+            # 大于 0 时热点的计数是近似值，最多少算这么多次
+            "cochange_error": self.pairs_error,
+        }
+
+
+def _filter_args(since: Optional[str], until: Optional[str], max_commits: Optional[int], no_merges: bool) -> List[str]:
+    args = []
+    if since:
+        args.append(f"--since={since}")
+    if until:
+        args.append(f"--until={until}")
+    if max_commits:
+        args.append(f"-n{max_commits}")
+    if no_merges:
+        args.append("--no-merges")
+    return args
+
+
+def _in_paths(path: str, prefixes: List[str]) -> bool:
+    return any(path == prefix or path.startswith(prefix + "/") for prefix in prefixes)
+
+
+async def collect_stats(repo: str, revision: str = "HEAD", paths: Optional[List[str]] = None,
+                        since: Optional[str] = None, until: Optional[str] = None,
+                        max_commits: Optional[int] = None, no_merges: bool = True, bucket: str = "month",
+                        directory_depth: int = 2, cochange_max_files: int = 50, top: int = 20,
+                        use_index: bool = True) -> Dict[str, Any]:
+    """
+    统计仓库历史
+
+    已经为仓库建立提交索引（git_index_update）且路径不含通配符时，只用 rev-list 列出范围内的提交，
+    文件和增删行数直接从索引读取，不再为每个提交计算差异；否则流式解析一次 `git log --numstat -z`
+    """
+    aggregator = StatsAggregator(bucket, directory_depth, cochange_max_files)
+    filters = _filter_args(since, until, max_commits, no_merges)
+    pathspec = ["--"] + paths if paths else []
+    prefixes = [path.strip("/") for path in paths or []]
+    source = "log"
+
+    index = None
+    if use_index and not any(char in path for path in prefixes for char in "*?[:"):
+        index = await get_commit_index(repo, create=False)
+    if index is not None:
+        await index.update()
+        shas = []
+        async with aclosing(stream_records(["rev-list", revision] + filters + pathspec, repo, b"\n",
+                                           STATS_TIMEOUT)) as records:
+            async for record in records:
+                shas.append(record.decode())
+        commits = await index.commit_files(shas)
+        # 版本不在被索引的引用上（例如分离的提交）时，回退为直接遍历
+        if len(commits) == len(shas):
+            source = "index"
+            for sha in shas:
+                commit = commits[sha]
+                if prefixes:
+                    commit["files"] = [entry for entry in commit["files"] if _in_paths(entry["path"], prefixes)]
+                aggregator.add(commit)
+
+    if source == "log":
+        command = ["log", "-z", f"--format={_STATS_FORMAT}", "--numstat", "--no-renames"] + filters
+        async with aclosing(stream_records(command + [revision] + pathspec, repo, b"\x1e",
+                                           STATS_TIMEOUT)) as records:
+            async for record in records:
+                if record:
+                    aggregator.add(parse_log_record(record, True, _STATS_FIELDS))
+
+    return {"source": source, **aggregator.result(top)}
@@ -0,0 +1,100 @@
+"""
+git 查询结果缓存
+
+两类结果：
+- 只依赖不可变对象ID的结果（例如两个确定提交之间的 diff），键中包含解析后的对象ID，只要在内存预算内就一直有效
+- 依赖引用的结果（例如分支列表、HEAD 的提交历史），键中包含引用状态的指纹：
+  HEAD、packed-refs 以及 refs 下各级目录的 stat 信息。更新引用时 git 总是通过重命名锁文件写入，
+  所在目录的修改时间随之改变，因此无需读取引用内容就能判断引用是否变化
+
+缓存按结果大小做 LRU 淘汰。
+"""
+
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from git_runner import git_dirs
+
+# 缓存的总大小上限（字节，按结果的近似大小计算）
+RESULT_CACHE_BYTES = int(os.environ.get("GIT_OPTION_RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _refs_fingerprint(git_dir: str, common_dir: str) -> Tuple:
+    """引用状态的指纹：HEAD、packed-refs 以及 refs 下所有目录的 stat 信息"""
+    parts = [_stat_key(os.path.join(git_dir, "HEAD")), _stat_key(os.path.join(common_dir, "packed-refs"))]
+    for root, dirs, _ in os.walk(os.path.join(common_dir, "refs")):
+        dirs.sort()
+        parts.append((root, _stat_key(root)))
+    return tuple(parts)
+
+
+async def ref_fingerprint(repo: str) -> Tuple:
+    """仓库引用状态的指纹，任何分支、标签或 HEAD 的变化都会改变它"""
+    git_dir, common_dir = await git_dirs(repo)
+    return _refs_fingerprint(git_dir, common_dir)
+
+
+async def config_fingerprint(repo: str) -> Tuple:
+    """仓库配置文件的指纹（远程仓库列表等依赖配置的结果使用）"""
+    git_dir, common_dir = await git_dirs(repo)
+    return (_stat_key(os.path.join(common_dir, "config")), _stat_key(os.path.join(git_dir, "config.worktree")))
+
+
+def _size_of(value: Any) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """按大小淘汰的 LRU 结果缓存"""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        size = _size_of(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+result_cache = ResultCache()
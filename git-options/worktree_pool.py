@@ -0,0 +1,249 @@
+"""
+工作树池
+
+为每个仓库维护一组 `git worktree` 检出，供需要在不同版本上并行工作的调用方租用：
+- 租用时优先复用空闲的工作树（已经在目标提交上的优先），用 `checkout --detach --force` + `clean`
+  重置到目标版本，只改写两个版本之间不同的文件；没有空闲的工作树时新建一个
+- 池满时等待其他租用归还
+- 归还后按最近使用时间淘汰多余的空闲工作树，长时间未使用的工作树也会被删除
+
+池中的工作树放在公共 git 目录下的 mcp-worktrees 目录中，服务重启后通过 `git worktree list` 重新发现。
+"""
+
+import os
+import time
+import uuid
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from git_runner import run_git, git_dirs, GitError
+
+# 每个仓库最多的工作树数量（包括租用中和空闲的）
+WORKTREE_POOL_SIZE = int(os.environ.get("GIT_OPTION_WORKTREE_POOL_SIZE", "8"))
+# 每个仓库最多保留的空闲工作树数量
+WORKTREE_IDLE_KEEP = int(os.environ.get("GIT_OPTION_WORKTREE_IDLE_KEEP", "4"))
+# 空闲超过该时间（秒）的工作树会被删除
+WORKTREE_IDLE_TTL = float(os.environ.get("GIT_OPTION_WORKTREE_IDLE_TTL", "86400"))
+
+POOL_DIR_NAME = "mcp-worktrees"
+
+
+async def _git(args: List[str], cwd: str) -> str:
+    result = await run_git(args, cwd)
+    if not result.ok:
+        raise GitError(result.error.strip() or f"git {args[0]} 失败", result.returncode)
+    return result.text.strip()
+
+
+class PooledWorktree:
+    """池中的一个工作树"""
+
+    def __init__(self, path: str, commit: Optional[str] = None):
+        self.path = path
+        self.commit = commit
+        self.branch: Optional[str] = None
+        self.lease_id: Optional[str] = None
+        self.leased_at: Optional[float] = None
+        self.last_used = time.time()
+        self.uses = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "commit": self.commit,
+            "branch": self.branch,
+            "lease_id": self.lease_id,
+            "leased_at": self.leased_at,
+            "last_used": self.last_used,
+            "uses": self.uses,
+        }
+
+
+class RepoWorktreePool:
+    """单个仓库（按公共 git 目录区分）的工作树池"""
+
+    def __init__(self, repo: str, common_dir: str):
+        self.repo = repo
+        self.common_dir = common_dir
+        self.directory = os.path.join(common_dir, POOL_DIR_NAME)
+        self.worktrees: Dict[str, PooledWorktree] = {}
+        self.condition = asyncio.Condition()
+        self.creating = 0
+        self.loaded = False
+
+    async def load(self) -> None:
+        """从 `git worktree list` 中找回池目录下已有的工作树（服务重启后），并清理已经失效的记录"""
+        if self.loaded:
+            return
+        await _git(['worktree', 'prune'], self.repo)
+        output = await _git(['worktree', 'list', '--porcelain'], self.repo)
+        for block in output.split("\n\n"):
+            fields = dict(line.partition(" ")[::2] for line in block.splitlines())
+            path = fields.get("worktree")
+            if path and os.path.dirname(os.path.realpath(path)) == os.path.realpath(self.directory):
+                self.worktrees.setdefault(path, PooledWorktree(path, fields.get("HEAD")))
+        self.loaded = True
+
+    def idle(self) -> List[PooledWorktree]:
+        return [worktree for worktree in self.worktrees.values() if worktree.lease_id is None]
+
+    async def acquire(self, commit: str, wait: float) -> Tuple[PooledWorktree, bool]:
+        """
+        取得一个空闲的工作树（已经在目标提交上的优先，其次是最近使用的），必要时新建或等待
+
+        返回工作树以及它是否是刚刚在目标提交上新建的
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        async with self.condition:
+            while True:
+                idle = self.idle()
+                if idle:
+                    worktree = max(idle, key=lambda item: (item.commit == commit, item.last_used))
+                    worktree.lease_id = uuid.uuid4().hex[:12]
+                    return worktree, False
+                if len(self.worktrees) + self.creating < WORKTREE_POOL_SIZE:
+                    self.creating += 1
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise GitError(f"工作树池已满（{WORKTREE_POOL_SIZE} 个工作树都在使用中）")
+                try:
+                    await asyncio.wait_for(self.condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, "wt-" + uuid.uuid4().hex[:8])
+            await _git(['worktree', 'add', '--detach', '--quiet', path, commit], self.repo)
+            worktree = PooledWorktree(path, commit)
+            worktree.lease_id = uuid.uuid4().hex[:12]
+            self.worktrees[path] = worktree
+            return worktree, True
+        finally:
+            async with self.condition:
+                self.creating -= 1
+                self.condition.notify_all()
+
+    async def release(self, worktree: PooledWorktree) -> None:
+        worktree.lease_id = None
+        worktree.leased_at = None
+        worktree.last_used = time.time()
+        async with self.condition:
+            self.condition.notify_all()
+
+    async def remove(self, worktree: PooledWorktree) -> None:
+        """删除工作树（调用前应已从 worktrees 中移除，避免在删除过程中被租用）"""
+        self.worktrees.pop(worktree.path, None)
+        result = await run_git(['worktree', 'remove', '--force', worktree.path], self.repo)
+        if not result.ok:
+            # 目录已经不存在等情况，清理掉残留的记录
+            await run_git(['worktree', 'prune'], self.repo)
+
+    async def gc(self, keep: int = WORKTREE_IDLE_KEEP, ttl: float = WORKTREE_IDLE_TTL) -> List[str]:
+        """按最近使用时间淘汰空闲的工作树：只保留 keep 个，并删除空闲超过 ttl 秒的"""
+        now = time.time()
+        idle = sorted(self.idle(), key=lambda worktree: worktree.last_used, reverse=True)
+        expired = idle[keep:] + [worktree for worktree in idle[:keep] if now - worktree.last_used > ttl]
+        # 先全部移出池，删除过程中它们不会再被租用
+        for worktree in expired:
+            del self.worktrees[worktree.path]
+        for worktree in expired:
+            await self.remove(worktree)
+        return [worktree.path for worktree in expired]
+
+
+class WorktreePool:
+    """所有仓库的工作树池"""
+
+    def __init__(self):
+        self.pools: Dict[str, RepoWorktreePool] = {}
+        self.leases: Dict[str, tuple] = {}
+
+    async def _pool(self, repo: str) -> RepoWorktreePool:
+        _, common_dir = await git_dirs(repo)
+        pool = self.pools.get(common_dir)
+        if pool is None:
+            pool = self.pools[common_dir] = RepoWorktreePool(repo, common_dir)
+        await pool.load()
+        return pool
+
+    async def lease(self, repo: str, revision: str = "HEAD", branch: Optional[str] = None, wait: float = 0,
+                    clean_ignored: bool = True) -> Dict[str, Any]:
+        """
+        租用一个检出到指定版本的工作树
+
+        Args:
+            repo: 仓库路径
+            revision: 要检出的版本（分离 HEAD）
+            branch: 检出的分支（代替 revision），同一分支只能在一个工作树中检出
+            wait: 池满时最多等待的秒数
+            clean_ignored: 复用时是否同时删除被忽略的文件（例如构建产物）
+
+        Returns:
+            Dict[str, Any]: 租用ID、工作树路径、检出的提交以及是否复用了已有的工作树
+        """
+        pool = await self._pool(repo)
+        target = branch or revision
+        commit = await _git(['rev-parse', '--verify', '--end-of-options', f'{target}^{{commit}}'], pool.repo)
+        worktree, created = await pool.acquire(commit, wait)
+        try:
+            if not created or branch:
+                # --force 丢弃上一次使用留下的修改，只改写两个版本之间不同的文件
+                checkout = ['checkout', '--force', '--quiet'] + ([branch] if branch else ['--detach', commit])
+                await _git(checkout, worktree.path)
+                await _git(['clean', '-ffdxq' if clean_ignored else '-ffdq'], worktree.path)
+        except BaseException:
+            await pool.release(worktree)
+            raise
+        worktree.commit = commit
+        worktree.branch = branch
+        worktree.leased_at = time.time()
+        worktree.uses += 1
+        self.leases[worktree.lease_id] = (pool, worktree)
+        return {"lease_id": worktree.lease_id, "worktree": worktree.path, "commit": commit, "branch": branch,
+                "reused": not created}
+
+    async def release(self, lease_id: str, discard: bool = False) -> Dict[str, Any]:
+        """
+        归还租用的工作树，并淘汰多余的空闲工作树
+
+        Args:
+            lease_id: 租用ID
+            discard: 是否直接删除这个工作树（例如其中的状态已经损坏）
+        """
+        if lease_id not in self.leases:
+            raise ValueError(f"租用不存在或已归还: {lease_id}")
+        pool, worktree = self.leases.pop(lease_id)
+        if worktree.branch:
+            # 让出分支，其他工作树才能检出它
+            result = await run_git(['checkout', '--detach', '--quiet'], worktree.path)
+            worktree.branch = None
+            discard = discard or not result.ok
+        await pool.release(worktree)
+        removed = []
+        if discard:
+            await pool.remove(worktree)
+            removed.append(worktree.path)
+        removed += await pool.gc()
+        return {"worktree": worktree.path, "removed": removed}
+
+    async def status(self, repo: str) -> Dict[str, Any]:
+        pool = await self._pool(repo)
+        worktrees = sorted(pool.worktrees.values(), key=lambda worktree: worktree.last_used, reverse=True)
+        return {
+            "directory": pool.directory,
+            "max_size": WORKTREE_POOL_SIZE,
+            "idle_keep": WORKTREE_IDLE_KEEP,
+            "leased": sum(worktree.lease_id is not None for worktree in worktrees),
+            "idle": sum(worktree.lease_id is None for worktree in worktrees),
+            "worktrees": [worktree.to_dict() for worktree in worktrees],
+        }
+
+    async def gc(self, repo: str, keep: int = WORKTREE_IDLE_KEEP) -> List[str]:
+        pool = await self._pool(repo)
+        return await pool.gc(keep)
+
+
+worktree_pool = WorktreePool()